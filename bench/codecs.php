@@ -0,0 +1,60 @@
+<?
+/* Throughput of the byte-oriented encoders and decoders, in MB/s of
+   input.  Each function runs on inputs of 1KB and 1MB by default; other
+   sizes, in bytes, can be given on the command line, e.g.
+       codecs.php 1024 1048576 104857600
+   To compare two implementations, run this script with both. */
+
+function make_input($size) {
+	// mostly URL-safe text, with some bytes that need escaping
+	$chunk = '';
+	for ($i = 0; $i < 256; $i++) {
+		$chunk .= ($i % 5 == 0) ? chr($i) : chr(97 + $i % 26);
+	}
+	$s = str_repeat($chunk, (int)($size / 256) + 1);
+	return substr($s, 0, $size);
+}
+
+function run($f, $input) {
+	// enough repetitions to process about 16MB
+	$count = max(1, (int)(16777216 / strlen($input)));
+	$best = -1;
+	for ($k = 0; $k < 3; $k++) {
+		$start = microtime(true);
+		for ($i = 0; $i < $count; $i++) {
+			$f($input);
+		}
+		$t = microtime(true) - $start;
+		if ($best < 0 || $t < $best)
+			$best = $t;
+	}
+	return strlen($input) * $count / 1048576 / $best;
+}
+
+$sizes = array();
+for ($i = 1; $i < count($argv); $i++) {
+	$sizes[] = (int)$argv[$i];
+}
+if (count($sizes) == 0) {
+	$sizes = array(1024, 1048576);
+}
+
+foreach ($sizes as $size) {
+	$raw = make_input($size);
+	$inputs = array(
+		'bin2hex' => $raw,
+		'hex2bin' => bin2hex($raw),
+		'base64_encode' => $raw,
+		'base64_decode' => base64_encode($raw),
+		'urlencode' => $raw,
+		'rawurlencode' => $raw,
+		'urldecode' => urlencode($raw),
+		'rawurldecode' => rawurlencode($raw),
+		'crc32' => $raw,
+	);
+	foreach ($inputs as $f => $input) {
+		echo $f, " ", $size, " ", round(run($f, $input), 1), " MB/s\n";
+	}
+}
+
+?>
@@ -0,0 +1,70 @@
+<?
+/* htmlspecialchars() and htmlentities() on template data: mostly short
+   values with nothing to escape, some user input with markup and quotes,
+   and a few long text blocks.  Prints the best time of each benchmark,
+   in seconds. */
+
+function make_values($n) {
+	$values = array();
+	for ($i = 0; $i < $n; $i++) {
+		switch ($i % 8) {
+		case 0: $values[] = 'item-' . $i; break;
+		case 1: $values[] = 'John Smith'; break;
+		case 2: $values[] = 'Tom & Jerry <b>"best"</b> it\'s ' . $i; break;
+		case 3: $values[] = '/products/view/' . $i . '?page=2&sort=asc'; break;
+		case 4: $values[] = 'Caf' . "\xc3\xa9" . ' cr' . "\xc3\xa8" . 'me ' . $i; break;
+		case 5: $values[] = str_repeat('Lorem ipsum dolor sit amet. ', 40); break;
+		case 6: $values[] = '' . ($i * 13); break;
+		default: $values[] = 'admin@example.com'; break;
+		}
+	}
+	return $values;
+}
+
+function bench_specialchars($values) {
+	$n = 0;
+	for ($j = 0; $j < 50; $j++) {
+		foreach ($values as $v) {
+			$n += strlen(htmlspecialchars($v));
+		}
+	}
+	return $n;
+}
+
+function bench_specialchars_quotes($values) {
+	$n = 0;
+	for ($j = 0; $j < 50; $j++) {
+		foreach ($values as $v) {
+			$n += strlen(htmlspecialchars($v, ENT_QUOTES));
+		}
+	}
+	return $n;
+}
+
+function bench_entities($values) {
+	$n = 0;
+	for ($j = 0; $j < 50; $j++) {
+		foreach ($values as $v) {
+			$n += strlen(htmlentities($v));
+		}
+	}
+	return $n;
+}
+
+$values = make_values(2000);
+
+$benchmarks = array('specialchars', 'specialchars_quotes', 'entities');
+foreach ($benchmarks as $name) {
+	$f = 'bench_' . $name;
+	$best = -1;
+	for ($i = 0; $i < 5; $i++) {
+		$start = microtime(true);
+		$f($values);
+		$t = microtime(true) - $start;
+		if ($best < 0 || $t < $best)
+			$best = $t;
+	}
+	echo $name, " ", $best, "\n";
+}
+
+?>
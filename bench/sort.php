@@ -0,0 +1,84 @@
+<?
+/* Sorting 1M-element arrays of ints, floats and strings with the
+   different sort flags: sort, rsort, asort, ksort and array_multisort.
+   The number of elements can be given on the command line, e.g.
+       sort.php 100000
+   Prints the best time of each benchmark, in seconds. */
+
+function make_ints($n) {
+	$a = array();
+	$x = 12345;
+	for ($i = 0; $i < $n; $i++) {
+		$x = ($x * 1103515245 + 12345) % 2147483648;
+		$a[] = $x % 1000000;
+	}
+	return $a;
+}
+
+function make_floats($n) {
+	$a = array();
+	foreach (make_ints($n) as $x) {
+		$a[] = $x / 7.0;
+	}
+	return $a;
+}
+
+function make_strings($n) {
+	$a = array();
+	foreach (make_ints($n) as $x) {
+		$a[] = 'Item-' . $x;
+	}
+	return $a;
+}
+
+function bench($f, $a) {
+	$best = -1;
+	for ($i = 0; $i < 3; $i++) {
+		$copy = $a;
+		$start = microtime(true);
+		$f($copy);
+		$t = microtime(true) - $start;
+		if ($best < 0 || $t < $best)
+			$best = $t;
+	}
+	return $best;
+}
+
+function sort_regular(&$a) { sort($a); }
+function sort_numeric(&$a) { sort($a, SORT_NUMERIC); }
+function sort_string(&$a) { sort($a, SORT_STRING); }
+function sort_string_case(&$a) { sort($a, SORT_STRING | SORT_FLAG_CASE); }
+function sort_natural(&$a) { sort($a, SORT_NATURAL); }
+function rsort_numeric(&$a) { rsort($a, SORT_NUMERIC); }
+function asort_string(&$a) { asort($a, SORT_STRING); }
+function ksort_string(&$a) { $b = array_flip($a); ksort($b, SORT_STRING); }
+function multisort(&$a) {
+	$b = array_reverse($a);
+	array_multisort($a, SORT_STRING, $b, SORT_NUMERIC, SORT_DESC);
+}
+
+$n = 1000000;
+if (count($argv) > 1) {
+	$n = (int)$argv[1];
+}
+
+$inputs = array(
+	'ints' => make_ints($n),
+	'floats' => make_floats($n),
+	'strings' => make_strings($n),
+);
+$benchmarks = array(
+	'ints' => array('sort_regular', 'sort_numeric', 'sort_string',
+					'rsort_numeric', 'asort_string', 'multisort'),
+	'floats' => array('sort_regular', 'sort_numeric', 'sort_string'),
+	'strings' => array('sort_regular', 'sort_string', 'sort_string_case',
+					   'sort_natural', 'asort_string', 'ksort_string',
+					   'multisort'),
+);
+foreach ($benchmarks as $kind => $names) {
+	foreach ($names as $f) {
+		echo $f, " ", $kind, " ", bench($f, $inputs[$kind]), "\n";
+	}
+}
+
+?>
@@ -0,0 +1,109 @@
+<?
+/* Substring search over HTML and log payloads: strpos, stripos, strstr,
+   stristr, substr_count, explode, str_replace and str_ireplace.
+   Prints the best time of each benchmark, in seconds. */
+
+function make_html($rows) {
+	$html = "<html><head><title>Report</title></head><body>\n<table>\n";
+	for ($i = 0; $i < $rows; $i++) {
+		$html .= '<tr class="row' . ($i % 2) . '"><td><a href="/item/' . $i .
+			'">Item ' . $i . '</a></td><td>' . ($i * 7 % 1000) .
+			"</td><td>Some <b>bold</b> and some plain text</td></tr>\n";
+	}
+	return $html . "</table>\n</body></html>\n";
+}
+
+function make_log($lines) {
+	$levels = array('INFO', 'DEBUG', 'WARNING', 'INFO', 'ERROR');
+	$log = '';
+	for ($i = 0; $i < $lines; $i++) {
+		$log .= '2014-03-' . (10 + $i % 20) . ' 12:' . (10 + $i % 50) .
+			':00 [' . $levels[$i % 5] . '] worker-' . ($i % 8) .
+			': request /api/v1/items/' . $i . ' served in ' .
+			($i % 300) . "ms\n";
+	}
+	return $log;
+}
+
+function bench_strpos($html, $log) {
+	$n = 0;
+	for ($i = 0; $i < 200; $i++) {
+		$n += strpos($html, '</body>');
+		$n += strpos($log, '[FATAL]') === false ? 0 : 1;
+	}
+	return $n;
+}
+
+function bench_stripos($html, $log) {
+	$n = 0;
+	for ($i = 0; $i < 200; $i++) {
+		$n += stripos($html, '</BODY>');
+		$n += stripos($log, 'items/9999');
+	}
+	return $n;
+}
+
+function bench_strstr($html, $log) {
+	$n = 0;
+	for ($i = 0; $i < 200; $i++) {
+		$n += strlen(strstr($html, '</table>'));
+		$n += strlen(stristr($log, '[error]'));
+	}
+	return $n;
+}
+
+function bench_substr_count($html, $log) {
+	$n = 0;
+	for ($i = 0; $i < 200; $i++) {
+		$n += substr_count($html, '<td>');
+		$n += substr_count($log, 'ERROR');
+	}
+	return $n;
+}
+
+function bench_explode($html, $log) {
+	$n = 0;
+	for ($i = 0; $i < 50; $i++) {
+		$n += count(explode("\n", $log));
+		$n += count(explode('</tr>', $html));
+	}
+	return $n;
+}
+
+function bench_str_replace($html, $log) {
+	$n = 0;
+	for ($i = 0; $i < 50; $i++) {
+		$n += strlen(str_replace('<b>', '<strong>', $html));
+		$n += strlen(str_replace('worker-', 'w', $log));
+	}
+	return $n;
+}
+
+function bench_str_ireplace($html, $log) {
+	$n = 0;
+	for ($i = 0; $i < 50; $i++) {
+		$n += strlen(str_ireplace('<B>', '<strong>', $html));
+		$n += strlen(str_ireplace('warning', 'WARN', $log));
+	}
+	return $n;
+}
+
+$html = make_html(2000);
+$log = make_log(4000);
+
+$benchmarks = array('strpos', 'stripos', 'strstr', 'substr_count',
+					'explode', 'str_replace', 'str_ireplace');
+foreach ($benchmarks as $name) {
+	$f = 'bench_' . $name;
+	$best = -1;
+	for ($i = 0; $i < 5; $i++) {
+		$start = microtime(true);
+		$f($html, $log);
+		$t = microtime(true) - $start;
+		if ($best < 0 || $t < $best)
+			$best = $t;
+	}
+	echo $name, " ", $best, "\n";
+}
+
+?>
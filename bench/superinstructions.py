@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+""" ./superinstructions.py [-n runs] [hippy binary]
+
+Runs the benchmarks with and without superinstructions (the fused opcodes
+emitted by the compiler, see --no-superinstructions).  For each benchmark
+it reports the number of opcodes dispatched by the interpreter, counted
+with --opstats --jit off, and the time printed by the benchmark itself,
+with the JIT.  The binary defaults to ../hippy-c.
+"""
+import os
+import subprocess
+import sys
+
+BENCHMARKS = (
+    ('Fannkuch', 'fannkuch.php'),
+    ('Fasta', 'fasta.php'),
+    ('Heapsort', 'heapsort.php'),
+    ('Richards', 'richards.php'),
+    ('Spectral Norm', 'spectral_norm.php'),
+    ('Nbody', 'nbody.php'),
+)
+
+BASE_DIR = os.path.abspath(os.path.dirname(__file__))
+
+
+def run(interpreter, options, source):
+    target = os.path.join(BASE_DIR, source)
+    return subprocess.Popen(
+        "%s %s %s" % (interpreter, options, target),
+        shell=True,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE
+    ).communicate()
+
+
+def dispatched_opcodes(interpreter, options, source):
+    # the first part of the --opstats report is one line per opcode,
+    # "name count ticks time", up to an empty line
+    _, stderr = run(interpreter, options + " --opstats --jit off", source)
+    total = 0
+    for line in stderr.splitlines()[1:]:
+        fields = line.split()
+        if not fields:
+            break
+        total += int(fields[1])
+    return total
+
+
+def timing(interpreter, options, source, runs):
+    results = []
+    for i in range(runs):
+        stdout, _ = run(interpreter, options, source)
+        for v in stdout.split():
+            try:
+                results.append(float(v))
+            except ValueError:
+                pass
+    if not results:
+        return float('nan')
+    return min(results)
+
+
+def main(argv):
+    runs = 3
+    interpreter = os.path.join(BASE_DIR, "..", "hippy-c")
+    args = argv[1:]
+    if len(args) >= 2 and args[0] == '-n':
+        runs = int(args[1])
+        args = args[2:]
+    if args:
+        interpreter = args[0]
+
+    print "%-16s %14s %14s %7s %12s %12s %7s" % (
+        "benchmark", "ops (plain)", "ops (fused)", "ratio",
+        "time (plain)", "time (fused)", "ratio")
+    for name, source in BENCHMARKS:
+        plain_ops = dispatched_opcodes(interpreter, "--no-superinstructions",
+                                       source)
+        fused_ops = dispatched_opcodes(interpreter, "", source)
+        plain_time = timing(interpreter, "--no-superinstructions", source,
+                            runs)
+        fused_time = timing(interpreter, "", source, runs)
+        print "%-16s %14d %14d %7.3f %12.3f %12.3f %7.3f" % (
+            name, plain_ops, fused_ops, float(fused_ops) / max(plain_ops, 1),
+            plain_time, fused_time, fused_time / plain_time)
+
+
+if __name__ == "__main__":
+    main(sys.argv)
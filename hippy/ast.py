@@ -43,6 +43,11 @@ class W_Constant(DelayedObject):
     def eval_static(self, space):
         return space.ec.interpreter.locate_constant(self.name)
 
+    def ll_serialize(self, builder):
+        builder.append("c")
+        builder.append(struct.pack("l", len(self.name)))
+        builder.append(self.name)
+
     def repr(self):
         return self.name
 
@@ -90,7 +95,10 @@ class DelayedHash(DelayedObject):
         builder.append("h")
         builder.append(struct.pack("l", len(self.pairs)))
         for k, w_v in self.pairs:
-            k.ll_serialize(builder)
+            if k is None:
+                builder.append("-")
+            else:
+                k.ll_serialize(builder)
             w_v.ll_serialize(builder)
 
     def repr(self):
@@ -180,6 +188,16 @@ class Node(BaseBox):
         self.compile_ptr(ctx, mode=WRITE)
         ctx.emit(consts.STORE_REF)
 
+    def compile_jump_if_false(self, ctx):
+        """Compile the expression followed by a jump if it is false.  The
+        target is a PLACEHOLDER, to be patched by the caller."""
+        self.compile(ctx)
+        ctx.emit(consts.JUMP_IF_FALSE, PLACEHOLDER)
+
+    def const_index(self, ctx):
+        """For numeric constants, the index in ctx.consts; else -1"""
+        return -1
+
     def _compile(self, ctx):
         raise TypeError("abstract base class")
 
@@ -483,7 +501,18 @@ class Assignment(Node):
                                        self.lineno)
 
     def _compile(self, ctx):
-        self.var.compile_ptr(ctx, mode=WRITE)
+        var = self.var
+        if (ctx.superinstructions and isinstance(var, GetItem) and
+                isinstance(var.node, NamedVariable) and
+                isinstance(var.item, NamedVariable) and
+                not self.expr.is_unique_result()):
+            # '$a[$b] = expr'.  The pointers don't look at the variables
+            # before the store, so they can be built after the value.
+            self.expr.compile(ctx)
+            var.node.compile_ptr(ctx, mode=RW)
+            ctx.emit(consts.STORE_VAR_ITEM, ctx.create_var_name(var.item.name))
+            return
+        var.compile_ptr(ctx, mode=WRITE)
         self.expr.compile(ctx)
         if self.expr.is_unique_result():
             ctx.emit(consts.STORE_UNIQUE)
@@ -610,6 +639,9 @@ class ConstantInt(Const):
     def _compile(self, ctx):
         ctx.emit(consts.LOAD_CONST, ctx.create_int_const(self.intval))
 
+    def const_index(self, ctx):
+        return ctx.create_int_const(self.intval)
+
     def wrap(self, ctx, space):
         return space.wrap(self.intval)
 
@@ -685,6 +717,9 @@ class ConstantFloat(Const):
     def _compile(self, ctx):
         ctx.emit(consts.LOAD_CONST, ctx.create_float_const(self.floatval))
 
+    def const_index(self, ctx):
+        return ctx.create_float_const(self.floatval)
+
     def wrap(self, ctx, space):
         return space.wrap(self.floatval)
 
@@ -712,8 +747,25 @@ class BinOp(Node):
             self.lineno)
 
     def _compile(self, ctx):
+        opcode = consts.BIN_OP_TO_BC[self.op.lower()]
+        if ctx.superinstructions and opcode in consts.BINOP_TO_CONST_BC:
+            const = self.right.const_index(ctx)
+            if const >= 0:
+                self.left.compile(ctx)
+                ctx.emit(consts.BINOP_TO_CONST_BC[opcode], const)
+                return
         compile_two_arguments(ctx, self.left, self.right)
-        ctx.emit(consts.BIN_OP_TO_BC[self.op.lower()])
+        ctx.emit(opcode)
+
+    def compile_jump_if_false(self, ctx):
+        opcode = consts.BIN_OP_TO_BC[self.op.lower()]
+        if ctx.superinstructions and opcode in consts.COMPARISON_TO_JUMP_BC:
+            if self.lineno != 0:
+                ctx.set_lineno(self.lineno)
+            compile_two_arguments(ctx, self.left, self.right)
+            ctx.emit(consts.COMPARISON_TO_JUMP_BC[opcode], PLACEHOLDER)
+        else:
+            Node.compile_jump_if_false(self, ctx)
 
 
 class InstanceOf(BinOp):
@@ -1129,8 +1181,7 @@ class While(Node):
     def _compile(self, ctx):
         pos = ctx.enter_loop()
         ctx.register_continue_target()
-        self.expr.compile(ctx)
-        ctx.emit(consts.JUMP_IF_FALSE, PLACEHOLDER)
+        self.expr.compile_jump_if_false(ctx)
         ctx.register_break()
         self.body.compile(ctx)
         ctx.emit(consts.JUMP_BACKWARD, pos)
@@ -1179,8 +1230,7 @@ class For(Node):
             ctx.emit(consts.DISCARD_TOP)
         pos = ctx.enter_loop()
         if self.cond is not None:
-            self.cond.compile(ctx)
-            ctx.emit(consts.JUMP_IF_FALSE, PLACEHOLDER)
+            self.cond.compile_jump_if_false(ctx)
             ctx.register_break()
         self.body.compile(ctx)
         ctx.register_continue_target()
@@ -1216,8 +1266,7 @@ class If(Node):
                                        elseif, elseclause, self.lineno)
 
     def _compile(self, ctx):
-        self.cond.compile(ctx)
-        ctx.emit(consts.JUMP_IF_FALSE, PLACEHOLDER)
+        self.cond.compile_jump_if_false(ctx)
         pos = ctx.get_pos()
         self.body.compile(ctx)
         jump_after_list = []
@@ -1227,8 +1276,7 @@ class If(Node):
             jump_after_list.append(ctx.get_pos())
             ctx.patch_pos(pos)
             assert isinstance(elem, If)
-            elem.cond.compile(ctx)
-            ctx.emit(consts.JUMP_IF_FALSE, PLACEHOLDER)
+            elem.cond.compile_jump_if_false(ctx)
             pos = ctx.get_pos()
             elem.body.compile(ctx)
 
@@ -2073,8 +2121,7 @@ class IfExpr(Node):
                                        self.right.repr())
 
     def _compile(self, ctx):
-        self.cond.compile(ctx)
-        ctx.emit(consts.JUMP_IF_FALSE, PLACEHOLDER)
+        self.cond.compile_jump_if_false(ctx)
         jmp_if_false_pos = ctx.get_pos()
         self.left.compile(ctx)
         ctx.emit(consts.JUMP_FORWARD, PLACEHOLDER)
@@ -7,11 +7,13 @@ from hippy.objects.floatobject import W_FloatObject
 from hippy.objects.interpolate import W_StrInterpolation
 from hippy import consts
 from hippy.bytecode import ByteCode
+from hippy.interning import intern
 from hippy.function import Function
 from rpython.rlib.objectmodel import we_are_translated, enforceargs
 
 class ConstantMarker(W_Root):
-    pass
+    def ll_serialize(self, builder):
+        builder.append("m")
 
 @enforceargs(str, str, None, None, bool)
 def compile_ast(filename, source, mainnode, space, print_exprs=False):
@@ -28,12 +30,14 @@ def compile_ast(filename, source, mainnode, space, print_exprs=False):
     return ctx.create_bytecode()
 
 
-def intern(name, cache={}):
-    try:
-        return cache[name]
-    except KeyError:
-        cache[name] = name
-        return name
+class CompilerOptions(object):
+    def __init__(self):
+        # fuse common sequences of opcodes into single ones; only turned
+        # off (with --no-superinstructions) to measure what they bring
+        self.superinstructions = True
+
+compiler_options = CompilerOptions()
+
 
 SUPERGLOBALS = ['GLOBALS', '_SERVER', '_GET', '_POST', "_COOKIE", "_SESSION"]
 SUPERGLOBAL_LOOKUP = {}
@@ -81,6 +85,7 @@ class CompilerContext(object):
         self.current_namespace = []
         self.inside_ns_block = False
         self.use_aliases = {}
+        self.superinstructions = compiler_options.superinstructions
 
     def warn(self, msg):
         from hippy.constants import E_HIPPY_WARN
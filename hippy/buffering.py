@@ -13,13 +13,19 @@ FLUSHABLE = 32
 REMOVABLE = 64
 
 
+# strings shorter than this are copied into the buffer; longer ones are
+# kept as they are, and written out with writev() without being copied
+COPY_LIMIT = 512
+
+
 class Buffer(object):
     def __init__(self, space, name, callback, chunk_size, flags, prev):
         self.space = space
         self.name = name
         self.callback = callback
         self.chunk_size = chunk_size
-        self.buffer = StringBuilder(chunk_size)
+        self.chunks = []
+        self.small = StringBuilder()
         self.buffer_len = 0
         self.prev = prev
         self.flags = flags
@@ -41,7 +47,8 @@ class Buffer(object):
         return self.callback.name
 
     def reset(self):
-        self.buffer = StringBuilder(self.chunk_size)
+        self.chunks = []
+        self.small = StringBuilder()
         self.buffer_len = 0
 
     def getlength(self):
@@ -49,26 +56,53 @@ class Buffer(object):
             return 1
         return self.prev.getlength() + 1
 
+    def _close_small(self):
+        if self.small.getlength() > 0:
+            self.chunks.append(self.small.build())
+            self.small = StringBuilder()
+
+    def get_chunks(self):
+        """The contents of the buffer, as a list of strings"""
+        self._close_small()
+        return self.chunks
+
     def write(self, str):
-        self.buffer.append(str)
-        if self.chunk_size and len(str) + self.buffer_len >= self.chunk_size:
+        if len(str) < COPY_LIMIT:
+            self.small.append(str)
+        else:
+            self._close_small()
+            self.chunks.append(str)
+        self._written(len(str))
+
+    def write_chunks(self, chunks):
+        """Like write() with the concatenation of 'chunks'"""
+        self._close_small()
+        length = 0
+        for s in chunks:
+            self.chunks.append(s)
+            length += len(s)
+        self._written(length)
+
+    def _written(self, length):
+        if self.chunk_size and length + self.buffer_len >= self.chunk_size:
             self.flush()
             self.reset()
         else:
-            self.buffer_len += len(str)
+            self.buffer_len += length
 
     def flush(self):
-        val = self.buffer.build()
+        chunks = self.get_chunks()
         interp = self.space.ec.interpreter
         if self.callback is not None:
             w_buffer = interp.call(self.callback,
-                                   [self.space.wrap(val),
+                                   [self.space.wrap(''.join(chunks)),
                                     self.space.wrap(self.flags)])
             val = self.space.str_w(w_buffer)
+            chunks = [val] if val else []
         if self.prev is None:
-            interp.writestr(val, buffer=False)
+            interp.writechunks(chunks, buffer=False)
         else:
-            self.prev.write(val)
+            self.prev.write_chunks(chunks)
         self.reset()
         return True
 
@@ -76,7 +110,7 @@ class Buffer(object):
         self.reset()
 
     def get_contents(self):
-        return self.space.newstr(self.buffer.build())
+        return self.space.newstr(''.join(self.get_chunks()))
 
 
 @wrap(['interp', Optional(W_Root), Optional(int), Optional(int)])
@@ -3,7 +3,8 @@ import struct
 from collections import OrderedDict
 from hippy.consts import BYTECODE_STACK_EFFECTS, ARGVAL, BYTECODE_HAS_ARG,\
      BYTECODE_NAMES, ARGVAL1, ARGVAL2, _CHECKSTACK
-from hippy.error import IllegalInstruction
+from hippy.error import IllegalInstruction, NotSerializable
+from hippy.interning import intern
 from rpython.rlib import jit
 from rpython.rlib.unroll import unrolling_iterable
 from rpython.rlib.objectmodel import we_are_translated
@@ -148,6 +149,13 @@ class ByteCode(object):
 unroll_k = unrolling_iterable([7, 14, 21, 28])
 
 class Serializer(object):
+    """Writes a ByteCode, including nested functions and classes, into a
+    flat string.  Raises NotSerializable when it meets something that
+    cannot be represented (the caller is then expected to keep using the
+    in-memory ByteCode only).
+    """
+    current_class = None
+
     def __init__(self, space):
         self.builder = StringBuilder()
         self.space = space
@@ -155,16 +163,25 @@ class Serializer(object):
     def write_int(self, i):
         self.builder.append(struct.pack("l", i))
 
+    def write_float(self, f):
+        self.builder.append(struct.pack("d", f))
+
     def write_char(self, c):
         assert len(c) == 1
         self.builder.append(c)
 
     def write_str(self, s):
+        if s is None:
+            self.write_int(-1)
+            return
         self.write_int(len(s))
         self.builder.append(s)
 
     def write_wrapped_item(self, w_item):
-        w_item.ll_serialize(self.builder)
+        if w_item is None:
+            self.write_char("-")
+        else:
+            w_item.ll_serialize(self.builder)
 
     def write_wrapped_list(self, lst_w):
         self.write_int(len(lst_w))
@@ -199,28 +216,78 @@ class Serializer(object):
                 self.write_char("u")
                 self.write_class(func)
             else:
-                raise NotImplementedError
+                raise NotSerializable
 
     def write_function(self, func):
         self.write_bytecode(func.bytecode)
         self.write_list_of_str(func.names)
         self.write_list_of_char(func.types)
-        # closuredecls, defaults_w, typehints are missing
+        self.write_wrapped_list(func.defaults_w)
+        self.write_int(len(func.typehints))
+        for i, hint, allow_null in func.typehints:
+            self.write_int(i)
+            self.write_str(hint)
+            self.write_int(int(allow_null))
+        self.write_int(len(func.closuredecls))
+        for decl in func.closuredecls:
+            self.write_str(decl.name)
+            self.write_int(int(decl.isref))
 
     def write_class(self, klass):
-        # extends_name, property_decl, all_parents, access_flags,
-        # const_decl, constructor_method, constants_w, initial_instance_dct_w,
-        # base_interface_names, identifier, properties, methods
+        # the run-time parts (parents, properties, methods...) are rebuilt
+        # from this declaration by UserClass
+        from hippy.module.reflections.klass import ReflectionData
+
+        reflection = klass.reflection
+        assert isinstance(reflection, ReflectionData)
+        prev_class = self.current_class
+        self.current_class = klass
         self.write_str(klass.name)
+        self.write_str(reflection.filename)
+        self.write_int(reflection.startline)
+        self.write_int(reflection.endline)
+        self.write_str(reflection.doc)
         self.write_int(klass.lineno)
+        self.write_int(klass.access_flags)
+        self.write_str(klass.extends_name)
+        if klass.base_interface_names is None:
+            self.write_list_of_str([])
+        else:
+            self.write_list_of_str(klass.base_interface_names)
+        self.write_int(len(klass.constants_w))
+        for name, w_value in klass.constants_w.iteritems():
+            self.write_str(name)
+            self.write_wrapped_item(w_value)
+        self.write_int(len(klass.property_decl))
+        for name, decl in klass.property_decl.iteritems():
+            self.write_str(name)
+            self.write_int(decl.access_flags)
+            self.write_wrapped_item(decl.value)
         self.write_int(len(klass.method_decl))
-        for decl in klass.method_decl.itervalues():
-            self.write_str(decl.func.name)
+        for meth_id, decl in klass.method_decl.iteritems():
+            self.write_str(meth_id)
             self.write_int(decl.access_flags)
             self.write_function(decl.func)
-        # XXX
+        self.current_class = prev_class
+
+    def write_static_vars(self, bc):
+        self.write_int(len(bc.static_vars))
+        for cm, w_value in bc.static_vars.iteritems():
+            for i in range(len(bc.consts)):
+                if bc.consts[i] is cm:
+                    self.write_int(i)
+                    break
+            else:
+                raise NotSerializable
+            self.write_wrapped_item(w_value)
 
     def write_bytecode(self, bc):
+        if bc.method_of_class is None:
+            self.write_char("0")
+        elif bc.method_of_class is self.current_class:
+            self.write_char("1")
+        else:
+            raise NotSerializable
         self.write_str(bc.code)
         self.write_wrapped_list(bc.consts)
         self.write_str(bc.name)
@@ -235,20 +302,24 @@ class Serializer(object):
         self.write_list_of_functions(bc.classes[:])
         self.write_list_of_functions(bc.functions[:])
         self.write_list_of_int(bc.bc_mapping[:])
+        self.write_static_vars(bc)
         return self
 
     def finish(self):
         return self.builder.build()
 
 LONG_SIZE = struct.calcsize('l')
+DOUBLE_SIZE = struct.calcsize('d')
 
 class UnserializerException(Exception):
     pass
 
 class Unserializer(object):
-    def __init__(self, repr, space):
+    current_class = None
+
+    def __init__(self, repr, space, pos=0):
         self.repr = repr
-        self.pos = 0
+        self.pos = pos
         self.lgt = len(repr)
         self.space = space
 
@@ -267,11 +338,20 @@ class Unserializer(object):
         self.pos += LONG_SIZE
         return res
 
+    def read_float(self):
+        if self.pos + DOUBLE_SIZE > self.lgt:
+            raise UnserializerException
+        stop = self.pos + DOUBLE_SIZE
+        assert stop >= 0
+        res = runpack('d', self.repr[self.pos:stop])
+        self.pos += DOUBLE_SIZE
+        return res
+
     def read_str(self):
         lgt = self.read_int()
         if lgt == -1:
             return None
-        if self.pos + lgt > self.lgt:
+        if lgt < 0 or self.pos + lgt > self.lgt:
             raise UnserializerException
         stop = self.pos + lgt
         assert stop >= 0
@@ -313,10 +393,38 @@ class Unserializer(object):
 
         return W_StrInterpolation(lst)
 
+    def read_wrapped_constant(self):
+        from hippy.ast import W_Constant
+
+        return W_Constant(self.read_str())
+
+    def read_wrapped_class_constant(self):
+        from hippy.klass import DelayedClassConstant
+
+        cls_name = self.read_str()
+        name = self.read_str()
+        return DelayedClassConstant(cls_name, name)
+
     def read_wrapped_item(self):
+        from hippy.astcompiler import ConstantMarker
+
         type = self.read_char()
         if type == 'i':
             return self.space.wrap(self.read_int())
+        elif type == 'd':
+            return self.space.newfloat(self.read_float())
+        elif type == 'b':
+            return self.space.newbool(self.read_char() == '1')
+        elif type == 'n':
+            return self.space.w_Null
+        elif type == '-':
+            return None
+        elif type == 'c':
+            return self.read_wrapped_constant()
+        elif type == 'k':
+            return self.read_wrapped_class_constant()
+        elif type == 'm':
+            return ConstantMarker()
         elif type == "a":
             return self.read_wrapped_array()
         elif type == "s":
@@ -339,7 +447,10 @@ class Unserializer(object):
         lgt = self.read_int()
         lst = [None] * lgt
         for i in range(lgt):
-            lst[i] = self.read_str()
+            s = self.read_str()
+            if s is not None:
+                s = intern(s)
+            lst[i] = s
         return lst
 
     def read_list_of_chars(self):
@@ -364,34 +475,68 @@ class Unserializer(object):
         return lst
 
     def read_class(self):
-        from hippy.klass import ClassDeclaration, MethodDeclaration
+        from hippy.klass import (ClassDeclaration, MethodDeclaration,
+                                 PropertyDeclaration)
+        from hippy.module.reflections.klass import ReflectionData
 
         name = self.read_str()
-        cls = ClassDeclaration(name)
+        filename = self.read_str()
+        startline = self.read_int()
+        endline = self.read_int()
+        doc = self.read_str()
+        cls = ClassDeclaration(name, ReflectionData(filename, startline,
+                                                    endline, doc))
+        prev_class = self.current_class
+        self.current_class = cls
         cls.lineno = self.read_int()
+        cls.access_flags = self.read_int()
+        cls.extends_name = self.read_str()
+        cls.base_interface_names = self.read_list_of_str()
+        for i in range(self.read_int()):
+            const_name = self.read_str()
+            cls.constants_w[const_name] = self.read_wrapped_item()
+        for i in range(self.read_int()):
+            prop_name = self.read_str()
+            access_flags = self.read_int()
+            w_value = self.read_wrapped_item()
+            cls.property_decl[prop_name] = PropertyDeclaration(
+                prop_name, access_flags, w_value)
         no_of_methods = self.read_int()
         methods = OrderedDict()
         for i in range(no_of_methods):
-            name = self.read_str()
+            meth_id = self.read_str()
             access_flags = self.read_int()
             func = self.read_function()
-            func.bytecode.method_of_class = cls
             decl = MethodDeclaration(func, access_flags, cls)
-            methods[func.name] = decl
+            methods[meth_id] = decl
         cls.method_decl = methods
         cls._init_constructor()
+        self.current_class = prev_class
         return cls
 
     def read_function(self):
-        from hippy.function import Function
+        from hippy.function import Function, ClosureArgDesc
 
         bytecode = self.unserialize()
         names = self.read_list_of_str()
         types = self.read_list_of_chars()
-        if len(names) != len(types):
+        defaults_w = self.read_wrapped_list()
+        if len(names) != len(types) or len(names) != len(defaults_w):
             raise UnserializerException
-        args = [(types[i], names[i], None) for i in range(len(names))]
-        return Function(args, [], [], bytecode)
+        args = [(types[i], names[i], defaults_w[i])
+                for i in range(len(names))]
+        typehints = []
+        for i in range(self.read_int()):
+            argno = self.read_int()
+            hint = self.read_str()
+            allow_null = self.read_int() != 0
+            typehints.append((argno, hint, allow_null))
+        closuredecls = []
+        for i in range(self.read_int()):
+            closure_name = self.read_str()
+            isref = self.read_int() != 0
+            closuredecls.append(ClosureArgDesc(closure_name, isref))
+        return Function(args, closuredecls, typehints, bytecode)
 
     def read_callable(self):
         c = self.read_char()
@@ -402,7 +547,26 @@ class Unserializer(object):
         else:
             raise UnserializerException
 
+    def read_static_vars(self, bc):
+        from hippy.astcompiler import ConstantMarker
+
+        for i in range(self.read_int()):
+            no = self.read_int()
+            if not 0 <= no < len(bc.consts):
+                raise UnserializerException
+            cm = bc.consts[no]
+            if not isinstance(cm, ConstantMarker):
+                raise UnserializerException
+            bc.static_vars[cm] = self.read_wrapped_item()
+
     def unserialize(self):
+        c = self.read_char()
+        if c == "1":
+            method_of_class = self.current_class
+        elif c == "0":
+            method_of_class = None
+        else:
+            raise UnserializerException
         code = self.read_str()
         consts_w = self.read_wrapped_list()[:]
         name = self.read_str()
@@ -417,11 +581,14 @@ class Unserializer(object):
         classes = self.read_list_of_functions()[:]
         functions = self.read_list_of_functions()[:]
         bc_mapping = self.read_list_of_int()[:]
-        return ByteCode(code, consts_w, names, varnames, late_declarations,
-                        classes, functions, filename,
-                        sourcelines, name=name, startlineno=startlineno,
-                        superglobals=superglobals, this_var_num=this_var_num,
-                        bc_mapping=bc_mapping)
+        bc = ByteCode(code, consts_w, names, varnames, late_declarations,
+                      classes, functions, filename,
+                      sourcelines, method_of_class=method_of_class,
+                      name=name, startlineno=startlineno,
+                      superglobals=superglobals, this_var_num=this_var_num,
+                      bc_mapping=bc_mapping)
+        self.read_static_vars(bc)
+        return bc
 
 def unserialize(bytecode_as_str, space):
     return Unserializer(bytecode_as_str, space).unserialize()
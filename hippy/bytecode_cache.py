@@ -1,14 +1,244 @@
-
-import os, sys, time
+import os, sys, time, stat
 from hippy.phpcompiler import compile_php
-from hippy.rpath import abspath
+from hippy.bytecode import (Serializer, Unserializer, UnserializerException,
+                            LONG_SIZE)
+from hippy.sourceparser import ParseError
+from hippy.lexer import LexerError
+from hippy.error import NotSerializable
+from hippy.rpath import abspath, join
+from rpython.rlib import rmd5
 
 TIMEOUT = 1.0
 
+# Bump this whenever the bytecode or its serialized form changes, so that
+# stale files left in the cache directory by older hippys are ignored.
+BYTECODE_CACHE_VERSION = "hippy-bc-2"
+
+
+class PrecompiledEntry(object):
+    def __init__(self, mtime, size, bytecode):
+        self.mtime = mtime
+        self.size = size
+        self.bytecode = bytecode
+
+
+class PrecompiledCode(object):
+    """The compiled code of a whole tree of PHP files, all unserialized
+    at startup, so that the files are not compiled again when they are
+    used.  This is a cache of compiled code, not shared memory: every
+    process using it holds its own copy of the ByteCode objects, even
+    the processes forked after loading it, whose pages stop being
+    shared as soon as the garbage collector writes to them.  See
+    build_precompiled_code() for the format of the file.
+    """
+    def __init__(self, entries):
+        self.entries = entries    # absolute filename -> PrecompiledEntry
+
+    def lookup(self, abs_fname, mtime, size):
+        """Return the ByteCode of this exact version of the file, or None
+        if the file is not in the store or changed since."""
+        entry = self.entries.get(abs_fname, None)
+        if entry is None or entry.mtime != mtime or entry.size != size:
+            return None
+        return entry.bytecode
+
+
+def _find_php_files(dirname, result):
+    try:
+        names = os.listdir(dirname)
+    except OSError:
+        return
+    names.sort()
+    for name in names:
+        fname = join(dirname, [name])
+        try:
+            st = os.stat(fname)
+        except OSError:
+            continue
+        if stat.S_ISDIR(st.st_mode):
+            _find_php_files(fname, result)
+        elif name.endswith('.php'):
+            result.append(fname)
+
+
+def build_precompiled_code(space, root_dir, store_fname):
+    """Compile all the .php files under 'root_dir' into 'store_fname'.
+    Return the number of files stored.
+
+    The file starts with the length of the index, then the index: the
+    version, the number of entries, and for each PHP file its absolute
+    name, mtime, size and the position of its bytecode in the rest of
+    the file, which is all the serialized bytecodes one after the other.
+    """
+    fnames = []
+    root = abspath(root_dir)
+    assert root is not None
+    _find_php_files(root, fnames)
+    entries = []
+    blobs = []
+    offset = 0
+    for fname in fnames:
+        try:
+            f = open(fname)
+            try:
+                st = os.fstat(f.fileno())
+                data = f.read(-1)
+            finally:
+                f.close()
+        except (OSError, IOError):
+            continue
+        try:
+            bc = compile_php(fname, data, space)
+            blob = Serializer(space).write_bytecode(bc).finish()
+        except (ParseError, LexerError, NotSerializable):
+            continue    # left to the regular compilation at runtime
+        entries.append((fname, st.st_mtime, st.st_size, offset, len(blob)))
+        blobs.append(blob)
+        offset += len(blob)
+    index = Serializer(space)
+    index.write_str(BYTECODE_CACHE_VERSION)
+    index.write_int(len(entries))
+    for fname, mtime, size, offset, length in entries:
+        index.write_str(fname)
+        index.write_float(mtime)
+        index.write_int(size)
+        index.write_int(offset)
+        index.write_int(length)
+    index_data = index.finish()
+    header = Serializer(space)
+    header.write_int(len(index_data))
+    tmpname = '%s.%d.tmp' % (store_fname, os.getpid())
+    f = open(tmpname, 'w')
+    try:
+        f.write(header.finish())
+        f.write(index_data)
+        for blob in blobs:
+            f.write(blob)
+    finally:
+        f.close()
+    os.rename(tmpname, store_fname)
+    return len(entries)
+
+
+def load_precompiled_code(space, store_fname):
+    """Load all the code in 'store_fname'.  Return a PrecompiledCode, or
+    None if the file is missing or was built by another version of
+    hippy."""
+    try:
+        f = open(store_fname)
+        try:
+            data = f.read(-1)
+        finally:
+            f.close()
+    except (OSError, IOError):
+        return None
+    try:
+        entries = _load_precompiled_entries(space, data)
+    except UnserializerException:
+        entries = None
+    if entries is None:
+        return None
+    return PrecompiledCode(entries)
+
+
+def _load_precompiled_entries(space, data):
+    if len(data) < LONG_SIZE:
+        return None
+    index_length = Unserializer(data[:LONG_SIZE], space).read_int()
+    data_start = LONG_SIZE + index_length
+    if index_length < 0 or data_start > len(data):
+        return None
+    u = Unserializer(data[LONG_SIZE:data_start], space)
+    if u.read_str() != BYTECODE_CACHE_VERSION:
+        return None
+    entries = {}
+    for i in range(u.read_int()):
+        fname = u.read_str()
+        mtime = u.read_float()
+        size = u.read_int()
+        offset = data_start + u.read_int()
+        length = u.read_int()
+        end = offset + length
+        if fname is None or length < 0 or end > len(data):
+            return None
+        bc = Unserializer(data[offset:end], space).unserialize()
+        entries[fname] = PrecompiledEntry(mtime, size, bc)
+    return entries
+
+
 class BytecodeCache(object):
-    def __init__(self, timeout=TIMEOUT):
+    def __init__(self, timeout=TIMEOUT, cache_dir=None):
         self.cached_files = {}
         self.timeout = timeout
+        self.cache_dir = cache_dir
+        self.precompiled = None
+
+    def set_precompiled(self, precompiled):
+        """Look up files in 'precompiled' (a PrecompiledCode or None)
+        before compiling them."""
+        self.precompiled = precompiled
+
+    def set_cache_dir(self, cache_dir):
+        """Enable (or disable, with None or "") the persistent cache
+        stored in 'cache_dir'."""
+        if not cache_dir:
+            cache_dir = None
+        self.cache_dir = cache_dir
+
+    def _cache_filename(self, abs_fname):
+        assert self.cache_dir is not None
+        digest = rmd5.RMD5(abs_fname).hexdigest()
+        return join(self.cache_dir, [digest + '.hbc'])
+
+    def _cache_header(self, space, abs_fname, mtime, size):
+        s = Serializer(space)
+        s.write_str(BYTECODE_CACHE_VERSION)
+        s.write_str(abs_fname)
+        s.write_float(mtime)
+        s.write_int(size)
+        return s
+
+    def _load_from_disk(self, space, abs_fname, mtime, size):
+        """Return the ByteCode stored in the cache directory for this
+        exact version of the file, or None."""
+        try:
+            f = open(self._cache_filename(abs_fname))
+            try:
+                data = f.read(-1)
+            finally:
+                f.close()
+        except (OSError, IOError):
+            return None
+        header = self._cache_header(space, abs_fname, mtime, size).finish()
+        if not data.startswith(header):
+            return None
+        try:
+            return Unserializer(data, space, len(header)).unserialize()
+        except UnserializerException:
+            return None
+
+    def _store_to_disk(self, space, abs_fname, mtime, size, bc):
+        s = self._cache_header(space, abs_fname, mtime, size)
+        try:
+            s.write_bytecode(bc)
+        except NotSerializable:
+            return     # not representable, keep it in memory only
+        cache_fname = self._cache_filename(abs_fname)
+        # write to a private file first and rename it, so that concurrent
+        # processes never read a half-written cache entry
+        tmpname = '%s.%d.tmp' % (cache_fname, os.getpid())
+        try:
+            f = open(tmpname, 'w')
+            try:
+                f.write(s.finish())
+            finally:
+                f.close()
+            os.rename(tmpname, cache_fname)
+        except (OSError, IOError):
+            try:
+                os.unlink(tmpname)
+            except OSError:
+                pass
 
     # again, abs_filename is None for stdin
     def _really_compile(self, space, abs_fname):
@@ -19,6 +249,27 @@ class BytecodeCache(object):
         else:
             f = open(abs_fname)
 
+        if abs_fname != '<stdin>' and (self.precompiled is not None or
+                                       self.cache_dir is not None):
+            st = os.fstat(f.fileno())
+            mtime = st.st_mtime
+            size = st.st_size
+            key = abspath(abs_fname)
+            assert key is not None
+            bc = None
+            if self.precompiled is not None:
+                bc = self.precompiled.lookup(key, mtime, size)
+            if bc is None and self.cache_dir is not None:
+                bc = self._load_from_disk(space, key, mtime, size)
+                if bc is None:
+                    bc = compile_php(abs_fname, f.read(-1), space)
+                    self._store_to_disk(space, key, mtime, size, bc)
+            if bc is None:
+                bc = compile_php(abs_fname, f.read(-1), space)
+            f.close()
+            self.cached_files[abs_fname] = (bc, mtime)
+            return bc
+
         data = f.read(-1)
 
         bc = compile_php(abs_fname, data, space)
@@ -3,6 +3,7 @@ from collections import OrderedDict
 from rpython.rlib.rsre.rsre_re import search
 import os
 from rpython.rlib.rstring import assert_str0
+from hippy.interning import intern_key
 from hippy.module.url import _urldecode
 from rpython.rlib.rStringIO import RStringIO
 
@@ -20,10 +21,11 @@ def unpack_query(dct, query, space):
     vars = query.split("&")
     for var in vars:
         l = var.split("=", 1)
+        key = intern_key(_urldecode(l[0]))
         if len(l) == 1:
-            dct[_urldecode(l[0])] = space.wrap("")
+            dct[key] = space.wrap("")
         else:
-            dct[_urldecode(l[0])] = space.wrap(_urldecode(l[1]))
+            dct[key] = space.wrap(_urldecode(l[1]))
 
 
 def get_param(params, s):
@@ -14,9 +14,12 @@ EXTENSIONS = ['session', 'standard', 'mysql', 'pcre', 'posix', 'Core',
 
 class Config(object):
 
-    def __init__(self, space):
+    def __init__(self, space, ini=None):
         self.space = space
         self.precision = 14
+        if ini is not None:
+            self.ini = ini
+            return
         self.ini = {
             'php_version': space.wrap("5.4.17"),
             'zend_version': space.wrap("2.2.0"),
@@ -44,9 +47,18 @@ class Config(object):
             'session.save_handler': space.wrap("files"),
             'register_argc_argv': space.wrap(1),
             'error_reporting': space.wrap(E_ALL),
-            'default_socket_timeout': space.wrap(60)
+            'default_socket_timeout': space.wrap(60),
+            'hippy.bytecode_cache_dir': space.wrap(''),
+            'pcre.cache_size': space.wrap(4096),
+            'hippy.profile': space.wrap(''),
+            'hippy.profile_interval': space.wrap(10000),
             }
 
+    def copy(self):
+        config = Config(self.space, self.ini.copy())
+        config.precision = self.precision
+        return config
+
     def set_precision(self, prec):
         self.precision = prec
 
@@ -73,6 +85,15 @@ class Config(object):
             if self.ini.get(key, None):
                 return
         self.ini[key] = w_value
+        if key == 'pcre.cache_size':
+            self.apply_pcre_cache_size()
+
+    def apply_pcre_cache_size(self):
+        """Give the compiled regexp cache the size of this configuration;
+        done when it changes, not on every regexp compilation"""
+        w_cache_size = self.ini.get('pcre.cache_size', None)
+        if w_cache_size is not None:
+            self.space.regex_cache.set_capacity(self.space.int_w(w_cache_size))
 
 RULES = [
     ('\[.*', "T_SECTION"),
@@ -17,6 +17,7 @@ BYTECODES = [
     ('STORE_UNIQUE', 0, 0), # -1
     ('RESOLVE_FOR_WRITING', 0, +1), # -1
     ('STORE_REF', 0, 0), # -1
+    ('STORE_VAR_ITEM', 1, 0), # -1
     ('LOAD_CONST', 1, +1),
     ('LOAD_STATIC', 1, +1),
     ('INTERPOLATE', 1, ARGVAL),
@@ -51,6 +52,9 @@ BYTECODES = [
     ('BINARY_LSHIFT', 0, -1),
     ('BINARY_RSHIFT', 0, -1),
     ('BINARY_INSTANCEOF', 0, -1),
+    ('BINARY_ADD_CONST', 1, 0),
+    ('BINARY_SUB_CONST', 1, 0),
+    ('BINARY_MUL_CONST', 1, 0),
     ('SUFFIX_PLUSPLUS', 0, 1), # -1
     ('SUFFIX_MINUSMINUS', 0, 1), # -1
     ('PREFIX_PLUSPLUS', 0, 1), # -1
@@ -67,6 +71,12 @@ BYTECODES = [
     ('JUMP_FORWARD', 1, 0),
     ('JUMP_BACKWARD', 1, 0),
     ('JUMP_BACK_IF_TRUE', 1, -1),
+    ('JUMP_IF_NOT_LE', 1, -2),
+    ('JUMP_IF_NOT_GE', 1, -2),
+    ('JUMP_IF_NOT_LT', 1, -2),
+    ('JUMP_IF_NOT_GT', 1, -2),
+    ('JUMP_IF_NOT_EQ', 1, -2),
+    ('JUMP_IF_NOT_NE', 1, -2),
     ('THROW', 0, -1),
     ('PUSH_CATCH_BLOCK', 1, -1),
     ('CASE_IF_EQ', 1, -1),
@@ -155,6 +165,7 @@ BYTECODE_STACK_EFFECTS = []
 BINOP_COMPARISON_LIST = ['le', 'ge', 'lt', 'gt', 'eq', 'ne']
 BINOP_BITWISE = ['or_', 'and_', 'xor']
 BINOP_LIST = ['add', 'mul', 'sub', 'mod', 'div'] + BINOP_COMPARISON_LIST
+BINOP_CONST_LIST = ['add', 'sub', 'mul']
 
 def _setup():
     for i, (bc, numargs, stack_effect) in enumerate(BYTECODES):
@@ -173,6 +184,14 @@ BIN_OP_TO_BC = {'+': BINARY_ADD, '*': BINARY_MUL, '-': BINARY_SUB,
                 '.': BINARY_CONCAT, '>>': BINARY_RSHIFT,
                 '<<': BINARY_LSHIFT, '%': BINARY_MOD, '===': BINARY_IS,
                 '!==': BINARY_ISNOT, 'instanceof': BINARY_INSTANCEOF}
+# superinstructions: 'x OP constant' for the most common arithmetic, and
+# comparisons fused with the JUMP_IF_FALSE that follows them in conditions
+BINOP_TO_CONST_BC = {BINARY_ADD: BINARY_ADD_CONST,
+                     BINARY_SUB: BINARY_SUB_CONST,
+                     BINARY_MUL: BINARY_MUL_CONST}
+COMPARISON_TO_JUMP_BC = {BINARY_LE: JUMP_IF_NOT_LE, BINARY_GE: JUMP_IF_NOT_GE,
+                         BINARY_LT: JUMP_IF_NOT_LT, BINARY_GT: JUMP_IF_NOT_GT,
+                         BINARY_EQ: JUMP_IF_NOT_EQ, BINARY_NE: JUMP_IF_NOT_NE}
 SUFFIX_OP_TO_BC = {'++': SUFFIX_PLUSPLUS, '--': SUFFIX_MINUSMINUS}
 PREFIX_OP_TO_BC = {'++': PREFIX_PLUSPLUS, '--': PREFIX_MINUSMINUS,
         '+': UNARY_PLUS, '-': UNARY_MINUS, '!': LOGICAL_NOT, '~': BITWISE_NOT}
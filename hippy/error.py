@@ -30,6 +30,11 @@ class OffsetError(InterpreterError):
     """Raised when an indexing operation fails"""
 
 
+class NotSerializable(Exception):
+    """Raised when compiled code contains something that the bytecode
+    serializer cannot write"""
+
+
 class ExplicitExitException(Exception):
     def __init__(self, code, message):
         self.code = code
@@ -0,0 +1,273 @@
+""" The FastCGI protocol, as far as a responder needs it: reading the
+records of a request from a connection and writing back the response.
+
+Requests are served one at a time: a connection that starts a second
+request before the first one is over gets an FCGI_CANT_MPX_CONN answer,
+and FCGI_GET_VALUES says so to the web server.
+"""
+
+from errno import EINTR
+
+from rpython.rlib.rsocket import CSocketError
+
+FCGI_VERSION_1 = 1
+
+FCGI_BEGIN_REQUEST = 1
+FCGI_ABORT_REQUEST = 2
+FCGI_END_REQUEST = 3
+FCGI_PARAMS = 4
+FCGI_STDIN = 5
+FCGI_STDOUT = 6
+FCGI_STDERR = 7
+FCGI_DATA = 8
+FCGI_GET_VALUES = 9
+FCGI_GET_VALUES_RESULT = 10
+FCGI_UNKNOWN_TYPE = 11
+
+FCGI_HEADER_LEN = 8
+FCGI_MAX_CONTENT_LEN = 65535
+
+# BEGIN_REQUEST roles and flags
+FCGI_RESPONDER = 1
+FCGI_KEEP_CONN = 1
+
+# END_REQUEST protocol status
+FCGI_REQUEST_COMPLETE = 0
+FCGI_CANT_MPX_CONN = 1
+FCGI_UNKNOWN_ROLE = 3
+
+# the answers to FCGI_GET_VALUES
+MANAGEMENT_VALUES = {'FCGI_MAX_CONNS': '1',
+                     'FCGI_MAX_REQS': '1',
+                     'FCGI_MPXS_CONNS': '0'}
+
+
+class ProtocolError(Exception):
+    def __init__(self, msg):
+        self.msg = msg
+
+
+class Record(object):
+    def __init__(self, type, request_id, content):
+        self.type = type
+        self.request_id = request_id
+        self.content = content
+
+
+class Request(object):
+    def __init__(self, request_id, keep_conn):
+        self.request_id = request_id
+        self.keep_conn = keep_conn
+        self.params = {}
+        self.stdin = []
+        self.aborted = False
+
+
+def _pack_length(length):
+    if length < 128:
+        return chr(length)
+    return (chr(((length >> 24) & 0x7f) | 0x80) + chr((length >> 16) & 0xff) +
+            chr((length >> 8) & 0xff) + chr(length & 0xff))
+
+
+def encode_params(params):
+    """Encode the dict 'params' as FastCGI name-value pairs"""
+    pieces = []
+    for name, value in params.iteritems():
+        pieces.append(_pack_length(len(name)))
+        pieces.append(_pack_length(len(value)))
+        pieces.append(name)
+        pieces.append(value)
+    return ''.join(pieces)
+
+
+def _unpack_length(data, pos):
+    if pos >= len(data):
+        raise ProtocolError("truncated name-value pair")
+    length = ord(data[pos])
+    if length < 128:
+        return length, pos + 1
+    if pos + 4 > len(data):
+        raise ProtocolError("truncated name-value pair")
+    length = (((length & 0x7f) << 24) | (ord(data[pos + 1]) << 16) |
+              (ord(data[pos + 2]) << 8) | ord(data[pos + 3]))
+    return length, pos + 4
+
+
+def decode_params(data, params):
+    """Add the FastCGI name-value pairs of the string 'data' to the dict
+    'params'"""
+    pos = 0
+    while pos < len(data):
+        name_length, pos = _unpack_length(data, pos)
+        value_length, pos = _unpack_length(data, pos)
+        end = pos + name_length + value_length
+        if end > len(data):
+            raise ProtocolError("truncated name-value pair")
+        name = data[pos:pos + name_length]
+        params[name] = data[pos + name_length:end]
+        pos = end
+
+
+def encode_record(type, request_id, content):
+    """One record; 'content' must not be longer than FCGI_MAX_CONTENT_LEN"""
+    length = len(content)
+    assert length <= FCGI_MAX_CONTENT_LEN
+    padding = -length & 7
+    return ''.join([chr(FCGI_VERSION_1), chr(type),
+                    chr((request_id >> 8) & 0xff), chr(request_id & 0xff),
+                    chr((length >> 8) & 0xff), chr(length & 0xff),
+                    chr(padding), '\x00', content, '\x00' * padding])
+
+
+def encode_end_request(request_id, app_status, protocol_status):
+    app_status &= 0xffffffff
+    body = ''.join([chr((app_status >> 24) & 0xff),
+                    chr((app_status >> 16) & 0xff),
+                    chr((app_status >> 8) & 0xff), chr(app_status & 0xff),
+                    chr(protocol_status), '\x00\x00\x00'])
+    return encode_record(FCGI_END_REQUEST, request_id, body)
+
+
+class Connection(object):
+    """A FastCGI connection on the socket 'sock'.  While the connection
+    is 'idle', between two requests, server.stop_waiting() is called
+    whenever a signal interrupts the wait for the next record; if it
+    returns True, the connection is treated as closed."""
+
+    def __init__(self, sock, server):
+        self.sock = sock
+        self.server = server
+        self.data = ''
+        self.pos = 0
+        self.idle = True
+
+    def _fill(self):
+        # read more data; returns False at the end of the stream
+        while True:
+            try:
+                data = self.sock.recv(65536)
+            except CSocketError as e:
+                if e.errno != EINTR:
+                    raise
+                if self.idle and self.server.stop_waiting():
+                    return False
+                continue
+            if not data:
+                return False
+            if self.pos == len(self.data):
+                self.data = data
+            else:
+                self.data = self.data[self.pos:] + data
+            self.pos = 0
+            return True
+
+    def _read(self, length):
+        while len(self.data) - self.pos < length:
+            if not self._fill():
+                if self.idle and self.pos == len(self.data):
+                    return None
+                raise ProtocolError("connection closed inside a record")
+        start = self.pos
+        self.pos = start + length
+        assert start >= 0
+        return self.data[start:self.pos]
+
+    def read_record(self):
+        """The next record, or None if the connection is closed between
+        two requests"""
+        header = self._read(FCGI_HEADER_LEN)
+        if header is None:
+            return None
+        if ord(header[0]) != FCGI_VERSION_1:
+            raise ProtocolError("unsupported FastCGI version")
+        self.idle = False
+        type = ord(header[1])
+        request_id = (ord(header[2]) << 8) | ord(header[3])
+        length = (ord(header[4]) << 8) | ord(header[5])
+        padding = ord(header[6])
+        content = self._read(length + padding)
+        assert content is not None
+        return Record(type, request_id, content[:length])
+
+    def write(self, data):
+        self.sock.sendall(data)
+
+    def write_stream(self, type, request_id, chunks):
+        """Send the strings 'chunks' as the stream 'type' of the request,
+        followed by the empty record that ends it"""
+        data = ''.join(chunks)
+        records = []
+        start = 0
+        while start < len(data):
+            end = min(start + FCGI_MAX_CONTENT_LEN, len(data))
+            records.append(encode_record(type, request_id, data[start:end]))
+            start = end
+        records.append(encode_record(type, request_id, ''))
+        self.write(''.join(records))
+
+    def end_request(self, request_id, app_status, protocol_status):
+        self.write(encode_end_request(request_id, app_status,
+                                      protocol_status))
+
+    def _management_record(self, record):
+        if record.type == FCGI_GET_VALUES:
+            asked = {}
+            decode_params(record.content, asked)
+            values = {}
+            for name in asked:
+                if name in MANAGEMENT_VALUES:
+                    values[name] = MANAGEMENT_VALUES[name]
+            self.write(encode_record(FCGI_GET_VALUES_RESULT, 0,
+                                     encode_params(values)))
+        else:
+            self.write(encode_record(FCGI_UNKNOWN_TYPE, 0,
+                                     chr(record.type) + '\x00' * 7))
+
+    def read_request(self):
+        """Read the next request, up to the end of its stdin stream.
+        Returns None if the connection is closed before one starts."""
+        self.idle = True
+        request = None
+        params_done = False
+        while True:
+            record = self.read_record()
+            if record is None:
+                return None
+            if record.request_id == 0:
+                self._management_record(record)
+                if request is None:
+                    self.idle = True
+                continue
+            if record.type == FCGI_BEGIN_REQUEST:
+                if len(record.content) < 3:
+                    raise ProtocolError("short BEGIN_REQUEST record")
+                role = (ord(record.content[0]) << 8) | ord(record.content[1])
+                flags = ord(record.content[2])
+                if request is not None:
+                    self.end_request(record.request_id, 0,
+                                     FCGI_CANT_MPX_CONN)
+                elif role != FCGI_RESPONDER:
+                    self.end_request(record.request_id, 0,
+                                     FCGI_UNKNOWN_ROLE)
+                    self.idle = True
+                else:
+                    request = Request(record.request_id,
+                                      bool(flags & FCGI_KEEP_CONN))
+                continue
+            if request is None or record.request_id != request.request_id:
+                continue     # a record of a request we do not serve
+            if record.type == FCGI_ABORT_REQUEST:
+                request.aborted = True
+                return request
+            elif record.type == FCGI_PARAMS:
+                if not record.content:
+                    params_done = True
+                else:
+                    decode_params(record.content, request.params)
+            elif record.type == FCGI_STDIN:
+                if not record.content:
+                    if not params_done:
+                        raise ProtocolError("STDIN before the end of PARAMS")
+                    return request
+                request.stdin.append(record.content)
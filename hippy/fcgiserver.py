@@ -0,0 +1,184 @@
+""" The pre-fork FastCGI server mode: 'hippy --server port --workers N'.
+
+The master configures one FastCGIInterpreter, opens the listening socket
+and forks the workers (see hippy.prefork), which inherit both, as well as
+the bytecode cache and the precompiled code.  Every worker accepts
+connections on the socket and serves their requests one at a time,
+resetting its interpreter between two requests.  After 'max_requests'
+requests, if that is not 0, a worker exits and the master starts a new
+one.  The SIGTERM sent by the master, on SIGHUP or at shutdown, only
+makes a worker exit once it is done with the request it is serving.
+"""
+
+import os
+import signal
+
+from rpython.rlib import rsignal
+from rpython.rlib.rsocket import RSocket, SocketError
+from rpython.rlib.objectmodel import we_are_translated
+
+from hippy import constants
+from hippy.interpreter import Interpreter
+from hippy.error import ExplicitExitException, InterpreterError
+from hippy.sourceparser import ParseError
+from hippy.lexer import LexerError
+from hippy.fastcgi import (Connection, ProtocolError, FCGI_STDOUT,
+                           FCGI_REQUEST_COMPLETE)
+from hippy.prefork import PreforkMaster, open_listening_socket
+
+# how often, in seconds, a worker waiting for a connection checks whether
+# it should stop
+ACCEPT_TIMEOUT = 1.0
+
+NOT_FOUND = ('Status: 404 Not Found\r\n'
+             'Content-Type: text/plain\r\n\r\n'
+             'File not found.\n')
+
+PARSE_ERROR = ('Status: 500 Internal Server Error\r\n'
+               'Content-Type: text/plain\r\n\r\n'
+               'Parse error:  %s\n')
+
+
+class FastCGIInterpreter(Interpreter):
+    """Keeps the output of the request, headers included, in 'response'
+    instead of writing it to stdout.  A SIGTERM sets 'stop_requested'
+    instead of interrupting the script."""
+
+    def __init__(self, space):
+        Interpreter.__init__(self, space)
+        self.response = []
+        self.stop_requested = False
+
+    def _writestr(self, string):
+        self.response.append(string)
+
+    def _handle_signal(self, n):
+        if n == signal.SIGTERM:
+            self.stop_requested = True
+            return False
+        return Interpreter._handle_signal(self, n)
+
+
+class FastCGIWorker(object):
+    def __init__(self, interp, listen_sock, max_requests=0):
+        self.space = interp.space
+        self.interp = interp
+        self.listen_sock = listen_sock
+        self.max_requests = max_requests
+        self.served = 0
+
+    def done(self):
+        if self.interp.stop_requested:
+            return True
+        return self.max_requests > 0 and self.served >= self.max_requests
+
+    def stop_waiting(self):
+        self.interp.handle_signal_if_necessary()
+        return self.interp.stop_requested
+
+    def serve(self):
+        """Serve connections until done(); returns the exit code"""
+        self.listen_sock.settimeout(ACCEPT_TIMEOUT)
+        while not self.done():
+            try:
+                fd, _ = self.listen_sock.accept()
+            except SocketError:
+                # a timeout, a signal or another worker got the connection
+                self.interp.handle_signal_if_necessary()
+                continue
+            sock = RSocket(fd=fd)
+            try:
+                self.serve_connection(sock)
+            finally:
+                sock.close()
+        return 0
+
+    def serve_connection(self, sock):
+        conn = Connection(sock, self)
+        try:
+            while not self.done():
+                request = conn.read_request()
+                if request is None:
+                    return
+                status = 0
+                if not request.aborted:
+                    response, status = self.run_request(request.params,
+                                                        ''.join(request.stdin))
+                    conn.write_stream(FCGI_STDOUT, request.request_id,
+                                      response)
+                conn.end_request(request.request_id, status,
+                                 FCGI_REQUEST_COMPLETE)
+                self.served += 1
+                if not request.keep_conn:
+                    return
+        except ProtocolError as e:
+            os.write(2, "FastCGI protocol error: %s\n" % e.msg)
+        except SocketError as e:
+            os.write(2, "FastCGI connection error: %s\n" % e.get_msg())
+
+    def run_request(self, params, post_data):
+        """Run the script of a request; returns its output and exit code"""
+        space = self.space
+        interp = self.interp
+        filename = params.get('SCRIPT_FILENAME', None)
+        if filename is None:
+            return [NOT_FOUND], 0
+        try:
+            bc = space.bytecode_cache.compile_file(filename, space)
+        except ParseError as e:
+            return [PARSE_ERROR % e.__str__()], 0
+        except LexerError as e:
+            return [PARSE_ERROR % ('%s on line %d' % (e.message,
+                                                      e.source_pos + 1))], 0
+        except IOError:
+            return [NOT_FOUND], 0
+        status = 0
+        interp.setup(constants.CGI_FASTCGI, cgi_params=params,
+                     argv=[filename], post_data=post_data)
+        interp.cached_files[filename] = bc
+        try:
+            try:
+                interp.run_main(space, bc, top_main=True)
+            finally:
+                interp.shutdown()
+        except InterpreterError as e:
+            if we_are_translated():
+                os.write(2, "Fatal interpreter error %s\n" % e.msg)
+            else:
+                os.write(2, "%s: %s\n" % (e.__class__.__name__, e.msg))
+            status = 255
+        except ExplicitExitException as e:
+            interp._writestr(e.message)
+            status = e.code
+        response = interp.response
+        interp.response = []
+        interp.reset_for_next_request()
+        return response, status
+
+
+class FastCGIMaster(PreforkMaster):
+    def __init__(self, interp, listen_sock, num_workers, max_requests=0,
+                 max_rss_kb=0):
+        PreforkMaster.__init__(self, num_workers, max_rss_kb)
+        self.interp = interp
+        self.listen_sock = listen_sock
+        self.max_requests = max_requests
+
+    def run_worker(self):
+        rsignal.pypysig_setflag(signal.SIGTERM)
+        # a web server closing its end must not kill the worker
+        rsignal.pypysig_ignore(signal.SIGPIPE)
+        worker = FastCGIWorker(self.interp, self.listen_sock,
+                               self.max_requests)
+        return worker.serve()
+
+
+def run_prefork_server(interp, port, num_workers, max_requests=0,
+                       max_rss_kb=0):
+    listen_sock = open_listening_socket(port)
+    try:
+        master = FastCGIMaster(interp, listen_sock, num_workers,
+                               max_requests, max_rss_kb)
+        return master.run()
+    finally:
+        listen_sock.close()
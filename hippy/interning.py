@@ -0,0 +1,62 @@
+""" The table of interned strings.
+
+RPython strings cache their hash, and comparing a string with itself
+is only a pointer comparison.  So if the keys stored in a dictionary
+and the keys it is looked up with are the same string objects, lookups
+neither hash nor compare any character.  The names and the string
+literals of the compiled code are interned here.  So are the short
+array keys read from the input of the program (unserialize(), the
+query string, etc.), which makes them the same objects as the literals
+used in "$row['id']" to look them up.
+"""
+
+# a string from the input of the program is only interned if it is at
+# most this long, and only as long as the table has not received this
+# many of them
+MAX_KEY_LENGTH = 32
+MAX_INPUT_STRINGS = 10000
+
+
+class InternTable(object):
+    def __init__(self, max_input_strings=MAX_INPUT_STRINGS):
+        self.strings = {}
+        self.input_strings = 0
+        self.max_input_strings = max_input_strings
+
+    def intern(self, s):
+        """Return the interned string equal to 's', interning 's' if
+        there is none yet"""
+        try:
+            return self.strings[s]
+        except KeyError:
+            self.strings[s] = s
+            return s
+
+    def intern_key(self, s):
+        """Same as intern(), for a string that comes from the input of
+        the program.  If 's' is long, or if the table already holds too
+        many such strings, 's' is returned unchanged unless an equal
+        string is already interned."""
+        try:
+            return self.strings[s]
+        except KeyError:
+            pass
+        if (len(s) <= MAX_KEY_LENGTH and
+                self.input_strings < self.max_input_strings):
+            self.strings[s] = s
+            self.input_strings += 1
+        return s
+
+    def is_interned(self, s):
+        "For tests"
+        return self.strings.get(s, None) is s
+
+intern_table = InternTable()
+
+
+def intern(s):
+    return intern_table.intern(s)
+
+
+def intern_key(s):
+    return intern_table.intern_key(s)
@@ -1,10 +1,12 @@
 import os
+import signal
 from collections import OrderedDict
 
 from hippy.hippyoption import is_optional_extension_enabled
 
 from hippy.consts import BYTECODE_HAS_ARG, BYTECODE_NAMES,\
-    BINOP_LIST, BINOP_BITWISE, RETURN
+    BINOP_LIST, BINOP_BITWISE, BINOP_COMPARISON_LIST, BINOP_CONST_LIST,\
+    RETURN
 from hippy.function import AbstractFunction
 from hippy.error import (IllegalInstruction, FatalError, Throw,
                          ExplicitExitException, VisibilityError, SignalReceived)
@@ -83,6 +85,7 @@ import hippy.module.hash.funcs
 
 from hippy.module.date import default_timezone
 from hippy.buffering import Buffer
+from hippy.rwritev import writev
 
 if is_optional_extension_enabled("mysql"):
     import ext_module.mysql.funcs
@@ -150,7 +153,7 @@ class Interpreter(object):
     """ Interpreter keeps the state of the current run. There will be a new
     interpreter instance per run of script
     """
-    _immutable_fields_ = ['debugger?', 'globals']
+    _immutable_fields_ = ['debugger?', 'globals?', 'opstats?']
     cgi = 0
     web_config = None
     debugger = None
@@ -160,12 +163,29 @@ class Interpreter(object):
 
     def __init__(self, space):
         self.space = space
+        self.config = Config(space)
+        self.config.apply_pcre_cache_size()
+        self.startup_config = None
+        self.profiler = None     # a hippy.profiler.Profiler, if enabled
+        self.opstats = None      # a hippy.opstats.OpStats, if enabled
+        self._init_request_state()
+
+    def _init_request_state(self):
+        """Set up everything that lives for a single request (a run of
+        the script), leaving alone 'self.config'."""
+        space = self.space
         self.constant_names = []
         self.class_names = []
         space.global_constant_cache.reset()
         space.global_function_cache.reset()
         space.global_class_cache.reset()
 
+        self.cgi = 0
+        self.web_config = None
+        self.debugger = None
+        self.allow_direct_class_access = False
+        self.last_strtok_str = None
+        self.last_strtok_pos = 0
         self.error_level = 0xffffff
         self.topframeref = jit.vref_None
         self.error_handler = None
@@ -176,7 +196,6 @@ class Interpreter(object):
         self.constants = OrderedDict()
         self.globals = W_GlobalVars(space)
         self.w_globals_ref = W_Reference(self.globals)
-        self.config = Config(space)
         self.cached_files = OrderedDict()
         self.session = Session(self)
         self.w_exception_handler = None
@@ -215,6 +234,27 @@ class Interpreter(object):
         self.shutdown_arguments = []
         self.open_fd = {}
 
+    def take_startup_snapshot(self):
+        """Remember the current configuration (typically, just after
+        hippy.ini was loaded) as the one every request starts with."""
+        self.startup_config = self.config.copy()
+
+    def reset_for_next_request(self):
+        """Make this interpreter ready to run a new request, as if it was
+        freshly created and configured.  This is much cheaper than making
+        a new Interpreter: the configuration is restored from the startup
+        snapshot instead of being parsed again, and functions, classes
+        and constants are merely un-declared, so that the JIT-compiled
+        code keeps seeing the same immutable cells if the next request
+        declares the same objects again."""
+        if self.startup_config is not None:
+            self.config = self.startup_config.copy()
+        else:
+            self.config = Config(self.space)
+        self.config.apply_pcre_cache_size()
+        self._init_request_state()
+        self.space.ec.interpreter = self
+
     def register_fd(self, w_fd):
         self.open_fd[w_fd.res_id] = w_fd
 
@@ -224,10 +264,27 @@ class Interpreter(object):
     def handle_signal_if_necessary(self):
         n = rsignal.pypysig_getaddr_occurred().c_value
         if n < 0:
+            self._handle_signals()
+
+    def _handle_signals(self):
+        rsignal.pypysig_getaddr_occurred().c_value = 0
+        received = False
+        while True:
             n = rsignal.pypysig_poll()
             if n < 0:
-                rsignal.pypysig_getaddr_occurred().c_value = 0
-                raise SignalReceived()
+                break
+            if self._handle_signal(n):
+                received = True
+        if received:
+            raise SignalReceived()
+
+    def _handle_signal(self, n):
+        """Handle the signal 'n'; returns True if it must interrupt the
+        running script"""
+        if n == signal.SIGPROF and self.profiler is not None:
+            self.profiler.sample(self)
+            return False
+        return True
 
     def _class_get(self, class_name):
         kls = self.space.global_class_cache.locate(class_name)
@@ -585,16 +642,32 @@ class Interpreter(object):
         if buffer and self.output_buffer is not None:
             self.output_buffer.write(str)
         else:
-            if not self.any_output:
-                if self.headers:
-                    self.send_headers()
-                self.any_output = True
+            self._start_output()
             assert str is not None
             self._writestr(str)
 
+    def writechunks(self, chunks, buffer=True):
+        """Like writestr() with the concatenation of the list 'chunks',
+        without concatenating them"""
+        if buffer and self.output_buffer is not None:
+            self.output_buffer.write_chunks(chunks)
+        elif chunks:
+            self._start_output()
+            self._writechunks(chunks)
+
+    def _start_output(self):
+        if not self.any_output:
+            if self.headers:
+                self.send_headers()
+            self.any_output = True
+
     def _writestr(self, string):
         os.write(1, string)
 
+    def _writechunks(self, chunks):
+        for string in chunks:
+            self._writestr(string)
+
     def err_write(self, string):
         os.write(2, string)
 
@@ -807,6 +880,7 @@ class Interpreter(object):
     def interpret(self, frame):
         self.enter(frame)
         try:
+            self.handle_signal_if_necessary()
             return self._interpret(frame, frame.bytecode)
         finally:
             self.leave(frame)
@@ -835,12 +909,19 @@ class Interpreter(object):
                 # is not active, we'll not call it
                 self.debugger.bytecode_trace(self, frame, pc)
             next_instr = ord(code[pc])
+            opstats = self.opstats
+            op_pc = pc
+            op_start = 0
+            if opstats is not None:
+                op_start = opstats.start()
             pc += 1
             if next_instr >= BYTECODE_HAS_ARG:
                 pc, arg = bytecode.next_arg(pc)
             else:
                 arg = 0  # don't make it negative
             if next_instr == RETURN:
+                if opstats is not None:
+                    opstats.record(bytecode, op_pc, next_instr, op_start)
                 #assert frame.stackpos == 1 -- not if 'return;' appears
                 # inside a 'foreach'
                 assert frame.ptrs is None
@@ -865,6 +946,8 @@ class Interpreter(object):
                     pc = bc_impl(bytecode, frame, space, arg, pc)
                 except Throw as e:
                     pc = self.handle_exception(frame, e)
+            if opstats is not None:
+                opstats.record(bytecode, op_pc, next_instr, op_start)
 
     def enter(self, frame):
         frame.f_backref = self.topframeref
@@ -1091,6 +1174,14 @@ class Interpreter(object):
         frame.push(p.store_ref(self, w_ref))
         return pc
 
+    def STORE_VAR_ITEM(self, bytecode, frame, space, arg, pc):
+        # LOAD_VAR_ITEM_PTR followed by STORE
+        p_base = frame.pop_ptr()
+        w_value = frame.pop().deref()
+        p = pointer.VarItemPointer(p_base, frame, arg)
+        frame.push(p.store(self, w_value))
+        return pc
+
     def SET_FAST(self, bytecode, frame, space, arg, pc):
         w_ref = frame.peek()
         frame.store_ref(arg, w_ref)
@@ -1877,4 +1968,47 @@ for _name in BINOP_LIST + BINOP_BITWISE + ['concat', 'instanceof',
                                            'lshift', 'rshift']:
     setattr(Interpreter, *_new_binop(_name))
 
+def _new_binop_const(name):
+    # LOAD_CONST followed by BINARY_xxx
+    def BINARY_CONST(self, bytecode, frame, space, arg, pc):
+        w_right = bytecode.consts[arg].eval_static(space)
+        w_left = frame.pop().deref()
+        frame.push(getattr(space, name)(w_left, w_right))
+        return pc
+
+    new_name = 'BINARY_' + name.upper() + '_CONST'
+    BINARY_CONST.func_name = new_name
+    return new_name, BINARY_CONST
+
+for _name in BINOP_CONST_LIST:
+    setattr(Interpreter, *_new_binop_const(_name))
+
+def _new_compare_jump(name):
+    # BINARY_xxx followed by JUMP_IF_FALSE
+    def JUMP_IF_NOT(self, bytecode, frame, space, arg, pc):
+        w_right = frame.pop().deref()
+        w_left = frame.pop().deref()
+        if not space.is_true(getattr(space, name)(w_left, w_right)):
+            return arg
+        return pc
+
+    new_name = 'JUMP_IF_NOT_' + name.upper()
+    JUMP_IF_NOT.func_name = new_name
+    return new_name, JUMP_IF_NOT
+
+for _name in BINOP_COMPARISON_LIST:
+    setattr(Interpreter, *_new_compare_jump(_name))
+
 unrolling_bc = unrolling_iterable(enumerate(BYTECODE_NAMES))
+
+
+class StdoutInterpreter(Interpreter):
+    """The interpreter of the command line and CGI modes, which writes its
+    output to stdout.  Flushed output buffers are written there with a
+    single writev() call."""
+
+    def _writechunks(self, chunks):
+        if len(chunks) == 1:
+            self._writestr(chunks[0])
+        else:
+            writev(1, chunks)
@@ -1,3 +1,5 @@
+import struct
+
 from hippy.function import AbstractFunction
 from hippy.ast import AccessMixin, CompilerError, DelayedObject
 from hippy.error import Throw, VisibilityError, InterpreterError
@@ -1031,6 +1033,13 @@ class DelayedClassConstant(DelayedObject):
         w_result = w_cls.lookup_w_constant(space, self.name)
         return w_result
 
+    def ll_serialize(self, builder):
+        builder.append("k")
+        builder.append(struct.pack("l", len(self.cls_name)))
+        builder.append(self.cls_name)
+        builder.append(struct.pack("l", len(self.name)))
+        builder.append(self.name)
+
 
 class ClassMember(AccessMixin):
     _immutable_fields_ = ['access_flags']
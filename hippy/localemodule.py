@@ -18,11 +18,30 @@ def lower_char(c):
     return chr(_tolower(ord(c)))
 
 
+class CaseTables(object):
+    def __init__(self):
+        self.lower = None
+
+# reset by setlocale()
+_case_tables = CaseTables()
+
+
+def lower_table():
+    """Return a string of 256 characters giving the lowercase version of
+    each character in the current locale."""
+    table = _case_tables.lower
+    if table is None:
+        table = ''.join([lower_char(chr(i)) for i in range(256)])
+        _case_tables.lower = table
+    return table
+
+
 def lower(string):
     """Return the lowercase version of the string in the current locale."""
+    table = lower_table()
     builder = StringBuilder(len(string))
     for c in string:
-        builder.append(lower_char(c))
+        builder.append(table[ord(c)])
     return builder.build()
 
 
@@ -43,6 +62,7 @@ def _setlocale(space, category, locale):
     if locale == '0':
         locale = None
     result = rsetlocale(category, locale)
+    _case_tables.lower = None
     return space.newstr(result)
 
 
@@ -0,0 +1,131 @@
+"""A bounded cache, keyed by strings, evicting the least recently used
+entry.  It is the base of the caches of compiled regexps and of compiled
+printf() formats.
+
+Lookups of a constant key are elidable for the JIT: they depend only on
+the key and on 'version', which changes whenever an entry is evicted or
+replaced.  Adding an entry doesn't change it: a trace that saw the key
+missing adds the entry again, which replaces it.  Instead of moving
+their entry to the front of the list, such lookups only mark it as
+'touched'; eviction gives a touched entry a second chance by moving it
+to the front then.
+"""
+
+from rpython.rlib import jit
+
+
+class LRUCacheVersion(object):
+    pass
+
+
+class LRUEntry(object):
+    """Subclasses add the cached value"""
+
+    def __init__(self, key):
+        self.key = key
+        self.touched = False
+        self.prev = None
+        self.next = None
+
+
+class LRUCache(object):
+    """The entries are kept in a doubly-linked list, most recently used
+    first."""
+    _immutable_fields_ = ['version?']
+
+    def __init__(self, capacity):
+        self._contents = {}
+        self._head = None
+        self._tail = None
+        self.capacity = capacity
+        self.evictions = 0
+        self.version = LRUCacheVersion()
+
+    def size(self):
+        return len(self._contents)
+
+    @jit.elidable
+    def _lookup_constant(self, key, version):
+        return self._contents.get(key, None)
+
+    def lookup(self, key):
+        """The LRUEntry of 'key', or None"""
+        if jit.isconstant(key):
+            entry = self._lookup_constant(key, self.version)
+            if entry is not None:
+                entry.touched = True
+        else:
+            entry = self._contents.get(key, None)
+            if entry is not None:
+                self._move_to_front(entry)
+        return entry
+
+    def add(self, entry):
+        """Add the new LRUEntry 'entry', replacing the one of the same key
+        if there is one"""
+        old_entry = self._contents.get(entry.key, None)
+        if old_entry is not None:
+            self._unlink(old_entry)
+            self.version = LRUCacheVersion()
+        # make room first, so that the new entry is not the one evicted
+        elif self._shrink(self.capacity - 1):
+            self.version = LRUCacheVersion()
+        self._contents[entry.key] = entry
+        self._link_front(entry)
+
+    def set_capacity(self, capacity):
+        if capacity < 1:
+            capacity = 1
+        if capacity == self.capacity:
+            return
+        self.capacity = capacity
+        if self._shrink(capacity):
+            self.version = LRUCacheVersion()
+
+    def clear(self):
+        self._contents.clear()
+        self._head = None
+        self._tail = None
+        self.version = LRUCacheVersion()
+
+    def _shrink(self, capacity):
+        evicted = False
+        while len(self._contents) > capacity:
+            entry = self._tail
+            assert entry is not None
+            self._unlink(entry)
+            if entry.touched:
+                entry.touched = False
+                self._link_front(entry)
+                continue
+            del self._contents[entry.key]
+            self.evictions += 1
+            evicted = True
+        return evicted
+
+    def _link_front(self, entry):
+        entry.prev = None
+        entry.next = self._head
+        if self._head is not None:
+            self._head.prev = entry
+        self._head = entry
+        if self._tail is None:
+            self._tail = entry
+
+    def _unlink(self, entry):
+        if entry.prev is not None:
+            entry.prev.next = entry.next
+        else:
+            self._head = entry.next
+        if entry.next is not None:
+            entry.next.prev = entry.prev
+        else:
+            self._tail = entry.prev
+        entry.prev = None
+        entry.next = None
+
+    def _move_to_front(self, entry):
+        entry.touched = False
+        if entry is not self._head:
+            self._unlink(entry)
+            self._link_front(entry)
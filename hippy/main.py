@@ -1,7 +1,31 @@
 #!/usr/bin/env python
 """ Hippy VM. Execute by typing
 
-hippy [--gcdump dumpfile] [--cgi] [--server port] [--jit jit_param] [<file.php>] [php program options]
+hippy [--gcdump dumpfile] [--cgi] [--server port [--workers N]
+      [--max-requests M] [--max-rss kB]] [--jit jit_param]
+      [--bytecode-cache dir] [--precompiled file] [--profile out.file]
+      [--opstats] [--no-superinstructions] [<file.php>]
+      [php program options]
+
+--profile samples the PHP stack every hippy.profile_interval microseconds
+of CPU time and writes out.file (collapsed stacks, for flame graphs) and
+out.file.report (time spent in each function).  --opstats prints, at
+exit, how often each opcode ran and how long it took.  Use it with
+--jit off, or the numbers only cover the code that is not JIT-compiled.
+--no-superinstructions compiles without fusing common opcode sequences,
+to measure their effect (see bench/superinstructions.py).
+
+--workers N makes the FastCGI server fork N worker processes, which accept
+connections on the same socket.  A worker that dies is replaced; one that
+served M requests, or grew beyond the given resident size, is recycled.
+SIGHUP replaces all the workers, one at a time.
+
+hippy --build-precompiled file dir compiles all the .php files under dir
+into 'file'.  [--precompiled file] loads all of that code at startup, so
+that it is not compiled again when the files are used.  With --workers,
+it is loaded once, by the master, and the workers inherit it.  This does
+not save memory: the pages holding the code stop being shared as soon as
+the garbage collector writes to them, so count on a copy per worker.
 
 and enjoy
 """
@@ -16,7 +40,7 @@ if __name__ == '__main__': # untranslated
     enable_all_optional_extensions()
 
 from hippy.phpcompiler import compile_php
-from hippy.interpreter import Interpreter
+from hippy.interpreter import StdoutInterpreter
 from hippy.objspace import getspace
 from hippy.error import ExplicitExitException, InterpreterError, SignalReceived
 from hippy.config import load_ini
@@ -25,6 +49,12 @@ from hippy.lexer import LexerError
 from rpython.rlib.rgc import dump_rpy_heap
 from rpython.rlib.objectmodel import we_are_translated
 from hippy import rpath
+from hippy.profiler import Profiler
+from hippy.opstats import OpStats
+from hippy.astcompiler import compiler_options
+from hippy.bytecode_cache import (build_precompiled_code,
+                                  load_precompiled_code)
+from hippy.fcgiserver import FastCGIInterpreter, run_prefork_server
 
 # Needs to be a separate func so flowspace doesn't say import cannot succeed
 # when there is no fastcgi module source around.
@@ -33,6 +63,16 @@ def _run_fastcgi_server(server_port):
     print "Running fcgi server on port %d" % (server_port,)
     return run_fcgi_server(port=server_port)
 
+def _run_prefork_server(server_port, num_workers, max_requests, max_rss_kb,
+                        bytecode_cache_dir):
+    space = getspace()
+    interp = FastCGIInterpreter(space)
+    _configure(interp, bytecode_cache_dir)
+    print "Running fcgi server on port %d with %d workers" % (server_port,
+                                                            num_workers)
+    return run_prefork_server(interp, server_port, num_workers,
+                              max_requests, max_rss_kb)
+
 def entry_point(argv):
     i = 1
     fname = None
@@ -44,6 +84,13 @@ def entry_point(argv):
     debugger_pipes = (-1, -1)
     server_port = 9000
     jit_param = None
+    bytecode_cache_dir = None
+    precompiled_file = None
+    profile_file = None
+    opstats = False
+    workers = 0
+    max_requests = 0
+    max_rss_kb = 0
     while i < len(argv):
         arg = argv[i]
         if arg.startswith('-'):
@@ -62,6 +109,24 @@ def entry_point(argv):
                 server_port = int(argv[i + 1])
                 i += 1
                 fastcgi = True
+            elif arg == '--workers':
+                if i == len(argv) - 1:
+                    print "--workers requires an int"
+                    return 1
+                workers = int(argv[i + 1])
+                i += 1
+            elif arg == '--max-requests':
+                if i == len(argv) - 1:
+                    print "--max-requests requires an int"
+                    return 1
+                max_requests = int(argv[i + 1])
+                i += 1
+            elif arg == '--max-rss':
+                if i == len(argv) - 1:
+                    print "--max-rss requires an int"
+                    return 1
+                max_rss_kb = int(argv[i + 1])
+                i += 1
             elif arg == '--bench':
                 bench_mode = True
                 if i == len(argv) - 1:
@@ -79,6 +144,37 @@ def entry_point(argv):
                     return 1
                 i += 1
                 jit_param = argv[i]
+            elif arg == '--bytecode-cache':
+                if i == len(argv) - 1:
+                    print "--bytecode-cache requires a directory"
+                    return 1
+                i += 1
+                bytecode_cache_dir = argv[i]
+            elif arg == '--precompiled':
+                if i == len(argv) - 1:
+                    print "--precompiled requires a file name"
+                    return 1
+                i += 1
+                precompiled_file = argv[i]
+            elif arg == '--build-precompiled':
+                if i + 2 >= len(argv):
+                    print "--build-precompiled requires a file and a directory"
+                    return 1
+                space = getspace()
+                count = build_precompiled_code(space, argv[i + 2],
+                                               argv[i + 1])
+                print "Stored %d files in %s" % (count, argv[i + 1])
+                return 0
+            elif arg == '--profile':
+                if i == len(argv) - 1:
+                    print "--profile requires a file name"
+                    return 1
+                i += 1
+                profile_file = argv[i]
+            elif arg == '--opstats':
+                opstats = True
+            elif arg == '--no-superinstructions':
+                compiler_options.superinstructions = False
             else:
                 print __doc__
                 print "Unknown parameter %s" % arg
@@ -90,10 +186,24 @@ def entry_point(argv):
     if jit_param:
         from rpython.rlib.jit import set_user_param
         set_user_param(None, jit_param)
+    if workers > 0 and not fastcgi:
+        print "--workers requires --server"
+        return 1
+    if precompiled_file is not None:
+        # loaded before the server forks any process, so that it is not
+        # loaded again by each of them
+        space = getspace()
+        precompiled = load_precompiled_code(space, precompiled_file)
+        if precompiled is None:
+            print "Cannot use the precompiled code in %s" % precompiled_file
+        space.bytecode_cache.set_precompiled(precompiled)
     if fastcgi:
         if bench_mode:
             print "can't specify --bench and --server"
             return 1
+        if workers > 0:
+            return _run_prefork_server(server_port, workers, max_requests,
+                                       max_rss_kb, bytecode_cache_dir)
         from hippy.hippyoption import is_optional_extension_enabled
         if not is_optional_extension_enabled("fastcgi"):
             print("No fastcgi support compiled in")
@@ -106,13 +216,11 @@ def entry_point(argv):
         assert s is not None
         rest_of_args.append(s)
     return main(fname, rest_of_args, cgi, gcdump, debugger_pipes,
-                bench_mode, bench_no)
-
-def main(filename, rest_of_args, cgi, gcdump, debugger_pipes=(-1, -1),
-         bench_mode=False, bench_no=-1):
-    space = getspace()
-    interp = Interpreter(space)
+                bench_mode, bench_no, bytecode_cache_dir, profile_file,
+                opstats)
 
+def _configure(interp, bytecode_cache_dir):
+    """Load hippy.ini and set up the bytecode cache"""
     try:
         ini_data = open('hippy.ini').read(-1)
     except (OSError, IOError):
@@ -123,6 +231,19 @@ def main(filename, rest_of_args, cgi, gcdump, debugger_pipes=(-1, -1),
             load_ini(interp, ini_data)
         except:
             os.write(2, "error reading `hippy.ini`")
+    interp.take_startup_snapshot()
+
+    if bytecode_cache_dir is None:
+        bytecode_cache_dir = interp.config.get_ini_str(
+            'hippy.bytecode_cache_dir')
+    interp.space.bytecode_cache.set_cache_dir(bytecode_cache_dir)
+
+def main(filename, rest_of_args, cgi, gcdump, debugger_pipes=(-1, -1),
+         bench_mode=False, bench_no=-1, bytecode_cache_dir=None,
+         profile_file=None, opstats=False):
+    space = getspace()
+    interp = StdoutInterpreter(space)
+    _configure(interp, bytecode_cache_dir)
 
     try:
         bc = space.bytecode_cache.compile_file(filename, space)
@@ -144,8 +265,40 @@ def main(filename, rest_of_args, cgi, gcdump, debugger_pipes=(-1, -1),
     else:
         no = 1
 
-    exitcode = 0
+    if profile_file is None:
+        profile_file = interp.config.get_ini_str('hippy.profile')
+    profiler = None
+    if profile_file:
+        interval = space.int_w(
+            interp.config.get_ini_w('hippy.profile_interval'))
+        profiler = Profiler(interval)
+        interp.profiler = profiler
+    if opstats:
+        interp.opstats = OpStats()
+
     space.ec.init_signals()
+    if profiler is not None:
+        profiler.start()
+    try:
+        exitcode = _run_requests(space, interp, bc, filename, rest_of_args,
+                                 cgi, debugger_pipes, no)
+    finally:
+        if profiler is not None:
+            profiler.stop()
+            profiler.write(profile_file)
+        if interp.opstats is not None:
+            os.write(2, interp.opstats.report())
+    if exitcode:
+        return exitcode
+    if gcdump is not None:
+        f = os.open(gcdump, os.O_CREAT | os.O_WRONLY, 0777)
+        dump_rpy_heap(f)
+        os.close(f)
+    return exitcode
+
+def _run_requests(space, interp, bc, filename, rest_of_args, cgi,
+                  debugger_pipes, no):
+    exitcode = 0
     for i in range(no):
         # load the ini file situated in the current wc
         interp.setup(cgi, argv=[filename] + rest_of_args)
@@ -189,16 +342,7 @@ def main(filename, rest_of_args, cgi, gcdump, debugger_pipes=(-1, -1),
         if exitcode:
             return exitcode
         if i < no - 1:
-            interp = Interpreter(space)
-            if ini_data is not None:
-                try:
-                    load_ini(interp, ini_data)
-                except:
-                    os.write(2, "error reading `hippy.ini`")
-    if gcdump is not None:
-        f = os.open(gcdump, os.O_CREAT | os.O_WRONLY, 0777)
-        dump_rpy_heap(f)
-        os.close(f)
+            interp.reset_for_next_request()
     return exitcode
 
 if __name__ == '__main__':
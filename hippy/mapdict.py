@@ -1,5 +1,6 @@
 
 from rpython.rlib import jit
+from hippy.interning import intern
 
 class AbstractAttribute(object):
     _immutable_fields_ = ['klass']
@@ -13,7 +14,7 @@ class AbstractAttribute(object):
         try:
             return self.transition_cache[name]
         except KeyError:
-            a = Attribute(name, self.get_next_index(), self)
+            a = Attribute(intern(name), self.get_next_index(), self)
             self.transition_cache[name] = a
             return a
 
@@ -1,47 +1,38 @@
 from rpython.rlib.rarithmetic import ovfcheck
+from rpython.rlib.rstring import StringBuilder
+from hippy.module.bytetables import BASE64_DIGITS, BASE64_VALUES, INVALID
 
 # ____________________________________________________________
 
 PAD = '='
 
-table_a2b_base64 = [
-    -1,-1,-1,-1, -1,-1,-1,-1, -1,-1,-1,-1, -1,-1,-1,-1,
-    -1,-1,-1,-1, -1,-1,-1,-1, -1,-1,-1,-1, -1,-1,-1,-1,
-    -1,-1,-1,-1, -1,-1,-1,-1, -1,-1,-1,62, -1,-1,-1,63,
-    52,53,54,55, 56,57,58,59, 60,61,-1,-1, -1,-1,-1,-1, # Note PAD->-1 here
-    -1, 0, 1, 2,  3, 4, 5, 6,  7, 8, 9,10, 11,12,13,14,
-    15,16,17,18, 19,20,21,22, 23,24,25,-1, -1,-1,-1,-1,
-    -1,26,27,28, 29,30,31,32, 33,34,35,36, 37,38,39,40,
-    41,42,43,44, 45,46,47,48, 49,50,51,-1, -1,-1,-1,-1,
-    -1,-1,-1,-1, -1,-1,-1,-1, -1,-1,-1,-1, -1,-1,-1,-1,
-    -1,-1,-1,-1, -1,-1,-1,-1, -1,-1,-1,-1, -1,-1,-1,-1,
-    -1,-1,-1,-1, -1,-1,-1,-1, -1,-1,-1,-1, -1,-1,-1,-1,
-    -1,-1,-1,-1, -1,-1,-1,-1, -1,-1,-1,-1, -1,-1,-1,-1,
-    -1,-1,-1,-1, -1,-1,-1,-1, -1,-1,-1,-1, -1,-1,-1,-1,
-    -1,-1,-1,-1, -1,-1,-1,-1, -1,-1,-1,-1, -1,-1,-1,-1,
-    -1,-1,-1,-1, -1,-1,-1,-1, -1,-1,-1,-1, -1,-1,-1,-1,
-    -1,-1,-1,-1, -1,-1,-1,-1, -1,-1,-1,-1, -1,-1,-1,-1,
-]
-
-
-def _transform(n):
-    if n == -1:
-        return '\xff'
-    else:
-        return chr(n)
-table_a2b_base64 = ''.join(map(_transform, table_a2b_base64))
-assert len(table_a2b_base64) == 256
-
 
 def b64_decode(ascii, strict=False):
     "Decode a line of base64 data."
 
-    res = ""
+    res = StringBuilder(len(ascii) // 4 * 3 + 3)
     quad_pos = 0
     leftchar = 0
     leftbits = 0
     last_char_was_a_pad = False
-    for i, c in enumerate(ascii):
+    end = len(ascii)
+    i = 0
+    while i < end:
+        if quad_pos == 0 and not last_char_was_a_pad and i + 4 <= end:
+            # fast path: four digits in a row make three bytes
+            a = ord(BASE64_VALUES[ord(ascii[i])])
+            b = ord(BASE64_VALUES[ord(ascii[i + 1])])
+            c = ord(BASE64_VALUES[ord(ascii[i + 2])])
+            d = ord(BASE64_VALUES[ord(ascii[i + 3])])
+            if (a | b | c | d) < 64:
+                n = (a << 18) | (b << 12) | (c << 6) | d
+                res.append(chr(n >> 16))
+                res.append(chr((n >> 8) & 0xff))
+                res.append(chr(n & 0xff))
+                i += 4
+                continue
+        c = ascii[i]
+        i += 1
         if c == PAD:
             if quad_pos > 2 or (quad_pos == 2 and last_char_was_a_pad):
                 if quad_pos == len(ascii) - 2:
@@ -53,8 +44,8 @@ def b64_decode(ascii, strict=False):
                 continue
             if last_char_was_a_pad and strict:
                 return None
-            n = ord(table_a2b_base64[ord(c)])
-            if n == 0xff:
+            n = ord(BASE64_VALUES[ord(c)])
+            if n == INVALID:
                 if strict:
                     return None
                 continue    # ignore strange characters
@@ -67,21 +58,15 @@ def b64_decode(ascii, strict=False):
             #
             if leftbits >= 8:
                 leftbits -= 8
-                res += chr(leftchar >> leftbits)
+                res.append(chr(leftchar >> leftbits))
                 leftchar &= ((1 << leftbits) - 1)
             #
             last_char_was_a_pad = False
-    else:
-        if leftbits != 0:
-            return res
+    return res.build()
 
-    return res
 
 # ____________________________________________________________
 
-table_b2a_base64 = (
-    "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/")
-
 
 def b64_encode(bin):
     "Base64-code line of data."
@@ -92,25 +77,29 @@ def b64_encode(bin):
     except OverflowError:
         raise
     newlength += 1
-    res = ""
-    leftchar = 0
-    leftbits = 0
-    for c in bin:
-        # Shift into our buffer, and output any 6bits ready
-        leftchar = (leftchar << 8) | ord(c)
-        leftbits += 8
-        res += table_b2a_base64[(leftchar >> (leftbits - 6)) & 0x3f]
-        leftbits -= 6
-        if leftbits >= 6:
-            res += table_b2a_base64[(leftchar >> (leftbits - 6)) & 0x3f]
-            leftbits -= 6
+    res = StringBuilder(newlength)
+    end = len(bin) - len(bin) % 3
+    i = 0
+    while i < end:
+        # three bytes make four digits
+        n = (ord(bin[i]) << 16) | (ord(bin[i + 1]) << 8) | ord(bin[i + 2])
+        res.append(BASE64_DIGITS[n >> 18])
+        res.append(BASE64_DIGITS[(n >> 12) & 0x3f])
+        res.append(BASE64_DIGITS[(n >> 6) & 0x3f])
+        res.append(BASE64_DIGITS[n & 0x3f])
+        i += 3
     #
-    if leftbits == 2:
-        res += table_b2a_base64[(leftchar & 3) << 4]
-        res += PAD
-        res += PAD
-    elif leftbits == 4:
-        res += table_b2a_base64[(leftchar & 0xf) << 2]
-        res += PAD
-    res += '\n'
-    return res
+    if len(bin) - end == 1:
+        n = ord(bin[end])
+        res.append(BASE64_DIGITS[n >> 2])
+        res.append(BASE64_DIGITS[(n & 3) << 4])
+        res.append(PAD)
+        res.append(PAD)
+    elif len(bin) - end == 2:
+        n = (ord(bin[end]) << 8) | ord(bin[end + 1])
+        res.append(BASE64_DIGITS[n >> 10])
+        res.append(BASE64_DIGITS[(n >> 4) & 0x3f])
+        res.append(BASE64_DIGITS[(n & 0xf) << 2])
+        res.append(PAD)
+    res.append('\n')
+    return res.build()
@@ -0,0 +1,84 @@
+""" Lookup tables for the byte-oriented encoders and decoders: hex,
+base64, URL encoding and crc32.
+
+The kernels using them do one table lookup per input byte (or per group
+of bytes) instead of a chain of comparisons and arithmetic.  All the
+tables are built at import time, so they are prebuilt constants after
+translation.
+"""
+
+INVALID = 0xff
+
+HEX_DIGITS = '0123456789abcdef'
+HEX_DIGITS_UPPER = '0123456789ABCDEF'
+
+
+def _hex_pairs(digits):
+    # the two digits of byte 'n' are at positions 2*n and 2*n+1
+    return ''.join([digits[n >> 4] + digits[n & 15] for n in range(256)])
+
+HEX_PAIRS = _hex_pairs(HEX_DIGITS)
+HEX_PAIRS_UPPER = _hex_pairs(HEX_DIGITS_UPPER)
+
+
+def _hex_values():
+    values = [INVALID] * 256
+    for i in range(16):
+        values[ord(HEX_DIGITS[i])] = i
+        values[ord(HEX_DIGITS_UPPER[i])] = i
+    return ''.join([chr(n) for n in values])
+
+# the value of each hex digit, or INVALID
+HEX_VALUES = _hex_values()
+
+
+BASE64_DIGITS = (
+    "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/")
+
+
+def _base64_values():
+    values = [INVALID] * 256
+    for i in range(64):
+        values[ord(BASE64_DIGITS[i])] = i
+    return ''.join([chr(n) for n in values])
+
+# the value of each base64 digit, or INVALID (also for the padding)
+BASE64_VALUES = _base64_values()
+
+
+def _url_escapes(keep):
+    # '\x01' for the bytes that must be written as '%XX'
+    return ''.join(['\x00' if chr(n) in keep else '\x01'
+                    for n in range(256)])
+
+_ALNUM = ('abcdefghijklmnopqrstuvwxyz'
+          'ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789')
+
+# what rawurlencode() escapes: everything except RFC 3986's unreserved
+# characters
+RAWURL_ESCAPES = _url_escapes(_ALNUM + '-._~')
+# what urlencode() escapes; it also turns ' ' into '+'
+URL_ESCAPES = _url_escapes(_ALNUM + '-._')
+
+
+def _crc32_tables():
+    # the usual reflected table of the polynomial 0xedb88320 (the same
+    # as in PHP's ext/standard/crc32.h), followed by the tables for
+    # bytes that are 1, 2 and 3 positions earlier in a 4-byte word
+    table0 = []
+    for n in range(256):
+        crc = n
+        for k in range(8):
+            if crc & 1:
+                crc = (crc >> 1) ^ 0xedb88320
+            else:
+                crc >>= 1
+        table0.append(crc)
+    tables = [table0]
+    for k in range(3):
+        prev = tables[-1]
+        tables.append([(prev[n] >> 8) ^ table0[prev[n] & 0xff]
+                       for n in range(256)])
+    return tables
+
+CRC32_TABLE0, CRC32_TABLE1, CRC32_TABLE2, CRC32_TABLE3 = _crc32_tables()
@@ -1,12 +1,31 @@
+from hippy.lru_cache import LRUCache, LRUEntry
 
+DEFAULT_CACHE_SIZE = 4096     # the same as PHP's PCRE_CACHE_SIZE
 
-class RegexpCache(object):
-    # TODO: this should use an LRU cache, and be elidable for the JIT.
-    def __init__(self, space):
-        self._contents = {}
+
+class _Entry(LRUEntry):
+    def __init__(self, pattern, compiled_regexp):
+        LRUEntry.__init__(self, pattern)
+        self.compiled_regexp = compiled_regexp
+
+
+class RegexpCache(LRUCache):
+    """A bounded cache of compiled regexps, evicting the least recently
+    used one (see hippy.lru_cache), with statistics."""
+
+    def __init__(self, space, capacity=DEFAULT_CACHE_SIZE):
+        LRUCache.__init__(self, capacity)
+        self.hits = 0
+        self.misses = 0
 
     def get(self, pattern):
-        return self._contents.get(pattern, None)
+        entry = self.lookup(pattern)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        assert isinstance(entry, _Entry)
+        return entry.compiled_regexp
 
     def set(self, pattern, compiled_regexp):
-        self._contents[pattern] = compiled_regexp
+        self.add(_Entry(pattern, compiled_regexp))
@@ -95,7 +95,8 @@ def make_subpats_table(capturecount, re, extra):
     return subpat_names
 
 def get_compiled_regex_cache(interp, regex):
-    pce = interp.space.regex_cache.get(regex)
+    cache = interp.space.regex_cache
+    pce = cache.get(regex)
     if pce is not None:
         return pce
 
@@ -254,10 +255,23 @@ def get_compiled_regex_cache(interp, regex):
     pce = PCE(re, extra, poptions, coptions,    # XXX also locale and tables
               capturecount, subpat_names)
 
-    interp.space.regex_cache.set(regex, pce)
+    cache.set(regex, pce)
     return pce
 
 
+@wrap(['space'])
+def hippy_pcre_cache_stats(space):
+    """ Returns the state of the compiled regexp cache (hippy specific)"""
+    cache = space.regex_cache
+    pairs = []
+    pairs.append((space.newstr('size'), space.newint(cache.size())))
+    pairs.append((space.newstr('capacity'), space.newint(cache.capacity)))
+    pairs.append((space.newstr('hits'), space.newint(cache.hits)))
+    pairs.append((space.newstr('misses'), space.newint(cache.misses)))
+    pairs.append((space.newstr('evictions'), space.newint(cache.evictions)))
+    return space.new_array_from_pairs(pairs)
+
+
 def handle_exec_error(interp, code):
     if code == _pcre.PCRE_ERROR_MATCHLIMIT:
         preg_code = PREG_BACKTRACK_LIMIT_ERROR
@@ -297,6 +311,21 @@ def _add_result_range(space, subpats, subject, start, stop, flags=0,
     return subpats
 
 
+def _add_split_range(space, subpats, split_bounds, subject, start, stop,
+                     flags):
+    # without PREG_SPLIT_OFFSET_CAPTURE, the pieces of preg_split() are
+    # only recorded as bounds in 'split_bounds', and made into a lazy
+    # array at the end
+    if split_bounds is None:
+        return _add_result_range(space, subpats, subject, start, stop,
+                                 flags)
+    if start >= stop:
+        start = stop = 0
+    split_bounds.append(start)
+    split_bounds.append(stop)
+    return subpats
+
+
 MODE_PATTERN_ORDER = PREG_PATTERN_ORDER
 MODE_SET_ORDER     = PREG_SET_ORDER
 MODE_MATCH         = max(MODE_PATTERN_ORDER, MODE_SET_ORDER) + 1
@@ -336,6 +365,10 @@ def match_impl(interp, pce, subject, w_matches, start_offset,
     else:
         mode = MODE_NO_SUBPAT
         subpats = None
+    if mode == MODE_SPLIT and not (flags & PREG_SPLIT_OFFSET_CAPTURE):
+        split_bounds = []
+    else:
+        split_bounds = None
     try:
         exoptions = 0
         g_notempty = 0
@@ -402,9 +435,10 @@ def match_impl(interp, pce, subject, w_matches, start_offset,
                     if no_empty and next_head == last_match:
                         matched -= 1
                     else:
-                        subpats = _add_result_range(space, subpats,
-                                                    subject, last_match,
-                                                    next_head, flags)
+                        subpats = _add_split_range(space, subpats,
+                                                   split_bounds, subject,
+                                                   last_match, next_head,
+                                                   flags)
                     last_match = rffi.cast(lltype.Signed, offsets[1])
 
                     if flags & PREG_SPLIT_DELIM_CAPTURE:
@@ -414,9 +448,9 @@ def match_impl(interp, pce, subject, w_matches, start_offset,
                                              offsets[(i<<1)+1])
                             if no_empty and start == stop:
                                 continue
-                            subpats = _add_result_range(space, subpats,
-                                                        subject, start,
-                                                        stop, flags)
+                            subpats = _add_split_range(space, subpats,
+                                                       split_bounds, subject,
+                                                       start, stop, flags)
 
             elif count == _pcre.PCRE_ERROR_NOMATCH:
                 # If we previously set PCRE_NOTEMPTY after a null match,
@@ -472,9 +506,11 @@ def match_impl(interp, pce, subject, w_matches, start_offset,
             if no_empty and start_offset >= len(subject):
                 pass
             else:
-                subpats = _add_result_range(space, subpats,
-                                            subject, start_offset,
-                                            len(subject), flags)
+                subpats = _add_split_range(space, subpats, split_bounds,
+                                           subject, start_offset,
+                                           len(subject), flags)
+            if split_bounds is not None:
+                subpats = space.new_array_from_split(subject, split_bounds)
 
         w_matches.store(subpats, unique=True)
 
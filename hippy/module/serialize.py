@@ -6,6 +6,7 @@ Heavily rewritten by Armin Rigo.
 from hippy.objects.reference import W_Reference
 from hippy.objects.convert import convert_string_to_number
 from hippy.builtin_klass import k_incomplete
+from hippy.interning import intern_key
 from rpython.rlib.debug import check_nonneg
 from rpython.rlib.rarithmetic import r_uint, intmask
 from rpython.rlib.listsort import make_timsort_class
@@ -283,7 +284,7 @@ def load_array_key(fp):
         if tp == 's':
             if s[i + 1] != ':':
                 raise SerializerError("':' expected")
-            return fp.space.newstr(load_str(fp, ';'))
+            return fp.space.newstr(intern_key(load_str(fp, ';')))
     fp.pos = oldpos
     load_object(fp)    # to update the .pos to the end of the object
     fp.error_pos = fp.pos
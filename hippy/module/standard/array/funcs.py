@@ -110,6 +110,32 @@ def array_count_values(space, w_arr):
     return space.new_array_from_rdict(dct_w)
 
 
+def _as_str(space, w_obj):
+    return space.str_w(space.as_string(w_obj))
+
+
+def _value_index(space, w_arr):
+    """The string values of the items of 'w_arr', as the keys of a dict.
+    Two values are the same for array_diff() and array_intersect() if
+    their string values are equal."""
+    index = {}
+    with space.iter(w_arr) as w_iter:
+        while not w_iter.done():
+            index[_as_str(space, w_iter.next(space))] = None
+    return index
+
+
+def _item_index(space, w_arr):
+    """A dict mapping the keys of 'w_arr' to the string values of the
+    items, for array_diff_assoc()"""
+    index = {}
+    with space.iter(w_arr) as w_iter:
+        while not w_iter.done():
+            w_key, w_val = w_iter.next_item(space)
+            index[_as_str(space, w_key)] = _as_str(space, w_val)
+    return index
+
+
 @wrap(['space', 'args_w'])
 def array_diff_assoc(space, args_w):
     """ Computes the difference of arrays with additional index check """
@@ -125,17 +151,16 @@ def array_diff_assoc(space, args_w):
             return space.w_Null
     w_arr = args_w[0]
     rdict = space.get_rdict_from_array(w_arr)
-    args_w = args_w[1:]
+    indexes = [_item_index(space, w_arg) for w_arg in args_w[1:]]
     with space.iter(w_arr) as w_iter:
         while not w_iter.done():
             w_key, w_val = w_iter.next_item(space)
-            for w_arg in args_w:
-                with space.iter(w_arg) as w_arg_iter:
-                    while not w_arg_iter.done():
-                        w_arg_key, w_arg_val = w_arg_iter.next_item(space)
-                        if space.is_w(space.as_string(w_key), space.as_string(w_arg_key)) and \
-                                space.is_w(space.as_string(w_val), space.as_string(w_arg_val)):
-                            space.rdict_remove(rdict, w_arg_key)
+            key = _as_str(space, w_key)
+            value = _as_str(space, w_val)
+            for index in indexes:
+                if index.get(key, None) == value:
+                    space.rdict_remove(rdict, w_key)
+                    break
     return space.new_array_from_rdict(rdict)
 
 
@@ -255,16 +280,15 @@ def array_diff(space, args_w):
             raise _not_an_array(i + 1)
     w_arr = args_w[0]
     rdict = space.get_rdict_from_array(w_arr)
-    args_w = [space.as_array(w_arg) for w_arg in args_w[1:]]
+    indexes = [_value_index(space, w_arg) for w_arg in args_w[1:]]
     with space.iter(w_arr) as w_df_iter:
         while not w_df_iter.done():
             w_df_key, w_df_val = w_df_iter.next_item(space)
-            for w_arg in args_w:
-                with space.iter(w_arg) as w_iter:
-                    while not w_iter.done():
-                        _, w_val = w_iter.next_item(space)
-                        if space.str_eq(w_df_val, w_val):
-                            space.rdict_remove(rdict, w_df_key)
+            value = _as_str(space, w_df_val)
+            for index in indexes:
+                if value in index:
+                    space.rdict_remove(rdict, w_df_key)
+                    break
     return space.new_array_from_rdict(rdict)
 
 
@@ -502,20 +526,16 @@ def array_intersect(space, args_w):
             raise _not_an_array(i + 1)
     w_arr = args_w[0]
     rdict = space.get_rdict_from_array(w_arr)
-    args_w = args_w[1:]
+    indexes = [_value_index(space, w_arg) for w_arg in args_w[1:]]
 
     with space.iter(w_arr) as w_arr_iter:
         while not w_arr_iter.done():
             w_arr_key, w_arr_val = w_arr_iter.next_item(space)
-            exists = 0
-            for i, w_arg in enumerate(args_w):
-                with space.iter(w_arg) as w_iter:
-                    while not w_iter.done():
-                        _, w_val = w_iter.next_item(space)
-                        if space.str_eq(w_arr_val, w_val):
-                            exists += 1
-            if exists < len(args_w):
-                space.rdict_remove(rdict, w_arr_key)
+            value = _as_str(space, w_arr_val)
+            for index in indexes:
+                if value not in index:
+                    space.rdict_remove(rdict, w_arr_key)
+                    break
     return space.new_array_from_rdict(rdict)
 
 
@@ -994,6 +1014,12 @@ def array_reverse(space, w_arr, preserve=False):
 def array_search(space, w_needle, w_haystack, strict=False):
     """ Searches the array for a given value and
     returns the corresponding key if successful """
+    index = w_haystack.get_value_index(space)
+    if index is not None and index.can_find(w_needle):
+        w_key = index.find(space, w_needle)
+        if w_key is None:
+            return space.w_False
+        return w_key
     with space.iter(w_haystack) as itr:
         while not itr.done():
             w_key, w_val = itr.next_item(space)
@@ -1379,16 +1405,18 @@ def array_uintersect(space, args_w):
 @wrap(['space', ArrayArg(None), Optional(int)])
 def array_unique(space, w_arr, sort_type=0):
     """ Removes duplicate values from an array """
-    pairs = [(w_k, space.as_string(w_v))
-             for w_k, w_v in w_arr.as_pair_list(space)]
-    _sort(space, pairs, sort_type=sort_type, elem=VALUE)
-    last_val = None
+    # the first of the items with the same string value is kept, whatever
+    # 'sort_type' is
+    seen = {}
     d = w_arr.get_rdict_from_array()
-    for w_k, w_v in pairs:
-        next_val = space.str_w(w_v)
-        if last_val == next_val:
-            del d[space.str_w(w_k)]
-        last_val = next_val
+    with space.iter(w_arr) as w_iter:
+        while not w_iter.done():
+            w_k, w_v = w_iter.next_item(space)
+            value = _as_str(space, w_v)
+            if value in seen:
+                del d[space.str_w(w_k)]
+            else:
+                seen[value] = None
     return space.new_array_from_rdict(d)
 
 
@@ -1480,8 +1508,7 @@ def arsort(space, w_ref, sort_type=0):
                       space.get_type_name(w_arr.tp))
         return space.w_False
     pairs = w_arr.as_pair_list(space)
-    _sort(space, pairs, sort_type=sort_type, elem=VALUE)
-    pairs.reverse()
+    _sort(space, pairs, sort_type=sort_type, elem=VALUE, reverse=True)
     w_ref.store(space.new_array_from_pairs(pairs), unique=True)
     return space.w_True
 
@@ -1592,7 +1619,7 @@ def each(space, w_arr):
     if w_key is space.w_Null:
         return space.w_False
     w_value = w_arr._current()
-    w_arr.current_idx += 1
+    w_arr._pointer_forward()
 
     pairs = [
         (space.wrap(1), w_value),
@@ -1608,7 +1635,7 @@ def end(space, w_arr):
     length = w_arr.arraylen()
     if length == 0:
         return space.w_False
-    w_arr.current_idx = length - 1
+    w_arr._pointer_end()
     return w_arr._current()
 
 
@@ -1691,6 +1718,9 @@ def extract(space, frame, w_arr, w_extr=None, prefix=None):
 @wrap(['space', W_Root, ArrayArg(None), Optional(bool)])
 def in_array(space, w_needle, w_haystack, strict=False):
     """ Checks if a value exists in an array """
+    index = w_haystack.get_value_index(space)
+    if index is not None and index.can_find(w_needle):
+        return space.newbool(index.find(space, w_needle) is not None)
     with space.iter(w_haystack) as itr:
         while not itr.done():
             w_key, w_val = itr.next_item(space)
@@ -1719,8 +1749,7 @@ def krsort(space, w_ref, sort_type=0):
                       space.get_type_name(w_arr.tp))
         return space.w_False
     pairs = w_arr.as_pair_list(space)
-    _sort(space, pairs, sort_type=sort_type, elem=KEY)
-    pairs.reverse()
+    _sort(space, pairs, sort_type=sort_type, elem=KEY, reverse=True)
     w_ref.store(space.new_array_from_pairs(pairs))
     return space.w_True
 
@@ -1792,11 +1821,8 @@ def next(space, w_arr):
 @wrap(['space', 'unique_array'])
 def prev(space, w_arr):
     """ Rewind the internal array pointer """
-    length = w_arr.arraylen()
-    current_idx = min(w_arr.current_idx, length) - 1
-    if current_idx < 0:
+    if not w_arr._pointer_backward():
         return space.w_False
-    w_arr.current_idx = current_idx
     return w_arr._current()
 
 
@@ -1898,7 +1924,7 @@ def _range(space, w_start, w_end, step=None):
 @wrap(['space', 'unique_array'])
 def reset(space, w_arr):
     """ Set the internal pointer of an array to its first element """
-    w_arr.current_idx = 0
+    w_arr._pointer_reset()
     return w_arr._current()
 
 
@@ -1912,8 +1938,7 @@ def rsort(space, w_ref, sort_type=0):
                       % space.get_type_name(w_arr.tp))
         return space.w_False
     values = w_arr._values(space)
-    _sort(space, values, sort_type=sort_type)
-    values.reverse()
+    _sort(space, values, sort_type=sort_type, reverse=True)
     w_ref.store(space.new_array_from_list(values))
     return space.w_True
 
@@ -25,6 +25,14 @@ from rpython.rlib.rarithmetic import intmask, ovfcheck
 from rpython.rlib.rrandom import Random
 from hippy.module.standard.math.funcs import _bin
 from hippy.module.url import _urldecode
+from hippy.module.bytetables import (HEX_PAIRS, HEX_VALUES, CRC32_TABLE0,
+    CRC32_TABLE1, CRC32_TABLE2, CRC32_TABLE3)
+from hippy.interning import intern_key
+from hippy.module.standard.strings.multireplace import replacer_cache
+from hippy.module.standard.strings.search import Searcher
+from hippy.module.standard.strings.printf import format_cache, NO_ARGNUM
+from hippy.module.standard.strings.htmlentities import (
+    specialchars_table, utf8_entities)
 
 # Side-effect: register the functions defined there:
 from hippy import localemodule as locale
@@ -129,43 +137,24 @@ def _apply_charmap(string, charmap, alloc):
 
 
 def _pairs_from_array(space, w_replacements):
-    pairs = {}
+    keys = []
+    values = []
     with space.iter(w_replacements) as w_iter:
         while not w_iter.done():
             w_key, w_val = w_iter.next_item(space)
             key = space.str_w(w_key)
             if len(key) == 0:
                 raise ValidationError
-            val = space.str_w(w_val)
-            pairs.setdefault(len(key), {})[key] = val
-    return pairs
+            keys.append(key)
+            values.append(space.str_w(w_val))
+    return keys, values
 
 
-def _apply_replacement(pairs, string):
-    if not pairs:
+def _apply_replacement(keys, values, string):
+    if not keys:
         return string
-    minlen = sys.maxint
-    maxlen = 0
-    for pair in pairs:
-        minlen = min(minlen, pair)
-        maxlen = max(maxlen, pair)
-    builder = StringBuilder(len(string))
-    i = 0
-    while i < len(string):
-        j = min(maxlen, len(string) - i)
-        while j >= minlen:
-            substr = string[i:i + j]
-            try:
-                builder.append(pairs[j][substr])
-                i += j
-                break
-            except KeyError:
-                pass
-            j -= 1
-        else:
-            builder.append(string[i])
-            i += 1
-    s = builder.build()
+    replacer = replacer_cache.get(keys, values)
+    s, _ = replacer.replace(string)
     return s
 
 
@@ -313,15 +302,12 @@ def stripslashes(space, string):
 @wrap(['space', str])
 def bin2hex(space, string):
     """Convert binary data into hexadecimal representation."""
-    encode = '0123456789abcdef'
     builder = StringBuilder(2 * len(string))
     for c in string:
-        n = ord(c)
-        hi, low = n // 16, n % 16
-        builder.append(encode[hi])
-        builder.append(encode[low])
-    s = builder.build()
-    return space.newstr(s)
+        n = 2 * ord(c)
+        builder.append(HEX_PAIRS[n])
+        builder.append(HEX_PAIRS[n + 1])
+    return space.newstr(builder.build())
 
 
 @wrap(['space', 'args_w'], name='chr')
@@ -523,83 +509,31 @@ def count_chars(interp, s, mode=0):
     assert False # unreachable code
 
 
-# Table taken from PHP's ext/standard/crc32.h
-_crc32tab = [
-    0x00000000, 0x77073096, 0xee0e612c, 0x990951ba,
-    0x076dc419, 0x706af48f, 0xe963a535, 0x9e6495a3,
-    0x0edb8832, 0x79dcb8a4, 0xe0d5e91e, 0x97d2d988,
-    0x09b64c2b, 0x7eb17cbd, 0xe7b82d07, 0x90bf1d91,
-    0x1db71064, 0x6ab020f2, 0xf3b97148, 0x84be41de,
-    0x1adad47d, 0x6ddde4eb, 0xf4d4b551, 0x83d385c7,
-    0x136c9856, 0x646ba8c0, 0xfd62f97a, 0x8a65c9ec,
-    0x14015c4f, 0x63066cd9, 0xfa0f3d63, 0x8d080df5,
-    0x3b6e20c8, 0x4c69105e, 0xd56041e4, 0xa2677172,
-    0x3c03e4d1, 0x4b04d447, 0xd20d85fd, 0xa50ab56b,
-    0x35b5a8fa, 0x42b2986c, 0xdbbbc9d6, 0xacbcf940,
-    0x32d86ce3, 0x45df5c75, 0xdcd60dcf, 0xabd13d59,
-    0x26d930ac, 0x51de003a, 0xc8d75180, 0xbfd06116,
-    0x21b4f4b5, 0x56b3c423, 0xcfba9599, 0xb8bda50f,
-    0x2802b89e, 0x5f058808, 0xc60cd9b2, 0xb10be924,
-    0x2f6f7c87, 0x58684c11, 0xc1611dab, 0xb6662d3d,
-    0x76dc4190, 0x01db7106, 0x98d220bc, 0xefd5102a,
-    0x71b18589, 0x06b6b51f, 0x9fbfe4a5, 0xe8b8d433,
-    0x7807c9a2, 0x0f00f934, 0x9609a88e, 0xe10e9818,
-    0x7f6a0dbb, 0x086d3d2d, 0x91646c97, 0xe6635c01,
-    0x6b6b51f4, 0x1c6c6162, 0x856530d8, 0xf262004e,
-    0x6c0695ed, 0x1b01a57b, 0x8208f4c1, 0xf50fc457,
-    0x65b0d9c6, 0x12b7e950, 0x8bbeb8ea, 0xfcb9887c,
-    0x62dd1ddf, 0x15da2d49, 0x8cd37cf3, 0xfbd44c65,
-    0x4db26158, 0x3ab551ce, 0xa3bc0074, 0xd4bb30e2,
-    0x4adfa541, 0x3dd895d7, 0xa4d1c46d, 0xd3d6f4fb,
-    0x4369e96a, 0x346ed9fc, 0xad678846, 0xda60b8d0,
-    0x44042d73, 0x33031de5, 0xaa0a4c5f, 0xdd0d7cc9,
-    0x5005713c, 0x270241aa, 0xbe0b1010, 0xc90c2086,
-    0x5768b525, 0x206f85b3, 0xb966d409, 0xce61e49f,
-    0x5edef90e, 0x29d9c998, 0xb0d09822, 0xc7d7a8b4,
-    0x59b33d17, 0x2eb40d81, 0xb7bd5c3b, 0xc0ba6cad,
-    0xedb88320, 0x9abfb3b6, 0x03b6e20c, 0x74b1d29a,
-    0xead54739, 0x9dd277af, 0x04db2615, 0x73dc1683,
-    0xe3630b12, 0x94643b84, 0x0d6d6a3e, 0x7a6a5aa8,
-    0xe40ecf0b, 0x9309ff9d, 0x0a00ae27, 0x7d079eb1,
-    0xf00f9344, 0x8708a3d2, 0x1e01f268, 0x6906c2fe,
-    0xf762575d, 0x806567cb, 0x196c3671, 0x6e6b06e7,
-    0xfed41b76, 0x89d32be0, 0x10da7a5a, 0x67dd4acc,
-    0xf9b9df6f, 0x8ebeeff9, 0x17b7be43, 0x60b08ed5,
-    0xd6d6a3e8, 0xa1d1937e, 0x38d8c2c4, 0x4fdff252,
-    0xd1bb67f1, 0xa6bc5767, 0x3fb506dd, 0x48b2364b,
-    0xd80d2bda, 0xaf0a1b4c, 0x36034af6, 0x41047a60,
-    0xdf60efc3, 0xa867df55, 0x316e8eef, 0x4669be79,
-    0xcb61b38c, 0xbc66831a, 0x256fd2a0, 0x5268e236,
-    0xcc0c7795, 0xbb0b4703, 0x220216b9, 0x5505262f,
-    0xc5ba3bbe, 0xb2bd0b28, 0x2bb45a92, 0x5cb36a04,
-    0xc2d7ffa7, 0xb5d0cf31, 0x2cd99e8b, 0x5bdeae1d,
-    0x9b64c2b0, 0xec63f226, 0x756aa39c, 0x026d930a,
-    0x9c0906a9, 0xeb0e363f, 0x72076785, 0x05005713,
-    0x95bf4a82, 0xe2b87a14, 0x7bb12bae, 0x0cb61b38,
-    0x92d28e9b, 0xe5d5be0d, 0x7cdcefb7, 0x0bdbdf21,
-    0x86d3d2d4, 0xf1d4e242, 0x68ddb3f8, 0x1fda836e,
-    0x81be16cd, 0xf6b9265b, 0x6fb077e1, 0x18b74777,
-    0x88085ae6, 0xff0f6a70, 0x66063bca, 0x11010b5c,
-    0x8f659eff, 0xf862ae69, 0x616bffd3, 0x166ccf45,
-    0xa00ae278, 0xd70dd2ee, 0x4e048354, 0x3903b3c2,
-    0xa7672661, 0xd06016f7, 0x4969474d, 0x3e6e77db,
-    0xaed16a4a, 0xd9d65adc, 0x40df0b66, 0x37d83bf0,
-    0xa9bcae53, 0xdebb9ec5, 0x47b2cf7f, 0x30b5ffe9,
-    0xbdbdf21c, 0xcabac28a, 0x53b39330, 0x24b4a3a6,
-    0xbad03605, 0xcdd70693, 0x54de5729, 0x23d967bf,
-    0xb3667a2e, 0xc4614ab8, 0x5d681b02, 0x2a6f2b94,
-    0xb40bbe37, 0xc30c8ea1, 0x5a05df1b, 0x2d02ef8d,
-]
+def _crc32(data):
+    # "slicing by 4": the bytes are processed four at a time, with one
+    # table per position in the word
+    crc = 0xFFFFFFFF
+    end = len(data) - len(data) % 4
+    i = 0
+    while i < end:
+        crc ^= (ord(data[i]) | (ord(data[i + 1]) << 8) |
+                (ord(data[i + 2]) << 16) | (ord(data[i + 3]) << 24))
+        crc = (CRC32_TABLE3[crc & 0xFF] ^
+               CRC32_TABLE2[(crc >> 8) & 0xFF] ^
+               CRC32_TABLE1[(crc >> 16) & 0xFF] ^
+               CRC32_TABLE0[(crc >> 24) & 0xFF])
+        i += 4
+    while i < len(data):
+        crc = (((crc >> 8) & 0x00FFFFFF) ^
+               CRC32_TABLE0[(crc ^ ord(data[i])) & 0xFF])
+        i += 1
+    return crc ^ 0xFFFFFFFF
 
 
 @wrap(['space', str])
 def crc32(space, data):
     """Calculates the crc32 polynomial of a string."""
-    # Implementation based on PHP's ext/standard/crc32.h
-    crc = 0xFFFFFFFF
-    for c in data:
-        crc = ((crc >> 8) & 0x00FFFFFF) ^ _crc32tab[(crc ^ ord(c)) & 0xFF]
-    crc ^= 0xFFFFFFFF
+    crc = _crc32(data)
 
     # PHP returns a value that depends on the platform. On 32 bits systems the
     # value is in the range [-2**31, 2**31-1] but on 64 bits systems it is in
@@ -623,17 +557,35 @@ def explode(space, delimiter, string, limit=sys.maxint):
     if len(delimiter) == 0:
         space.ec.warn("explode(): Empty delimiter")
         return space.w_False
-    if limit == sys.maxint:
-        result = string.split(delimiter)
+    if limit == sys.maxint or limit < 0:
+        bounds = _split_bounds(string, delimiter, -1)
+        if limit < 0:
+            end = max(limit + len(bounds) // 2, 0)
+            bounds = bounds[:2 * end]
     elif limit > 0:
-        result = string.split(delimiter, limit - 1)
-    elif limit == 0:
-        result = string.split(delimiter, 0)
+        bounds = _split_bounds(string, delimiter, limit - 1)
     else:
-        result = string.split(delimiter)
-        end = max(limit + len(result), 0)
-        result = result[:end]
-    return space.new_array_from_list([space.newstr(item) for item in result])
+        bounds = _split_bounds(string, delimiter, 0)
+    # the pieces are only made into strings when they are used
+    return space.new_array_from_split(string, bounds)
+
+
+def _split_bounds(string, delimiter, maxsplit):
+    """Like string.split(delimiter, maxsplit), but return the start and
+    stop of each piece instead of the pieces"""
+    bounds = []
+    start = 0
+    while maxsplit != 0:
+        pos = string.find(delimiter, start)
+        if pos < 0:
+            break
+        bounds.append(start)
+        bounds.append(pos)
+        start = pos + len(delimiter)
+        maxsplit -= 1
+    bounds.append(start)
+    bounds.append(len(string))
+    return bounds
 
 
 # @wrap(['space', FileResourceArg(False), str, 'args_w'])
@@ -690,10 +642,11 @@ def hex2bin(space, data):
 
     builder = StringBuilder(len(data) / 2)
     for i in xrange(0, len(data), 2):
-        if not is_hexdigit(data[i]) or not is_hexdigit(data[i + 1]):
+        hi = ord(HEX_VALUES[ord(data[i])])
+        lo = ord(HEX_VALUES[ord(data[i + 1])])
+        if (hi | lo) >= 16:
             return space.w_False
-        char = chr(hexdigit(data[i]) << 4 | hexdigit(data[i + 1]))
-        builder.append(char)
+        builder.append(chr((hi << 4) | lo))
 
     return space.newstr(builder.build())
 
@@ -771,17 +724,7 @@ def html_entity_decode(space,   html,   flags=2,   encoding='UTF-8'):
 def htmlentities(interp,  html,  flags=1, encoding='UTF8',
                  double_encode=True):
     """Convert all applicable characters to HTML entities."""
-
-    from rpython.rlib.runicode import str_decode_utf_8
-    from hippy.module.standard.strings.htmlentities import UTF8
-    outstr = StringBuilder()
-    s,  l = str_decode_utf_8(html,  len(html),  'ignore')
-    for c in s:
-        try:
-            outstr.append(UTF8[ord(c)])
-        except KeyError:
-            outstr.append(str(c))
-    return interp.space.newstr(outstr.build())
+    return interp.space.newstr(utf8_entities(html))
 
 
 def _htmlspecialchars_decode(space, html, flags):
@@ -889,52 +832,28 @@ def htmlspecialchars_decode(space, html, flags=2):
     return space.wrap(res)
 
 
-def _new_chars_to_replace(double_encode, single, double):
-    chars_to_replace = [chr(i) for i in range(256)]
-    chars_to_replace[ord('<')] = '&lt;'
-    chars_to_replace[ord('>')] = '&gt;'
-    if double_encode:
-        chars_to_replace[ord('&')] = '&amp;'
-    if single:
-        chars_to_replace[ord("'")] = "&#039;"
-    if double:
-        chars_to_replace[ord('"')] = "&quot;"
-    return chars_to_replace
-
-CHAR_REPLACE_TABLE = [None] * 16
-
-for double_encode in (True, False):
-    for single in (True, False):
-        for double in (True, False):
-            CHAR_REPLACE_TABLE[double_encode * 4 + single * 2 + double] = \
-              _new_chars_to_replace(double_encode, single, double)
-
-
 @wrap(['space', StringArg(), Optional(int), Optional(StringArg()),
        Optional(BoolArg())])
 def htmlspecialchars(space, html, flags=2, encoding='UTF-8',
                      double_encode=True):
     """Convert special characters to HTML entities.
     """
-    single = flags & 1 != 0
-    double = flags & 2 != 0
-    table = CHAR_REPLACE_TABLE[double_encode * 4 + single * 2 + double]
-    lgt = 0
-    for c in html:
-        lgt += len(table[ord(c)])
-    s = StringBuilder(lgt)
-    for c in html:
-        s.append(table[ord(c)])
-    return space.wrap(s.build())
+    table = specialchars_table(flags, double_encode)
+    return space.wrap(table.escape(html))
 
 
 def _implode(space, string, w_arr):
     iter = space.create_iter(w_arr)
-    values = []
+    builder = StringBuilder()
+    first = True
     while not iter.done():
         _, w_val = iter.next_item(space)
-        values.append(space.str_w(w_val))
-    return space.newstr(string.join(values))
+        if not first:
+            builder.append(string)
+        first = False
+        # without flattening the values that are ropes
+        space.as_string(w_val).append_to_builder(builder)
+    return space.newstr(builder.build())
 
 
 @wrap(['space', W_Root, Optional(W_Root)], aliases=['join'])
@@ -1154,12 +1073,13 @@ def parse_str(space,   to_parse,   w_arr=None):
             pass
         val = _urldecode(val)
         if var.endswith('[]'):
-            var = var.rstrip('[]')
+            var = intern_key(var.rstrip('[]'))
             if var in arrs:
                 arrs[var].append(space.wrap(val))
             else:
                 arrs[var] = [space.wrap(val)]
         else:
+            var = intern_key(var)
             frame.get_ref_by_name(var).store(space.wrap(val))
     for var,   val in arrs.items():
         frame.get_ref_by_name(var).store(space.new_array_from_list(val))
@@ -1188,252 +1108,34 @@ def format_str(_str, width=0, to_left=False,
 
 
 def _printf(space, format, args_w, caller):
-    no = 0
-    bits = 31 if sys.maxint == 2 ** 31 - 1 else 63
-    MASK = (2 << bits) - 1
-    # improve the estimate
-    builder = StringBuilder(len(format) + 5 * format.count('%'))
-    i = 0
-    while i < len(format):
-        c = format[i]
-        i += 1
-        res = ''
-        tmp = ''
-        if c == '%':
-            plus_sign = False
-            modifier = None
-            addjust_width = 0
-            precision = 0
-            prec_adjust = False
-            to_left = False
-            pad_char = ' '
-            w_arg = space.w_Null
-            e = 0
-
-            try:
-                next = format[i]
-                warn_if_unknown = True
-                i += 1
-            except IndexError:
-                next = '\x00'
-                warn_if_unknown = False
-                continue
-                # msg = "%s(): Trailing '%%' character" % caller
-                # if no < len(args_w):
-                #     msg += ", the next argument is going to be ignored"
-                # space.ec.hippy_warn(msg)
-
-            if next != '%':
-                if no == len(args_w):
-                    raise ValidationError("Too few arguments")
-                w_arg = args_w[no]
-                no += 1
-
-            while next == ' ':
-                next = format[i]
-                i += 1
-
-            if next == '%':
-                res = '%'
-
-            if next.isdigit() and format[i] == '$':
-                try:
-                    w_arg = args_w[int(next) - 1]
-                except IndexError:
-                    raise ValidationError("Too few arguments")
-
-                i += 1
-                next = format[i]
-                i += 1
-                no -= 1
-
-            if next in ['L', 'I', 'l', 'z', 'j', 't']:
-                modifier = next
-                next = format[i]
-                if next in ['l', 'h']:
-                    modifier += next
-                    i += 1
-                i += 1
-
-            if modifier == 'L':
-                builder.append(next)
-                continue
-
-            # if next in ['h']:
-            #     next = format[i]
-            #     i += 1
+    return _format(space, format_cache.get(format), args_w, caller)
 
-            if next == '-':
-                to_left = True
-                next = format[i]
-                i += 1
-            if next == '+':
-                plus_sign = True
-                next = format[i]
-                i += 1
-            # if next == '#':
-            #     # XXXX missing tests
-            #     next = format[i]
-            #     i += 1
-            if next == '0':
-                pad_char = '0'
-                next = format[i]
-                i += 1
-
-            if next == '\'':
-                next = format[i]
-                i += 1
-                pad_char = next
-                next = format[i]
-                i += 1
 
-            if next.isdigit():
-                p = ""
-                while next.isdigit():
-                    p += next
-                    next = format[i]
-                    i += 1
-                addjust_width = int(p)
-            # elif next == '*':
-            #     # XXXX missing tests
-            #     pass
-            if next == '.':
-                next = format[i]
-                i += 1
-                p = ""
-                while next.isdigit():
-                    p += next
-                    next = format[i]
-                    i += 1
-                try:
-                    precision = int(p)
-                    prec_adjust = True
-                except ValueError:
-                    pass
-
-            if plus_sign and space.float_w(w_arg) >= 0:
-                res = '+'
-            # binary
-            if next == 'b':
-                int_val = space.force_int(w_arg)
-                if int_val > 0:
-                    tmp = int_val
-                else:
-                    tmp = int_val & MASK
-                res = _bin(r_uint(int_val))
-
-            # char
-            if next == 'c':
-                int_val = space.int_w(w_arg)
-
-                try:
-                    builder.append(chr(int_val % 256))
-                    continue
-                except ValueError:
-                    pass
-            # decimal
-            if next == 'd':
-                int_val = space.int_w(w_arg)
-
-                if to_left and pad_char == '0':
-                    addjust_width = 0
-                res += str(int_val)
-            # exponant
-            if next == 'e' or next == 'E':
-                if not prec_adjust:
-                    precision = 6
-                f = space.float_w(w_arg)
-                _str, _ = double_to_string(f, next, precision,
-                                               DTSF_CUT_EXP_0)
-                res += _str
-            # unsigned
-            if next == 'u':
-                res = ''
-                try:
-                    int_val = intmask(int(space.float_w(w_arg)))
-                    if abs(int_val - space.float_w(w_arg)) > 1.0:
-                        int_val = 0
-                except OverflowError:
-                    int_val = 0
-                ui = r_uint(int_val)
-                res += str(ui)
-
-            # float
-            if next == 'f' or next == 'F':
-                f = space.float_w(w_arg)
-                if not prec_adjust:
-                    precision = 6
-                _str, _ = double_to_string(f, next, precision,
-                                           DTSF_CUT_EXP_0)
-                res += _str
-            # science
-            if next == 'g' or next == 'G':
-                if not prec_adjust:
-                    precision = 6
-                else:
-                    if precision == 0:
-                        precision = 1
-                f = space.float_w(w_arg)
-                _str, _ = double_to_string(f, next, precision,
-                                           DTSF_CUT_EXP_0)
-                if next == 'g':
-                    if 'e' in _str and '.' not in _str:
-                        a, b = _str.split('e')
-                        _str = a + '.0e' + b
-                else:
-                    if 'E' in _str and '.' not in _str:
-                        a, b = _str.split('E')
-                        _str = a + '.0E' + b
-                res += _str
-            # oct
-            if next == 'o':
-                int_val = space.int_w(w_arg)
-                _o = oct(int_val & MASK)
-                if int_val == 0:
-                    tmp = "0"
-                else:
-                    e = len(_o) - 1
-                    assert e >= 0
-                    tmp = _o[1:e]
-                if prec_adjust:
-                    tmp = ""
-                res = tmp
-            # string
-            if next == 's':
-                res = space.str_w(w_arg, quiet=True)
-            # hex
-            if next == 'x' or next == 'X':
-                int_val = space.int_w(w_arg)
-                if w_arg.tp == space.tp_str:
-                    int_val, _ = strtol(space.str_w(w_arg))
-
-                _h = hex(int_val & MASK)
-                e = len(_h) - 1
-                assert e >= 0
-
-                tmp = _h[2:e]
-                if next == 'X':
-                    tmp = tmp.upper()
-                if prec_adjust:
-                    tmp = ""
-                res = tmp
-
-            if res is not None and next != ' ':
-                cutoff = 0
-                if next == 's':
-                    cutoff = precision
-                res = format_str(res,
-                                 width=addjust_width,
-                                 to_left=to_left,
-                                 pad_char=pad_char,
-                                 cutoff=cutoff)
-                builder.append(res)
-                continue
-            elif warn_if_unknown:
-                space.ec.hippy_warn("%s(): Unknown format char %%%s, "
-                        "ignoring corresponding argument" % (caller, next))
+@jit.look_inside_iff(lambda space, compiled, args_w, caller:
+                     jit.isconstant(compiled))
+def _format(space, compiled, args_w, caller):
+    no = 0
+    builder = StringBuilder(compiled.estimate)
+    for k in range(len(compiled.specs)):
+        builder.append(compiled.pieces[k])
+        spec = compiled.specs[k]
+        if no == len(args_w):
+            raise ValidationError("Too few arguments")
+        w_arg = args_w[no]
+        no += 1
+        if spec.argnum != NO_ARGNUM:
+            index = spec.argnum
+            if index < 0:
+                index += len(args_w)    # "0$" is the last argument
+            if index < 0 or index >= len(args_w):
+                raise ValidationError("Too few arguments")
+            w_arg = args_w[index]
+            no -= 1
+        if spec.emit_char:
+            builder.append(spec.conversion)
         else:
-            builder.append(c)
+            _format_directive(space, spec, w_arg, caller, builder)
+    builder.append(compiled.pieces[len(compiled.specs)])
     # if no < len(args_w):
     #     space.ec.hippy_warn("%s(): Too many arguments passed, "
     #             "ignoring the %d extra" % (caller, len(args_w) - no,))
@@ -1441,6 +1143,145 @@ def _printf(space, format, args_w, caller):
     return s
 
 
+def _format_directive(space, spec, w_arg, caller, builder):
+    bits = 31 if sys.maxint == 2 ** 31 - 1 else 63
+    MASK = (2 << bits) - 1
+    next = spec.conversion
+    plus_sign = spec.plus_sign
+    addjust_width = spec.width
+    precision = spec.precision
+    prec_adjust = spec.prec_adjust
+    to_left = spec.to_left
+    pad_char = spec.pad_char
+    res = ''
+    tmp = ''
+    e = 0
+
+    if spec.percent:
+        res = '%'
+
+    if plus_sign and space.float_w(w_arg) >= 0:
+        res = '+'
+    # binary
+    if next == 'b':
+        int_val = space.force_int(w_arg)
+        if int_val > 0:
+            tmp = int_val
+        else:
+            tmp = int_val & MASK
+        res = _bin(r_uint(int_val))
+
+    # char
+    if next == 'c':
+        int_val = space.int_w(w_arg)
+
+        try:
+            builder.append(chr(int_val % 256))
+            return
+        except ValueError:
+            pass
+    # decimal
+    if next == 'd':
+        int_val = space.int_w(w_arg)
+
+        if to_left and pad_char == '0':
+            addjust_width = 0
+        res += str(int_val)
+    # exponant
+    if next == 'e' or next == 'E':
+        if not prec_adjust:
+            precision = 6
+        f = space.float_w(w_arg)
+        _str, _ = double_to_string(f, next, precision,
+                                       DTSF_CUT_EXP_0)
+        res += _str
+    # unsigned
+    if next == 'u':
+        res = ''
+        try:
+            int_val = intmask(int(space.float_w(w_arg)))
+            if abs(int_val - space.float_w(w_arg)) > 1.0:
+                int_val = 0
+        except OverflowError:
+            int_val = 0
+        ui = r_uint(int_val)
+        res += str(ui)
+
+    # float
+    if next == 'f' or next == 'F':
+        f = space.float_w(w_arg)
+        if not prec_adjust:
+            precision = 6
+        _str, _ = double_to_string(f, next, precision,
+                                   DTSF_CUT_EXP_0)
+        res += _str
+    # science
+    if next == 'g' or next == 'G':
+        if not prec_adjust:
+            precision = 6
+        else:
+            if precision == 0:
+                precision = 1
+        f = space.float_w(w_arg)
+        _str, _ = double_to_string(f, next, precision,
+                                   DTSF_CUT_EXP_0)
+        if next == 'g':
+            if 'e' in _str and '.' not in _str:
+                a, b = _str.split('e')
+                _str = a + '.0e' + b
+        else:
+            if 'E' in _str and '.' not in _str:
+                a, b = _str.split('E')
+                _str = a + '.0E' + b
+        res += _str
+    # oct
+    if next == 'o':
+        int_val = space.int_w(w_arg)
+        _o = oct(int_val & MASK)
+        if int_val == 0:
+            tmp = "0"
+        else:
+            e = len(_o) - 1
+            assert e >= 0
+            tmp = _o[1:e]
+        if prec_adjust:
+            tmp = ""
+        res = tmp
+    # string
+    if next == 's':
+        res = space.str_w(w_arg, quiet=True)
+    # hex
+    if next == 'x' or next == 'X':
+        int_val = space.int_w(w_arg)
+        if w_arg.tp == space.tp_str:
+            int_val, _ = strtol(space.str_w(w_arg))
+
+        _h = hex(int_val & MASK)
+        e = len(_h) - 1
+        assert e >= 0
+
+        tmp = _h[2:e]
+        if next == 'X':
+            tmp = tmp.upper()
+        if prec_adjust:
+            tmp = ""
+        res = tmp
+
+    if res is not None and next != ' ':
+        cutoff = 0
+        if next == 's':
+            cutoff = precision
+        res = format_str(res,
+                         width=addjust_width,
+                         to_left=to_left,
+                         pad_char=pad_char,
+                         cutoff=cutoff)
+        builder.append(res)
+    else:
+        space.ec.hippy_warn("%s(): Unknown format char %%%s, "
+                "ignoring corresponding argument" % (caller, next))
+
+
 @wrap(['space', W_Root, 'args_w'], error=False)
 def printf(space, w_obj, args_w):
     """Output a formatted string."""
@@ -1755,49 +1596,49 @@ def str_repeat(space, s, repeat):
 def _do_replace(search, replace, subject, case_insensitive):
     if len(search) == 0:
         return subject, 0
-    if case_insensitive:
-        search = locale.lower(search)
-        normalize = locale.lower_char
-    else:
-        normalize = lambda s: s
-    s = StringBuilder(len(subject))
-    i = 0
-    j = 0
-    count = 0
-    while i < len(subject):
-        i0 = i
-        j = 0
-        while j < len(search):
-            if i >= len(subject):
-                s.append(subject[i0:])
-                break
-            if normalize(subject[i]) == search[j]:
-                i += 1
-                j += 1
-                continue
-            else:
-                s.append(subject[i0])
-                i = i0 + 1
-                break
-        else:
-            s.append(replace)
-            count += 1
-            j = 0
-    return s.build(), count
+    return Searcher(search, case_insensitive).replace(subject, replace)
+
+
+def _replacer_for(searches, repls, case_insensitive):
+    """Return a MultiReplacer doing all the replacements in one pass, or
+    None if that would not give the same result as doing them one after
+    the other."""
+    patterns = []
+    replacements = []
+    for i in range(len(searches)):
+        search = searches[i]
+        if len(search) == 0:
+            continue     # replaces nothing
+        if case_insensitive:
+            search = locale.lower(search)
+        patterns.append(search)
+        replacements.append(repls[i])
+    if len(patterns) < 2:
+        return None
+    replacer = replacer_cache.get(patterns, replacements, case_insensitive)
+    if not replacer.is_independent():
+        return None
+    return replacer
 
 
 def _str_xreplace_item(space, w_search, w_replace, subject, w_count,
         case_insensitive):
     if w_search.tp == space.tp_array:
-        count = 0
-        s = subject
         search_iter = space.create_iter(w_search)
         n_search = space.arraylen(w_search)
         repls = _broadcast_as_list(space, w_replace, n_search, "", space.str_w)
+        searches = []
         for i in range(n_search):
             _, w_val = search_iter.next_item(space)
-            search = space.str_w(w_val)
-            s, _count = _do_replace(search, repls[i], s, case_insensitive)
+            searches.append(space.str_w(w_val))
+        replacer = _replacer_for(searches, repls, case_insensitive)
+        if replacer is not None:
+            return replacer.replace(subject)
+        count = 0
+        s = subject
+        for i in range(n_search):
+            s, _count = _do_replace(searches[i], repls[i], s,
+                                    case_insensitive)
             count += _count
         return s, count
     else:
@@ -1885,12 +1726,13 @@ def str_split(interp, s, split_length=1):
         interp.warn("str_split(): The length of each segment must "
                     "be greater than zero")
         return space.w_False
-    l_w = []
-    for i in range(len(s) // split_length + 1):
-        part = s[i * split_length:(i + 1) * split_length]
-        if part:
-                l_w.append(space.wrap(part))
-    return space.new_array_from_list(l_w)
+    bounds = []
+    start = 0
+    while start < len(s):
+        bounds.append(start)
+        start = min(start + split_length, len(s))
+        bounds.append(start)
+    return space.new_array_from_split(s, bounds)
 
 #
 #@wrap(['space', 'args_w'])
@@ -1955,7 +1797,7 @@ def stripos(space, haystack, w_needle, offset=0):
     if len(needle) == 0:
         return space.w_False
 
-    result = locale.lower(haystack).find(locale.lower(needle), offset)
+    result = Searcher(needle, True).find(haystack, offset)
     if result == -1:
         return space.w_False
     return space.newint(result)
@@ -1972,9 +1814,7 @@ def stristr(space, haystack, w_needle, before_needle=False):
     if len(needle) == 0:
         space.ec.warn("stristr(): Empty needle")
         return space.w_False
-    needle = locale.lower(needle)
-    hay_lower = locale.lower(haystack)
-    pos = hay_lower.find(needle)
+    pos = Searcher(needle, True).find(haystack)
     if pos < 0:
         return space.w_False
     if before_needle:
@@ -2359,10 +2199,10 @@ def strtr(space, string, w_from, to=None):
         if not string:
             return space.newstr(string)
         try:
-            pairs = _pairs_from_array(space, w_from)
+            keys, values = _pairs_from_array(space, w_from)
         except ValidationError:
             return space.w_False
-        return space.newstr(_apply_replacement(pairs, string))
+        return space.newstr(_apply_replacement(keys, values, string))
     else:
         if not string:
             return space.newstr(string)
@@ -2415,7 +2255,7 @@ def substr_count(space, haystack, needle, num_args, offset=0,
                 'Offset value %d exceeds string length' % offset)
         return space.w_False
     if num_args <= 3:
-        return space.newint(haystack[offset:].count(needle))
+        return space.newint(haystack.count(needle, offset, len(haystack)))
     elif length <= 0:
         space.ec.warn('substr_count(): '
                 'Length should be greater than 0')
@@ -2425,7 +2265,8 @@ def substr_count(space, haystack, needle, num_args, offset=0,
         space.ec.warn('substr_count(): '
                 'Length value %d exceeds string length' % length)
         return space.w_False
-    return space.newint(haystack[offset:end].count(needle))
+    assert end >= 0
+    return space.newint(haystack.count(needle, offset, end))
 
 
 def _substr_replace(string, replacement, start, length):
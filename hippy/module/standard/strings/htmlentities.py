@@ -1,3 +1,14 @@
+""" Escaping for htmlspecialchars() and htmlentities().
+
+The replacement of each byte is looked up in a precomputed table of 256
+entries.  The special characters are all ASCII, so the same tables work
+for every ASCII-compatible charset.  Strings that contain nothing to
+escape, which is the common case in templates, are only scanned and
+returned as they are.
+"""
+
+from rpython.rlib.rstring import StringBuilder
+from rpython.rlib.runicode import str_decode_utf_8, unicode_encode_utf_8
 
 UTF8 = {
     34: '&quot;',
@@ -255,3 +266,112 @@ UTF8 = {
     9829: '&hearts;',
     9830: '&diams;',
 }
+
+
+class EscapeTable(object):
+    """The replacement of each of the 256 characters"""
+    _immutable_fields_ = ['replacements[*]', 'escaped[*]']
+
+    def __init__(self, replacements):
+        assert len(replacements) == 256
+        self.replacements = replacements
+        self.escaped = [replacements[i] != chr(i) for i in range(256)]
+
+    def find_escaped(self, s, start):
+        """Return the index of the first character of s[start:] that
+        must be replaced, or len(s)"""
+        i = start
+        while i < len(s) and not self.escaped[ord(s[i])]:
+            i += 1
+        return i
+
+    def escape(self, s):
+        """Return 's' with its characters replaced; that is 's' itself
+        when there is nothing to replace"""
+        i = self.find_escaped(s, 0)
+        if i == len(s):
+            return s
+        builder = StringBuilder(len(s) + 32)
+        start = 0
+        while i < len(s):
+            builder.append_slice(s, start, i)
+            builder.append(self.replacements[ord(s[i])])
+            start = i + 1
+            i = self.find_escaped(s, start)
+        builder.append_slice(s, start, len(s))
+        return builder.build()
+
+
+def _specialchars_replacements(double_encode, single, double):
+    replacements = [chr(i) for i in range(256)]
+    replacements[ord('<')] = '&lt;'
+    replacements[ord('>')] = '&gt;'
+    if double_encode:
+        replacements[ord('&')] = '&amp;'
+    if single:
+        replacements[ord("'")] = "&#039;"
+    if double:
+        replacements[ord('"')] = "&quot;"
+    return replacements
+
+SPECIALCHARS_TABLES = [None] * 8
+
+for double_encode in (True, False):
+    for single in (True, False):
+        for double in (True, False):
+            SPECIALCHARS_TABLES[double_encode * 4 + single * 2 + double] = \
+                EscapeTable(_specialchars_replacements(double_encode, single,
+                                                       double))
+
+
+def specialchars_table(flags, double_encode):
+    single = flags & 1 != 0
+    double = flags & 2 != 0
+    return SPECIALCHARS_TABLES[double_encode * 4 + single * 2 + double]
+
+
+def _entities_replacements():
+    # the ASCII entities; all the bytes of UTF-8 sequences are escaped,
+    # to be decoded by utf8_entities()
+    replacements = [chr(i) for i in range(256)]
+    for i in range(128):
+        if i in UTF8:
+            replacements[i] = UTF8[i]
+    for i in range(128, 256):
+        replacements[i] = ''
+    return replacements
+
+ENTITIES_TABLE = EscapeTable(_entities_replacements())
+
+
+def utf8_entities(s):
+    """htmlentities() of the UTF-8 string 's'.  Invalid sequences are
+    dropped."""
+    table = ENTITIES_TABLE
+    i = table.find_escaped(s, 0)
+    if i == len(s):
+        return s
+    builder = StringBuilder(len(s) + 32)
+    start = 0
+    while i < len(s):
+        builder.append_slice(s, start, i)
+        if ord(s[i]) < 128:
+            builder.append(table.replacements[ord(s[i])])
+            i += 1
+        else:
+            # a run of non-ASCII characters
+            start = i
+            while i < len(s) and ord(s[i]) >= 128:
+                i += 1
+            run = s[start:i]
+            u, _ = str_decode_utf_8(run, len(run), 'ignore', final=True)
+            for uc in u:
+                entity = UTF8.get(ord(uc), None)
+                if entity is not None:
+                    builder.append(entity)
+                else:
+                    builder.append(unicode_encode_utf_8(uc, 1, 'strict'))
+        start = i
+        i = table.find_escaped(s, i)
+    builder.append_slice(s, start, len(s))
+    return builder.build()
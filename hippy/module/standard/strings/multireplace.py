@@ -0,0 +1,216 @@
+""" Replacing a whole table of strings in a single pass over the subject.
+
+strtr() with an array, and str_replace() with an array of search strings,
+look for many strings at every position of the subject.  Instead of
+trying them one by one, we build an Aho-Corasick automaton from the table
+and find all of them in one left-to-right scan, without allocating
+anything per position.  Building the automaton costs about the total
+length of the table, so the automatons are cached, keyed by the contents
+of the table (arrays can be modified in place, so their identity is not
+enough).
+"""
+
+from rpython.rlib.rstring import StringBuilder
+
+from hippy import localemodule as locale
+
+MAX_CACHED = 64
+
+
+class MultiReplacer(object):
+    """An Aho-Corasick automaton for the non-empty strings 'patterns'.
+    With 'case_insensitive', the patterns must already be lowercase.
+
+    replace() replaces, from left to right, the longest pattern starting
+    at the leftmost position where one is found, like strtr() does.
+    """
+
+    def __init__(self, patterns, replacements, case_insensitive=False):
+        assert len(patterns) == len(replacements)
+        self.patterns = patterns
+        self.replacements = replacements
+        self.case_insensitive = case_insensitive
+        self.children = [{}]   # state -> {char: state}
+        self.fail = [0]
+        self.depth = [0]
+        self.match = [-1]      # longest pattern that ends here, or -1
+        self.root = [0] * 256  # the transitions of the root, as a table
+        self.has_duplicates = False
+        self._independent = -1
+        for i in range(len(patterns)):
+            self._add(patterns[i], i)
+        self._link()
+
+    def _add(self, pattern, index):
+        assert len(pattern) > 0
+        state = 0
+        for c in pattern:
+            nxt = self.children[state].get(c, -1)
+            if nxt < 0:
+                nxt = len(self.children)
+                self.children.append({})
+                self.fail.append(0)
+                self.depth.append(self.depth[state] + 1)
+                self.match.append(-1)
+                self.children[state][c] = nxt
+            state = nxt
+        if self.match[state] >= 0:
+            self.has_duplicates = True
+        else:
+            self.match[state] = index
+
+    def _link(self):
+        # breadth-first, so that the failure link of a state always points
+        # to a state whose own links are already computed
+        queue = []
+        for c, child in self.children[0].items():
+            self.root[ord(c)] = child
+            queue.append(child)
+        i = 0
+        while i < len(queue):
+            state = queue[i]
+            i += 1
+            for c, child in self.children[state].items():
+                fail = self._next(self.fail[state], c)
+                self.fail[child] = fail
+                if self.match[child] < 0:
+                    self.match[child] = self.match[fail]
+                queue.append(child)
+
+    def _next(self, state, c):
+        while state != 0:
+            nxt = self.children[state].get(c, -1)
+            if nxt >= 0:
+                return nxt
+            state = self.fail[state]
+        return self.root[ord(c)]
+
+    def replace(self, string):
+        """Return the replaced string and the number of replacements"""
+        builder = StringBuilder(len(string))
+        count = 0
+        emitted = 0       # string[:emitted] is already done
+        i = 0
+        state = 0
+        found = -1        # the best pattern found so far, starting at...
+        found_start = 0
+        if self.case_insensitive:
+            fold = locale.lower_table()
+        else:
+            fold = None
+        while True:
+            if i == len(string):
+                if found < 0:
+                    break
+            else:
+                c = string[i]
+                if fold is not None:
+                    c = fold[ord(c)]
+                state = self._next(state, c)
+                i += 1
+                m = self.match[state]
+                if m >= 0:
+                    length = len(self.patterns[m])
+                    start = i - length
+                    if (found < 0 or start < found_start or
+                            (start == found_start and
+                             length > len(self.patterns[found]))):
+                        found = m
+                        found_start = start
+                if found < 0 or i - self.depth[state] <= found_start:
+                    # no match yet, or a better one could still be found
+                    continue
+            builder.append_slice(string, emitted, found_start)
+            builder.append(self.replacements[found])
+            count += 1
+            emitted = found_start + len(self.patterns[found])
+            # scan again what follows the match, from the root
+            i = emitted
+            state = 0
+            found = -1
+        if count == 0:
+            return string, 0
+        builder.append_slice(string, emitted, len(string))
+        return builder.build(), count
+
+    def is_independent(self):
+        """Whether replacing the patterns one after the other, as
+        str_replace() does, gives the same result as replace().  This is
+        the case if no pattern can overlap another one, or the
+        replacement of a pattern that comes before it."""
+        if self._independent < 0:
+            if self._check_independent():
+                self._independent = 1
+            else:
+                self._independent = 0
+        return self._independent == 1
+
+    def _check_independent(self):
+        if self.has_duplicates:
+            return False
+        patterns = self.patterns
+        for j in range(len(patterns)):
+            for i in range(len(patterns)):
+                if i != j and (patterns[j].find(patterns[i]) >= 0 or
+                               _suffix_is_prefix(patterns[i], patterns[j])):
+                    return False
+        for i in range(len(patterns)):
+            replacement = self.replacements[i]
+            if self.case_insensitive:
+                replacement = locale.lower(replacement)
+            for j in range(i + 1, len(patterns)):
+                if _touches(replacement, patterns[j]):
+                    return False
+        return True
+
+
+def _suffix_is_prefix(a, b):
+    """Is a non-empty suffix of 'a' also a prefix of 'b'?  This includes
+    'b' being a suffix of 'a', and 'a' a prefix of 'b'."""
+    for k in range(1, min(len(a), len(b)) + 1):
+        if a.endswith(b[:k]):
+            return True
+    return False
+
+
+def _touches(replacement, pattern):
+    """Can 'pattern' be found in a string after 'replacement' was put in
+    it, where it could not be found before?"""
+    if not replacement:
+        # the text on both sides becomes adjacent
+        return len(pattern) > 1
+    return (replacement.find(pattern) >= 0 or
+            pattern.find(replacement) >= 0 or
+            _suffix_is_prefix(replacement, pattern) or
+            _suffix_is_prefix(pattern, replacement))
+
+
+def _make_key(patterns, replacements, case_insensitive):
+    builder = StringBuilder()
+    if case_insensitive:
+        builder.append('i')
+    else:
+        builder.append('s')
+    for i in range(len(patterns)):
+        for s in [patterns[i], replacements[i]]:
+            builder.append(str(len(s)))
+            builder.append(':')
+            builder.append(s)
+    return builder.build()
+
+
+class ReplacerCache(object):
+    def __init__(self):
+        self.replacers = {}
+
+    def get(self, patterns, replacements, case_insensitive=False):
+        key = _make_key(patterns, replacements, case_insensitive)
+        replacer = self.replacers.get(key, None)
+        if replacer is None:
+            if len(self.replacers) >= MAX_CACHED:
+                self.replacers.clear()
+            replacer = MultiReplacer(patterns, replacements, case_insensitive)
+            self.replacers[key] = replacer
+        return replacer
+
+replacer_cache = ReplacerCache()
@@ -0,0 +1,172 @@
+""" Compiled format strings for the printf() family.
+
+A format string is parsed once into a CompiledFormat: the literal text
+between the directives, and a FormatSpec for each directive.  Formatting
+is then a loop over the precompiled directives (see _printf() in
+funcs.py).  The compiled formats are kept in a bounded LRU cache; the
+lookup of a constant format is elidable, so that for the JIT a literal
+format costs nothing and the loop over its directives is unrolled.
+"""
+
+from rpython.rlib.rstring import StringBuilder
+
+from hippy.lru_cache import LRUCache, LRUEntry
+
+DEFAULT_CACHE_SIZE = 256
+NO_ARGNUM = -2
+
+
+class FormatSpec(object):
+    """One directive of a format string, e.g. "%-08.3f" or "%2$s"."""
+    _immutable_ = True
+
+    def __init__(self, conversion, percent, argnum, emit_char, to_left,
+                 plus_sign, pad_char, width, precision, prec_adjust):
+        self.conversion = conversion    # the conversion character
+        self.percent = percent          # "% %": start from a '%'
+        self.argnum = argnum            # explicit "n$" minus one
+        self.emit_char = emit_char      # "%L": output 'conversion' as is
+        self.to_left = to_left
+        self.plus_sign = plus_sign
+        self.pad_char = pad_char
+        self.width = width
+        self.precision = precision
+        self.prec_adjust = prec_adjust  # was a precision given?
+
+
+class CompiledFormat(object):
+    """The output is pieces[0], then the result of specs[0], then
+    pieces[1], and so on: there is one more piece than specs."""
+    _immutable_fields_ = ['pieces[*]', 'specs[*]', 'estimate']
+
+    def __init__(self, pieces, specs):
+        assert len(pieces) == len(specs) + 1
+        self.pieces = pieces
+        self.specs = specs
+        # an estimate of the length of the result
+        self.estimate = 5 * len(specs)
+        for piece in pieces:
+            self.estimate += len(piece)
+
+
+def _char_at(format, i):
+    if i < len(format):
+        return format[i]
+    return '\x00'
+
+
+def compile_format(format):
+    pieces = []
+    specs = []
+    literal = StringBuilder()
+    i = 0
+    while i < len(format):
+        c = format[i]
+        i += 1
+        if c != '%':
+            literal.append(c)
+            continue
+        if i == len(format):
+            # a trailing '%' is ignored
+            continue
+        next = format[i]
+        i += 1
+        if next == '%':
+            literal.append('%')
+            continue
+        # from here, the directive consumes an argument, even if it turns
+        # out to be "% %"
+        while next == ' ':
+            next = _char_at(format, i)
+            i += 1
+        percent = next == '%'
+        argnum = NO_ARGNUM
+        if next.isdigit() and _char_at(format, i) == '$':
+            argnum = ord(next) - ord('0') - 1
+            i += 1
+            next = _char_at(format, i)
+            i += 1
+        modifier = ''
+        if next in 'LIlzjt':
+            modifier = next
+            next = _char_at(format, i)
+            if next == 'l' or next == 'h':
+                modifier += next
+                i += 1
+            i += 1
+        to_left = False
+        plus_sign = False
+        pad_char = ' '
+        width = 0
+        precision = 0
+        prec_adjust = False
+        emit_char = modifier == 'L'
+        if not emit_char:
+            if next == '-':
+                to_left = True
+                next = _char_at(format, i)
+                i += 1
+            if next == '+':
+                plus_sign = True
+                next = _char_at(format, i)
+                i += 1
+            if next == '0':
+                pad_char = '0'
+                next = _char_at(format, i)
+                i += 1
+            if next == '\'':
+                pad_char = _char_at(format, i)
+                next = _char_at(format, i + 1)
+                i += 2
+            if next.isdigit():
+                start = i - 1
+                while next.isdigit():
+                    next = _char_at(format, i)
+                    i += 1
+                stop = i - 1
+                assert stop >= start >= 0
+                width = int(format[start:stop])
+            if next == '.':
+                next = _char_at(format, i)
+                i += 1
+                start = i - 1
+                while next.isdigit():
+                    next = _char_at(format, i)
+                    i += 1
+                stop = i - 1
+                assert stop >= start >= 0
+                if stop > start:
+                    precision = int(format[start:stop])
+                    prec_adjust = True
+        pieces.append(literal.build())
+        literal = StringBuilder()
+        specs.append(FormatSpec(next, percent, argnum, emit_char, to_left,
+                                plus_sign, pad_char, width, precision,
+                                prec_adjust))
+    pieces.append(literal.build())
+    return CompiledFormat(pieces, specs)
+
+
+class _Entry(LRUEntry):
+    def __init__(self, format, compiled):
+        LRUEntry.__init__(self, format)
+        self.compiled = compiled
+
+
+class FormatCache(LRUCache):
+    """A bounded cache of compiled formats, evicting the least recently
+    used one (see hippy.lru_cache)."""
+
+    def __init__(self, capacity=DEFAULT_CACHE_SIZE):
+        LRUCache.__init__(self, capacity)
+
+    def get(self, format):
+        """Return the CompiledFormat of 'format', compiling it if needed"""
+        entry = self.lookup(format)
+        if entry is None:
+            entry = _Entry(format, compile_format(format))
+            self.add(entry)
+        assert isinstance(entry, _Entry)
+        return entry.compiled
+
+format_cache = FormatCache()
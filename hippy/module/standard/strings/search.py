@@ -0,0 +1,101 @@
+""" Searching for a fixed substring.
+
+For the case-sensitive search, str.find() and str.count() are already
+implemented by RPython with a Horspool variant (see ll_search), so we use
+them directly.  The case-insensitive functions used to lowercase the whole
+subject before searching it, which allocates a copy and calls tolower()
+once per character.  Instead, Searcher lowercases the needle once and
+runs Horspool on the subject, folding each character it looks at with a
+256-entry table of the current locale.
+"""
+
+from rpython.rlib.rstring import StringBuilder
+
+from hippy import localemodule as locale
+
+
+class Searcher(object):
+    """Finds the non-empty string 'needle' in other strings"""
+
+    def __init__(self, needle, case_insensitive=False):
+        assert len(needle) > 0
+        if case_insensitive:
+            self.fold = locale.lower_table()
+            builder = StringBuilder(len(needle))
+            for c in needle:
+                builder.append(self.fold[ord(c)])
+            needle = builder.build()
+            # how far the needle can be moved when the character of the
+            # subject under its last character is 'c'
+            m = len(needle)
+            self.skip = [m] * 256
+            for i in range(m - 1):
+                self.skip[ord(needle[i])] = m - 1 - i
+        else:
+            self.fold = None
+            self.skip = None
+        self.needle = needle
+
+    def find(self, haystack, start=0, end=-1):
+        """Return the position of the first occurrence of the needle in
+        haystack[start:end], or -1"""
+        if end < 0 or end > len(haystack):
+            end = len(haystack)
+        assert start >= 0
+        if self.fold is None:
+            return haystack.find(self.needle, start, end)
+        return self._find_folded(haystack, start, end)
+
+    def _find_folded(self, haystack, start, end):
+        needle = self.needle
+        fold = self.fold
+        last = len(needle) - 1
+        last_char = needle[last]
+        i = start + last
+        while i < end:
+            c = fold[ord(haystack[i])]
+            if c == last_char:
+                j = last - 1
+                k = i - 1
+                while j >= 0 and fold[ord(haystack[k])] == needle[j]:
+                    j -= 1
+                    k -= 1
+                if j < 0:
+                    return i - last
+            i += self.skip[ord(c)]
+        return -1
+
+    def count(self, haystack, start=0, end=-1):
+        """Count the non-overlapping occurrences of the needle in
+        haystack[start:end]"""
+        if end < 0 or end > len(haystack):
+            end = len(haystack)
+        assert start >= 0
+        if self.fold is None:
+            return haystack.count(self.needle, start, end)
+        count = 0
+        while True:
+            pos = self._find_folded(haystack, start, end)
+            if pos < 0:
+                return count
+            count += 1
+            start = pos + len(self.needle)
+
+    def replace(self, subject, replacement):
+        """Replace all the non-overlapping occurrences of the needle, from
+        left to right.  Return the new string and the number of
+        replacements."""
+        pos = self.find(subject)
+        if pos < 0:
+            return subject, 0
+        builder = StringBuilder(len(subject))
+        count = 0
+        start = 0
+        while pos >= 0:
+            builder.append_slice(subject, start, pos)
+            builder.append(replacement)
+            count += 1
+            start = pos + len(self.needle)
+            pos = self.find(subject, start)
+        builder.append_slice(subject, start, len(subject))
+        return builder.build(), count
@@ -4,6 +4,8 @@ from hippy.builtin import StringArg
 from hippy.builtin import BoolArg
 from hippy.module.base64 import b64_decode
 from hippy.module.base64 import b64_encode
+from hippy.module.bytetables import (HEX_PAIRS_UPPER, HEX_VALUES,
+    RAWURL_ESCAPES, URL_ESCAPES)
 from rpython.rlib.rstring import StringBuilder
 from rpython.rlib.unroll import unrolling_iterable
 from collections import OrderedDict
@@ -334,54 +336,38 @@ def parse_url(space, url, component=-1):
         return space.newstr(res.sanitize(res.fragment))
     assert False
 
-HEXCHARS = ['0', '1', '2', '3', '4', '5', '6', '7',
-            '8', '9', 'A', 'B', 'C', 'D', 'E', 'F']
-
-
-def _ishexdigit(c):
-    if '0' <= c <= '9' or\
-       'A' <= c <= 'F' or\
-       'a' <= c <= 'f':
-        return True
-    return False
-
-
-def _rawurlencode(url):
+def _escape(url, escapes, plus):
+    # the runs of characters that need no escaping are copied in one go
     res = StringBuilder(len(url))
-    for c in url:
-        if (c < '0' and c != '-' and c != '.') or \
-           (c < 'A' and c > '9') or \
-           (c > 'Z' and c < 'a' and c != '_') \
-           or (c > 'z' and c != '~'):
-            res.append('%')
-            res.append(HEXCHARS[ord(c) >> 4])
-            res.append(HEXCHARS[ord(c) & 15])
+    start = 0
+    for i in range(len(url)):
+        c = url[i]
+        if escapes[ord(c)] == '\x00':
+            continue
+        res.append_slice(url, start, i)
+        if plus and c == ' ':
+            res.append('+')
         else:
-            res.append(c)
+            n = 2 * ord(c)
+            res.append('%')
+            res.append(HEX_PAIRS_UPPER[n])
+            res.append(HEX_PAIRS_UPPER[n + 1])
+        start = i + 1
+    res.append_slice(url, start, len(url))
     return res.build()
 
 
+def _rawurlencode(url):
+    return _escape(url, RAWURL_ESCAPES, False)
+
+
 @wrap(['space',   StringArg(None)])
 def rawurlencode(space,   url):
     return space.wrap(_rawurlencode(url))
 
 
 def _urlencode(url):
-    res = StringBuilder(len(url))
-    for c in url:
-        if c == ' ':
-            res.append('+')
-            continue
-        if (c < '0' and c != '-' and c != '.') or \
-           (c < 'A' and c > '9') or \
-           (c > 'Z' and c < 'a' and c != '_') \
-           or (c > 'z'):
-            res.append('%')
-            res.append(HEXCHARS[ord(c) >> 4])
-            res.append(HEXCHARS[ord(c) & 15])
-        else:
-            res.append(c)
-    return res.build()
+    return _escape(url, URL_ESCAPES, True)
 
 
 @wrap(['space',   StringArg(None)])
@@ -389,47 +375,41 @@ def urlencode(space,   url):
     return space.wrap(_urlencode(url))
 
 
-def _decode(c):
-    if 'a' <= c <= 'f':
-        return ord(c) - ord('a') + 10
-    if 'A' <= c <= 'F':
-        return ord(c) - ord('A') + 10
-    return ord(c) - ord('0')
-
-
-def _rawurldecode(url):
-    res = StringBuilder(len(url))
+def _unescape(url, plus):
     l = len(url)
+    res = StringBuilder(l)
+    start = 0
     i = 0
     while i < l:
         c = url[i]
-        if (c == '%' and (i < l - 2) and _ishexdigit(url[i + 1]) and _ishexdigit(url[i + 2])):
-            k = (_decode(url[i + 1]) << 4) + _decode(url[i + 2])
-            res.append(chr(k))
-            i += 3
-        else:
-            res.append(url[i])
-            i += 1
+        if c == '%' and i < l - 2:
+            hi = ord(HEX_VALUES[ord(url[i + 1])])
+            lo = ord(HEX_VALUES[ord(url[i + 2])])
+            if (hi | lo) < 16:
+                res.append_slice(url, start, i)
+                res.append(chr((hi << 4) | lo))
+                i += 3
+                start = i
+                continue
+        elif plus and c == '+':
+            res.append_slice(url, start, i)
+            res.append(' ')
+            start = i + 1
+        i += 1
+    res.append_slice(url, start, l)
     return res.build()
 
 
+def _rawurldecode(url):
+    if url.find('%') < 0:
+        return url
+    return _unescape(url, False)
+
+
 def _urldecode(url):
-    res = StringBuilder(len(url))
-    l = len(url)
-    i = 0
-    while i < l:
-        c = url[i]
-        if (c == '%' and (i < l - 2) and _ishexdigit(url[i + 1]) and _ishexdigit(url[i + 2])):
-            k = (_decode(url[i + 1]) << 4) + _decode(url[i + 2])
-            res.append(chr(k))
-            i += 3
-        elif c == '+':
-            res.append(' ')
-            i += 1
-        else:
-            res.append(url[i])
-            i += 1
-    return res.build()
+    if url.find('%') < 0 and url.find('+') < 0:
+        return url
+    return _unescape(url, True)
 
 
 @wrap(['space',   StringArg(None)])
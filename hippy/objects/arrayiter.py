@@ -39,6 +39,62 @@ class ListArrayIterator(BaseIterator):
     def done(self):
         return not self.valid(None)
 
+class IntListArrayIterator(ListArrayIterator):
+    """Iterates over the unboxed storage of an int list array"""
+
+    def __init__(self, space, int_items):
+        self.space = space
+        self.int_items = int_items
+        self.index = 0
+
+    def current(self, interp):
+        if self.index < len(self.int_items):
+            return self.space.newint(self.int_items[self.index])
+        return None
+
+    def valid(self, interp):
+        return self.index < len(self.int_items)
+
+
+class FloatListArrayIterator(ListArrayIterator):
+    """Iterates over the unboxed storage of a float list array"""
+
+    def __init__(self, space, float_items):
+        self.space = space
+        self.float_items = float_items
+        self.index = 0
+
+    def current(self, interp):
+        if self.index < len(self.float_items):
+            return self.space.newfloat(self.float_items[self.index])
+        return None
+
+    def valid(self, interp):
+        return self.index < len(self.float_items)
+
+
+class SplitListArrayIterator(ListArrayIterator):
+    """Iterates over the pieces of a split list array"""
+
+    def __init__(self, space, source, bounds):
+        self.space = space
+        self.source = source
+        self.bounds = bounds
+        self.index = 0
+
+    def current(self, interp):
+        i = 2 * self.index
+        if i < len(self.bounds):
+            start = self.bounds[i]
+            stop = self.bounds[i + 1]
+            assert 0 <= start <= stop
+            return self.space.newstr(self.source[start:stop])
+        return None
+
+    def valid(self, interp):
+        return 2 * self.index < len(self.bounds)
+
+
 class ListArrayIteratorRef(BaseIterator):
     def __init__(self, space, r_array):
         self.r_array = r_array
@@ -69,16 +125,18 @@ class ListArrayIteratorRef(BaseIterator):
         return space.wrap(index), r_value
 
 class RDictArrayIterator(BaseIterator):
+    # 'index' is a position in the keys of the array (see
+    # W_RDictArrayObject)
     def __init__(self, w_array):
         self.w_array = w_array
         self.rewind(None)
 
     def _current_index(self):
-        keylist = self.w_array._getkeylist()
-        try:
-            return keylist[self.index]
-        except IndexError:
-            return None
+        keys = self.w_array._getkeys()
+        index = self.index
+        if index < len(keys):
+            return keys[index]
+        return None
 
     def current(self, interp):
         key = self._current_index()
@@ -94,8 +152,7 @@ class RDictArrayIterator(BaseIterator):
 
     def next(self, space):
         w_value = self.current(None)
-        self.index += 1
-        self.finished = not self.valid(None)
+        self._advance()
         return w_value
 
     def next_item(self, space):
@@ -104,22 +161,31 @@ class RDictArrayIterator(BaseIterator):
         w_key = self.key(interp)
         if w_key is None:
             return None, None
-        self.index += 1
-        self.finished = not self.valid(interp)
+        self._advance()
         return w_key, w_value
 
+    def _advance(self):
+        self.index = self.w_array._next_position(self.index + 1)
+        self.finished = not self.valid(None)
+
     def rewind(self, interp):
-        self.index = 0
+        self.index = self.w_array._next_position(0)
         self.finished = not self.valid(interp)
 
     def valid(self, interp):
-        return self.index < self.w_array.arraylen()
+        return self.index < len(self.w_array._getkeys())
 
 
 class RDictArrayIteratorRef(BaseIterator):
+    # 'index' is a position in the keys of the array, possibly of a
+    # deleted entry; 'last_key' is the key of the item before it, to
+    # find the position again if the keys have been compacted since
     def __init__(self, space, r_array):
         self.r_array = r_array
         self.index = 0
+        self.last_key = None
+        w_array = r_array.deref_temp()
+        self.compactions = w_array._compactions
         self.finished = self.is_finished()
 
     def get_current_value(self):
@@ -127,24 +193,36 @@ class RDictArrayIteratorRef(BaseIterator):
         w_array = self.r_array.deref()
         return w_array._getitem_str(key)
 
-    def _current_index(self):
+    def _sync(self):
         # NB: the array must be deref'd every time, in case it's been mutated
         # between two calls to next()/next_item().
         w_array = self.r_array.deref_temp()
-        keylist = w_array._getkeylist()
-        try:
-            return keylist[self.index]
-        except IndexError:
-            return None
+        keys = w_array._getkeys()
+        if self.compactions != w_array._compactions:
+            self.compactions = w_array._compactions
+            index = min(self.index, len(keys))
+            if self.last_key is not None:
+                for pos in range(len(keys)):
+                    if keys[pos] == self.last_key:
+                        index = pos + 1
+                        break
+            self.index = index
+        self.index = w_array._next_position(self.index)
+        return keys
+
+    def _current_index(self):
+        keys = self._sync()
+        if self.index < len(keys):
+            return keys[self.index]
+        return None
 
     def is_finished(self):
-        w_array = self.r_array.deref_temp()
-        return self.index == w_array.arraylen()
+        keys = self._sync()
+        return self.index >= len(keys)
 
     def next(self, space):
         r_value = self.get_current_value()
-        self.index += 1
-        self.finished = self.is_finished()
+        self._advance()
         return r_value
 
     def next_item(self, space):
@@ -152,9 +230,13 @@ class RDictArrayIteratorRef(BaseIterator):
         key = self._current_index()
         if key is None:
             return None, None
+        self._advance()
+        return wrap_array_key(space, key), r_value
+
+    def _advance(self):
+        self.last_key = self._current_index()
         self.index += 1
         self.finished = self.is_finished()
-        return wrap_array_key(space, key), r_value
 
 class RCellDictArrayIterator(BaseIterator):
     def __init__(self, w_array):
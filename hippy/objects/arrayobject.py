@@ -5,9 +5,12 @@ from rpython.rlib.rarithmetic import intmask
 from rpython.rlib.rstring import replace
 
 from hippy.objects.base import W_Object, W_Root
+from hippy.objects.intobject import W_IntObject
+from hippy.objects.floatobject import W_FloatObject
 from hippy.objects.reference import W_Reference, VirtualReference
 from hippy.objects.convert import force_float_to_int_in_any_way
-from hippy.objects.strobject import string_var_export
+from hippy.objects.strobject import (string_var_export, W_StringObject,
+    W_MutableStringObject)
 from hippy.objects.boolobject import w_False
 from hippy.error import ConvertError
 from collections import OrderedDict
@@ -97,16 +100,106 @@ def convert_to_index(space, w_arg, allow_bogus=False):
         raise CannotConvertToIndex
 
 
+class ArrayCopyStats(object):
+    def __init__(self):
+        self.lazy_copies = 0     # copy() calls, which only share the storage
+        self.forced_copies = 0   # storage copies forced by a later write
+        self.copied_items = 0    # total length of the forced copies
+
+copy_stats = ArrayCopyStats()
+
+
+class SharedStorage(object):
+    """Shared by all the arrays that use the same storage.  'count' is
+    the number of these arrays that did not make their own copy yet."""
+    def __init__(self):
+        self.count = 1
+
+
+# in_array() and array_search() on an array of at least
+# VALUE_INDEX_MIN_LENGTH items build a ValueIndex for it the
+# VALUE_INDEX_SEARCHES-th time it is searched without a change in between
+VALUE_INDEX_SEARCHES = 4
+VALUE_INDEX_MIN_LENGTH = 16
+
+
+class ValueIndex(object):
+    """Maps the values of an array to the key of their first occurrence.
+    Only built for arrays of ints or of non-numeric strings, and only
+    used for a needle of the same type: then the first item equal to
+    the needle, loosely or strictly, is the first identical one."""
+
+    def __init__(self):
+        self.int_keys = None    # {int: w_key}, if all items are ints
+        self.str_keys = None    # {str: w_key}, if all are strings
+
+    def can_find(self, w_needle):
+        if self.int_keys is not None:
+            return isinstance(w_needle, W_IntObject)
+        if self.str_keys is not None:
+            return isinstance(w_needle, W_StringObject)
+        return False
+
+    def find(self, space, w_needle):
+        """Return the key of the first item equal to 'w_needle', or None.
+        Only if can_find(w_needle)."""
+        if self.int_keys is not None:
+            return self.int_keys.get(space.int_w(w_needle), None)
+        return self.str_keys.get(space.str_w(w_needle), None)
+
+
+def build_value_index(space, w_arr):
+    index = ValueIndex()
+    int_keys = {}
+    str_keys = {}
+    for w_key, w_val in w_arr.as_pair_list(space):
+        if isinstance(w_val, W_IntObject):
+            if str_keys:
+                return index
+            value = w_val.intval
+            if value not in int_keys:
+                int_keys[value] = w_key
+        elif (isinstance(w_val, W_StringObject) and
+                not isinstance(w_val, W_MutableStringObject)):
+            if int_keys:
+                return index
+            _, numeric = w_val.convert_to_number()
+            if numeric:
+                return index
+            value = space.str_w(w_val)
+            if value not in str_keys:
+                str_keys[value] = w_key
+        else:
+            # references, floats, etc.
+            return index
+    if int_keys:
+        index.int_keys = int_keys
+    elif str_keys:
+        index.str_keys = str_keys
+    return index
+
+
 class W_ArrayObject(W_Object):
     """Abstract base class.  Concrete subclasses use various strategies.
     This base class defines the general methods that can be implemented
     without needing to call (too often) the arraylen(), _getitem_str()
     and _getitem_int() methods.
+
+    copy() is copy-on-write: the copy shares the storage of the original
+    array, and whichever of them is modified first makes its own copy
+    of the storage in _unshare().
     """
+    _shared = None
+    _value_index = None
+    _searches = 0
 
     @staticmethod
     def new_array_from_list(space, lst_w):
-        return W_ListArrayObject(space, lst_w)
+        return new_list_array(space, lst_w)
+
+    @staticmethod
+    def new_array_from_split(space, source, bounds):
+        return new_split_list_array(space, source, bounds)
 
     @staticmethod
     def new_array_from_rdict(space, dct_w):
@@ -257,6 +350,49 @@ class W_ArrayObject(W_Object):
         else:
             return self._isset_str(as_str)
 
+    def _share_storage_with(self, w_copy):
+        copy_stats.lazy_copies += 1
+        shared = self._shared
+        if shared is None:
+            shared = SharedStorage()
+            self._shared = shared
+        shared.count += 1
+        w_copy._shared = shared
+
+    def get_value_index(self, space):
+        """The ValueIndex of the array, or None if the array was not
+        searched enough times yet.  Any change to the array drops it."""
+        index = self._value_index
+        if index is None:
+            if self.arraylen() < VALUE_INDEX_MIN_LENGTH:
+                return None
+            self._searches += 1
+            if self._searches < VALUE_INDEX_SEARCHES:
+                return None
+            index = build_value_index(space, self)
+            self._value_index = index
+        return index
+
+    def _unshare(self):
+        """Must be called before any change to the storage of the array."""
+        if self._searches:
+            self._value_index = None
+            self._searches = 0
+        shared = self._shared
+        if shared is None:
+            return
+        self._shared = None
+        shared.count -= 1
+        if shared.count > 0:
+            # the storage is still used by other arrays
+            self._note_making_a_copy()
+            copy_stats.forced_copies += 1
+            copy_stats.copied_items += self.arraylen()
+            self._copy_storage()
+
+    def _copy_storage(self):
+        raise NotImplementedError("abstract")
+
     def _getitem_int(self, index):
         raise NotImplementedError("abstract")
 
@@ -306,6 +442,26 @@ class W_ArrayObject(W_Object):
         self.current_idx = current_idx
         return self._current()
 
+    # The internal pointer, moved by each(), end(), prev() and reset().
+    # 'current_idx' is the index of the current item, or is at least
+    # arraylen() after the end; W_RDictArrayObject uses its own positions.
+
+    def _pointer_reset(self):
+        self.current_idx = 0
+
+    def _pointer_end(self):
+        self.current_idx = self.arraylen() - 1
+
+    def _pointer_forward(self):
+        self.current_idx += 1
+
+    def _pointer_backward(self):
+        """Move to the previous item, if there is one"""
+        current_idx = min(self.current_idx, self.arraylen()) - 1
+        if current_idx < 0:
+            return False
+        self.current_idx = current_idx
+        return True
 
     def _key(self, space):
         raise NotImplementedError("abstract")
@@ -395,49 +551,247 @@ class ListItemVRef(VirtualReference):
         self.index = index
 
     def deref(self):
-        return self.w_array.lst_w[self.index]
+        return self.w_array._getitem_w(self.index)
 
     def store(self, w_value, unique=False):
-        self.w_array.lst_w[self.index] = w_value
+        self.w_array._setitem_w(self.index, w_value)
 
     def __repr__(self):
         return '<ListItemVRef>'
 
 
+@jit.look_inside_iff(lambda lst_w: jit.isvirtual(lst_w))
+def _unbox_ints(lst_w):
+    int_items = [0] * len(lst_w)
+    for i in range(len(lst_w)):
+        w_item = lst_w[i]
+        if not isinstance(w_item, W_IntObject):
+            return None
+        int_items[i] = w_item.intval
+    return int_items
+
+
+@jit.look_inside_iff(lambda lst_w: jit.isvirtual(lst_w))
+def _unbox_floats(lst_w):
+    float_items = [0.0] * len(lst_w)
+    for i in range(len(lst_w)):
+        w_item = lst_w[i]
+        if not isinstance(w_item, W_FloatObject):
+            return None
+        float_items[i] = w_item.floatval
+    return float_items
+
+
+def new_list_array(space, lst_w, current_idx=0):
+    """Make a W_ListArrayObject, using unboxed storage if all the items
+    of 'lst_w' are ints or all are floats."""
+    if lst_w:
+        w_first = lst_w[0]
+        if isinstance(w_first, W_IntObject):
+            int_items = _unbox_ints(lst_w)
+            if int_items is not None:
+                return new_int_list_array(space, int_items, current_idx)
+        elif isinstance(w_first, W_FloatObject):
+            float_items = _unbox_floats(lst_w)
+            if float_items is not None:
+                return new_float_list_array(space, float_items, current_idx)
+    return W_ListArrayObject(space, lst_w, current_idx)
+
+
+def new_int_list_array(space, int_items, current_idx=0):
+    w_arr = W_ListArrayObject(space, None, current_idx)
+    w_arr.int_items = int_items
+    return w_arr
+
+
+def new_float_list_array(space, float_items, current_idx=0):
+    w_arr = W_ListArrayObject(space, None, current_idx)
+    w_arr.float_items = float_items
+    return w_arr
+
+
+def new_split_list_array(space, source, bounds, current_idx=0):
+    """Make a list array of the strings source[bounds[0]:bounds[1]],
+    source[bounds[2]:bounds[3]], etc.  The strings are only made when
+    the items are read."""
+    if not bounds:
+        return W_ListArrayObject(space, [], current_idx)
+    w_arr = W_ListArrayObject(space, None, current_idx)
+    w_arr.split_source = source
+    w_arr.split_bounds = bounds
+    return w_arr
+
+
 class W_ListArrayObject(W_ArrayObject):
+    """An array whose keys are exactly 0, 1, ..., n-1.
+
+    The items are stored in one of three lists: 'int_items' if they are
+    all ints, 'float_items' if they are all floats, or 'lst_w' in the
+    general case.  The result of explode() and similar functions is
+    stored instead as 'split_source', the string that was split, and
+    'split_bounds', the start and stop of each piece in it.  Exactly one
+    of 'int_items', 'float_items', 'split_bounds' and 'lst_w' is not
+    None.  Storing an item of another type switches the array in-place
+    to 'lst_w'; so does storing anything in a split array.
+    """
     _has_string_keys = False
 
     def __init__(self, space, lst_w, current_idx=0):
         self.space = space
         self.lst_w = lst_w
+        self.int_items = None
+        self.float_items = None
+        self.split_source = None
+        self.split_bounds = None
         self.current_idx = current_idx
 
+    def storage_kind(self):
+        "For tests and debugging"
+        if self.int_items is not None:
+            return 'int'
+        if self.float_items is not None:
+            return 'float'
+        if self.split_bounds is not None:
+            return 'split'
+        return 'object'
+
+    def _getitem_w(self, index):
+        # 'index' must be in range
+        if self.int_items is not None:
+            return self.space.newint(self.int_items[index])
+        if self.float_items is not None:
+            return self.space.newfloat(self.float_items[index])
+        if self.split_bounds is not None:
+            return self._split_item(index)
+        return self.lst_w[index]
+
+    def _split_item(self, index):
+        start = self.split_bounds[2 * index]
+        stop = self.split_bounds[2 * index + 1]
+        assert 0 <= start <= stop
+        return self.space.newstr(self.split_source[start:stop])
+
+    def _setitem_w(self, index, w_value):
+        # 'index' must be in range
+        self._unshare()
+        if self.int_items is not None:
+            if isinstance(w_value, W_IntObject):
+                self.int_items[index] = w_value.intval
+                return
+            self._switch_to_object_storage()
+        elif self.float_items is not None:
+            if isinstance(w_value, W_FloatObject):
+                self.float_items[index] = w_value.floatval
+                return
+            self._switch_to_object_storage()
+        elif self.split_bounds is not None:
+            self._switch_to_object_storage()
+        self.lst_w[index] = w_value
+
+    def _append_w(self, w_value):
+        self._unshare()
+        if self.int_items is not None:
+            if isinstance(w_value, W_IntObject):
+                self.int_items.append(w_value.intval)
+                return
+            self._switch_to_object_storage()
+        elif self.float_items is not None:
+            if isinstance(w_value, W_FloatObject):
+                self.float_items.append(w_value.floatval)
+                return
+            self._switch_to_object_storage()
+        elif self.split_bounds is not None:
+            self._switch_to_object_storage()
+        elif not self.lst_w:
+            # empty: the first item decides the storage
+            if isinstance(w_value, W_IntObject):
+                self.lst_w = None
+                self.int_items = [w_value.intval]
+                return
+            if isinstance(w_value, W_FloatObject):
+                self.lst_w = None
+                self.float_items = [w_value.floatval]
+                return
+        self.lst_w.append(w_value)
+
+    def _pop_w(self):
+        self._unshare()
+        if self.int_items is not None:
+            return self.space.newint(self.int_items.pop())
+        if self.float_items is not None:
+            return self.space.newfloat(self.float_items.pop())
+        if self.split_bounds is not None:
+            # the last piece can be dropped without making the others
+            w_item = self._split_item(len(self.split_bounds) // 2 - 1)
+            self.split_bounds.pop()
+            self.split_bounds.pop()
+            return w_item
+        return self.lst_w.pop()
+
+    def _switch_to_object_storage(self):
+        self.lst_w = self._boxed_items()
+        self.int_items = None
+        self.float_items = None
+        self.split_source = None
+        self.split_bounds = None
+
+    def _boxed_items(self):
+        space = self.space
+        if self.int_items is not None:
+            return [space.newint(i) for i in self.int_items]
+        if self.float_items is not None:
+            return [space.newfloat(f) for f in self.float_items]
+        if self.split_bounds is not None:
+            return [self._split_item(i) for i in range(self.arraylen())]
+        return self.lst_w[:]
+
     def as_unique_arraylist(self):
-        self._note_making_a_copy()
-        lst_w = [item.copy_item() for item in self.lst_w]
-        return W_ListArrayObject(self.space, lst_w, current_idx=self.current_idx)
+        w_copy = W_ListArrayObject(self.space, self.lst_w,
+                                   current_idx=self.current_idx)
+        w_copy.int_items = self.int_items
+        w_copy.float_items = self.float_items
+        w_copy.split_source = self.split_source
+        w_copy.split_bounds = self.split_bounds
+        self._share_storage_with(w_copy)
+        return w_copy
+
+    def _copy_storage(self):
+        if self.int_items is not None:
+            self.int_items = self.int_items[:]
+        elif self.float_items is not None:
+            self.float_items = self.float_items[:]
+        elif self.split_bounds is not None:
+            self.split_bounds = self.split_bounds[:]
+        else:
+            self.lst_w = [item.copy_item() for item in self.lst_w]
 
     def as_list_w(self):
-        return self.lst_w[:]
+        return self._boxed_items()
 
     def as_pair_list(self, space):
-        return [(space.newint(i), values)
-                for i, values in enumerate(self.lst_w)]
+        return [(space.newint(i), self._getitem_w(i))
+                for i in range(self.arraylen())]
 
     def as_unique_arraydict(self):
         self._note_making_a_copy()
         d = self.as_rdict()   # make a fresh dictionary
         return W_RDictArrayObject(self.space, d,
-                                  next_idx=len(self.lst_w),
+                                  next_idx=self.arraylen(),
                                   current_idx=self.current_idx)
 
     def arraylen(self):
+        if self.int_items is not None:
+            return len(self.int_items)
+        if self.float_items is not None:
+            return len(self.float_items)
+        if self.split_bounds is not None:
+            return len(self.split_bounds) // 2
         return len(self.lst_w)
 
     def as_rdict(self):
         d = new_rdict()
-        for i in range(len(self.lst_w)):
-            d[str(i)] = self.lst_w[i].copy_item()
+        for i in range(self.arraylen()):
+            d[str(i)] = self._getitem_w(i).copy_item()
         return d
 
     def get_rdict_from_array(self):
@@ -445,29 +799,25 @@ class W_ListArrayObject(W_ArrayObject):
 
     def _current(self):
         index = self.current_idx
-        if 0 <= index < len(self.lst_w):
-            return self.lst_w[index]
+        if 0 <= index < self.arraylen():
+            return self._getitem_w(index)
         else:
             return w_False
 
     def _key(self, space):
         index = self.current_idx
-        if 0 <= index < len(self.lst_w):
+        if 0 <= index < self.arraylen():
             return space.newint(index)
         else:
             return space.w_Null
 
     def _getitem_int(self, index):
-        if index >= 0:
-            try:
+        if 0 <= index < self.arraylen():
+            if self.lst_w is not None:
                 res = self.lst_w[index]
-            except IndexError:
-                pass
-            else:
                 if isinstance(res, W_Reference):
                     return res
-                else:
-                    return ListItemVRef(self, index)
+            return ListItemVRef(self, index)
         return None
 
     def _getitem_str(self, key):
@@ -478,14 +828,14 @@ class W_ListArrayObject(W_ArrayObject):
         return self._getitem_int(i)
 
     def _appenditem(self, w_obj, as_ref=False):
-        self.lst_w.append(w_obj)
+        self._append_w(w_obj)
 
     def _setitem_int(self, index, w_value, as_ref, unique_item=False):
         length = self.arraylen()
         if index >= length:
             if index > length:
                 return self._convert_and_setitem_int(index, w_value)
-            self.lst_w.append(w_value)
+            self._append_w(w_value)
             return self
         #
         if index < 0:
@@ -493,12 +843,12 @@ class W_ListArrayObject(W_ArrayObject):
         #
         # If overwriting an existing W_Reference object, we only update
         # the value in the reference.  Else we need to update 'lst_w'.
-        if not as_ref:
+        if not as_ref and self.lst_w is not None:
             w_old = self.lst_w[index]
             if isinstance(w_old, W_Reference):
                 w_old.store(w_value, unique_item)
                 return self
-        self.lst_w[index] = w_value
+        self._setitem_w(index, w_value)
         return self
 
     def _setitem_str(self, key, w_value, as_ref, unique_item=False):
@@ -521,9 +871,9 @@ class W_ListArrayObject(W_ArrayObject):
         if index < 0 or index >= self.arraylen():
             return self
         if index == self.arraylen() - 1:
-            del self.lst_w[index]
-            if self.current_idx > len(self.lst_w):
-                self.current_idx = len(self.lst_w)
+            self._pop_w()
+            if self.current_idx > self.arraylen():
+                self.current_idx = self.arraylen()
             return self
         else:
             return self.as_unique_arraydict()._unsetitem_int(index)
@@ -548,7 +898,16 @@ class W_ListArrayObject(W_ArrayObject):
             return self._isset_int(i)
 
     def create_iter(self, space, contextclass=None):
-        from hippy.objects.arrayiter import ListArrayIterator
+        from hippy.objects.arrayiter import (ListArrayIterator,
+            IntListArrayIterator, FloatListArrayIterator,
+            SplitListArrayIterator)
+        if self.int_items is not None:
+            return IntListArrayIterator(space, self.int_items)
+        if self.float_items is not None:
+            return FloatListArrayIterator(space, self.float_items)
+        if self.split_bounds is not None:
+            return SplitListArrayIterator(space, self.split_source,
+                                          self.split_bounds)
         return ListArrayIterator(self.lst_w)
 
     def create_iter_ref(self, space, r_self, contextclass=None):
@@ -560,20 +919,21 @@ class W_ListArrayObject(W_ArrayObject):
 
     def _inplace_pop(self, space):
         self.current_idx = 0
-        return self.lst_w.pop()
+        return self._pop_w()
 
     def _values(self, space):
-        return self.lst_w
+        # a fresh list: the callers may sort it in-place
+        return self._boxed_items()
 
     def serialize(self, space, builder, memo):
         # performance-enhanced version
         builder.append("a:")
-        lst_w = self.lst_w
-        builder.append(str(len(lst_w)))
+        length = self.arraylen()
+        builder.append(str(length))
         builder.append(":{")
         memo.add_counter()
         counting = ['i', ':', '0', ';']
-        for i in range(len(lst_w)):
+        for i in range(length):
             for c in counting:
                 builder.append(c)
             # increment the counting list
@@ -587,7 +947,7 @@ class W_ListArrayObject(W_ArrayObject):
             else:
                 counting = ['i', ':', '1'] + counting[2:]
             #
-            if lst_w[i].serialize(space, builder, memo):
+            if self._getitem_w(i).serialize(space, builder, memo):
                 memo.add_counter()
         builder.append("}")
         return False  # counted above already
@@ -602,14 +962,37 @@ class DictItemVRef(VirtualReference):
         return self.w_array.dct_w[self.index]
 
     def store(self, w_value, unique=False):
+        self.w_array._unshare()
         self.w_array.dct_w[self.index] = w_value
 
 
+# a W_RDictArrayObject compacts its list of keys when it holds more
+# deleted entries than this, and more deleted entries than live ones
+COMPACT_MIN_DELETED = 16
+
+
 class W_RDictArrayObject(W_ArrayObject):
+    """An array stored in an OrderedDict 'dct_w'.
+
+    The internal pointer and the iterators need the items by position,
+    which the OrderedDict does not give.  For them the array keeps
+    '_keys', built on the first use: all the keys in insertion order,
+    including the keys of the deleted items.  New keys are appended to
+    it; deleting a key only records it in '_stale', which maps the key
+    either to -1 (no live entry) or to the position of the entry of the
+    key when it was inserted again.  So the positions stay valid across
+    changes to the array and unset() does not look for the key, until
+    '_keys' is compacted because it holds too many deleted entries;
+    '_compactions' counts these.
+    """
     _has_string_keys = True
     strategy_name = 'hash'
 
-    _keylist = None
+    _keys = None
+    _stale = None
+    _nstale = 0
+    _first_live = 0     # no live entry before this position
+    _compactions = 0
 
     def __init__(self, space, dct_w, next_idx, current_idx=0):
         if not we_are_translated():
@@ -629,45 +1012,156 @@ class W_RDictArrayObject(W_ArrayObject):
         return self.dct_w.copy()
 
     def as_unique_arraydict(self):
-        self._note_making_a_copy()
-        return W_RDictArrayObject(self.space, self.as_rdict(),
-                                  next_idx=self.next_idx,
-                                  current_idx=self.current_idx)
+        w_copy = W_RDictArrayObject(self.space, self.dct_w,
+                                    next_idx=self.next_idx,
+                                    current_idx=self.current_idx)
+        w_copy._keys = self._keys
+        w_copy._stale = self._stale
+        w_copy._nstale = self._nstale
+        w_copy._first_live = self._first_live
+        w_copy._compactions = self._compactions
+        self._share_storage_with(w_copy)
+        return w_copy
+
+    def _copy_storage(self):
+        self.dct_w = self.as_rdict()
+        # keep the same positions
+        if self._keys is not None:
+            self._keys = self._keys[:]
+        if self._stale is not None:
+            self._stale = self._stale.copy()
 
     def as_list_w(self):
         return self.dct_w.values()
 
     def as_pair_list(self, space):
-        keylist = self._getkeylist()
         result = []
-        for key in keylist:
-            w_key = wrap_array_key(space, key)
-            result.append((w_key, self.dct_w[key]))
+        for key, w_value in self.dct_w.iteritems():
+            result.append((wrap_array_key(space, key), w_value))
         return result
 
-    def _getkeylist(self):
-        keylist = self._keylist
-        if keylist is None:
-            keylist = self.dct_w.keys()
-            self._keylist = keylist
-        return keylist
+    def _getkeys(self):
+        keys = self._keys
+        if keys is None:
+            # until now, the positions were the indexes in 'dct_w'
+            keys = self.dct_w.keys()
+            self._keys = keys
+        return keys
+
+    def _is_live(self, pos):
+        stale = self._stale
+        if stale is None:
+            return True
+        state = stale.get(self._keys[pos], -2)
+        return state == -2 or state == pos
+
+    def _next_position(self, pos):
+        """The position of the first live entry from 'pos' on, or the
+        length of '_keys'"""
+        keys = self._getkeys()
+        if self._stale is not None:
+            while pos < len(keys) and not self._is_live(pos):
+                pos += 1
+        return pos
+
+    def _prev_position(self, pos):
+        """The position of the last live entry up to 'pos', or -1"""
+        self._getkeys()
+        if self._stale is not None:
+            while pos >= 0 and not self._is_live(pos):
+                pos -= 1
+        return pos
+
+    def _key_added(self, key):
+        keys = self._keys
+        if keys is not None:
+            stale = self._stale
+            if stale is not None and key in stale:
+                stale[key] = len(keys)
+            keys.append(key)
+
+    def _key_removed(self, key):
+        keys = self._keys
+        if keys is None:
+            return
+        if self._stale is None:
+            self._stale = {}
+        self._stale[key] = -1
+        self._nstale += 1
+        current_idx = self.current_idx
+        if current_idx < len(keys) and keys[current_idx] == key:
+            # the current item was removed: move to the next one
+            self.current_idx = self._next_position(current_idx + 1)
+        if (self._nstale > COMPACT_MIN_DELETED and
+                self._nstale > len(self.dct_w)):
+            self._compact()
+
+    def _compact(self):
+        keys = self._keys
+        current_idx = self.current_idx
+        if current_idx >= len(keys):
+            current_idx = len(self.dct_w)
+        else:
+            live = 0
+            for pos in range(current_idx):
+                if self._is_live(pos):
+                    live += 1
+            current_idx = live
+        self.current_idx = current_idx
+        self._keys = self.dct_w.keys()
+        self._stale = None
+        self._nstale = 0
+        self._first_live = 0
+        self._compactions += 1
 
-    def _keylist_changed(self):
-        self._keylist = None
+    def _live_keys(self):
+        "NOT_RPYTHON: for tests only"
+        result = []
+        pos = self._next_position(0)
+        while pos < len(self._keys):
+            result.append(self._keys[pos])
+            pos = self._next_position(pos + 1)
+        assert result == self.dct_w.keys()
+        return result
+
+    def _pointer_reset(self):
+        pos = self._next_position(self._first_live)
+        self._first_live = pos
+        self.current_idx = pos
+
+    def _pointer_end(self):
+        self.current_idx = self._prev_position(len(self._getkeys()) - 1)
+
+    def _pointer_forward(self):
+        keys = self._getkeys()
+        if self.current_idx < len(keys):
+            self.current_idx = self._next_position(self.current_idx + 1)
+
+    def _pointer_backward(self):
+        keys = self._getkeys()
+        pos = self._prev_position(min(self.current_idx, len(keys)) - 1)
+        if pos < 0:
+            return False
+        self.current_idx = pos
+        return True
+
+    def next(self, space):
+        self._pointer_forward()
+        return self._current()
 
     def _current(self):
-        keylist = self._getkeylist()
+        keys = self._getkeys()
         index = self.current_idx
-        if 0 <= index < len(keylist):
-            return self.dct_w[keylist[index]]
+        if 0 <= index < len(keys):
+            return self.dct_w[keys[index]]
         else:
             return w_False
 
     def _key(self, space):
-        keylist = self._getkeylist()
+        keys = self._getkeys()
         index = self.current_idx
-        if 0 <= index < len(keylist):
-            return wrap_array_key(space, keylist[index])
+        if 0 <= index < len(keys):
+            return wrap_array_key(space, keys[index])
         else:
             return space.w_Null
 
@@ -706,8 +1200,9 @@ class W_RDictArrayObject(W_ArrayObject):
                 w_old.store(w_value, unique_item)
                 return self
         # Else update the 'dct_w'.
-        if self._keylist is not None and key not in self.dct_w:
-            self._keylist_changed()
+        self._unshare()
+        if self._keys is not None and key not in self.dct_w:
+            self._key_added(key)
         self.dct_w[key] = w_value
         # Blah
         try:
@@ -725,31 +1220,12 @@ class W_RDictArrayObject(W_ArrayObject):
     def _unsetitem_str(self, key):
         if key not in self.dct_w:
             return self
-        # XXX slow hacks to know if we must decrement current_idx or not:
-        # this is if and only if the removed item is before current_idx.
-        current_idx = self.current_idx
-        if current_idx > 0:
-            keylist = self._getkeylist()
-            length = len(self.dct_w)
-            if current_idx <= length // 2:
-                # look on the left of current_idx
-                for i in range(current_idx):
-                    if keylist[i] == key:
-                        # found: decrement current_idx
-                        self.current_idx = current_idx - 1
-                        break
-            else:
-                # look on the right of current_idx
-                for i in range(current_idx, length):
-                    if keylist[i] == key:
-                        # found: don't decrement current_idx
-                        break
-                else:
-                    # not found: decrement current_idx
-                    self.current_idx = current_idx - 1
-        #
+        self._unshare()
+        if self.current_idx != 0:
+            # the pointer must keep its item, whose index may change
+            self._getkeys()
         del self.dct_w[key]
-        self._keylist_changed()
+        self._key_removed(key)
         return self
 
     def _isset_int(self, index):
@@ -770,11 +1246,21 @@ class W_RDictArrayObject(W_ArrayObject):
         return self.as_unique_arraydict()
 
     def _inplace_pop(self, space):
+        self._unshare()
         key, w_value = self.dct_w.popitem()
-        self._keylist_changed()
+        keys = self._keys
+        if keys is not None:
+            self._key_removed(key)
+            keys = self._keys
+            # drop the deleted entries at the end
+            while len(keys) > 0 and not self._is_live(len(keys) - 1):
+                keys.pop()
+                self._nstale -= 1
+            if self._first_live > len(keys):
+                self._first_live = len(keys)
         if key == str(self.next_idx - 1):
             self.next_idx -= 1
-        self.current_idx = 0
+        self._pointer_reset()
         return w_value
 
     def _values(self, space):
@@ -842,6 +1328,10 @@ class W_RCellDictArrayObject(W_ArrayObject):
             new_dict[key] = cell.v
         return new_dict
 
+    def get_value_index(self, space):
+        # the cells can change without a call to _unshare()
+        return None
+
     def as_unique_arraydict(self):
         self._note_making_a_copy()
         return W_RDictArrayObject(self.space, self.as_rdict(),
@@ -1,5 +1,5 @@
 
-from hippy.error import InterpreterError, OffsetError
+from hippy.error import InterpreterError, OffsetError, NotSerializable
 
 class W_Root(object):
     """ The base class for everything that can be represented as a first-class
@@ -23,6 +23,10 @@ class W_Root(object):
         """Evaluate for use as a default value"""
         raise TypeError("This object cannot be used as a default value")
 
+    def ll_serialize(self, builder):
+        """Write the compact form used by bytecode serialization"""
+        raise NotSerializable
+
     def _note_making_a_copy(self):
         pass       # for test_refcount
 
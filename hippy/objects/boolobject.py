@@ -53,6 +53,10 @@ class W_BoolObject(W_Object):
     def eval_static(self, space):
         return self
 
+    def ll_serialize(self, builder):
+        builder.append("b")
+        builder.append("1" if self.boolval else "0")
+
     def serialize(self, space, builder, memo):
         builder.append(["b:0;", "b:1;"][self.boolval])
         return True
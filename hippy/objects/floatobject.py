@@ -1,4 +1,5 @@
 import sys
+import struct
 from hippy.objects.base import W_Object
 from hippy.objects.support import _new_binop
 from hippy.consts import BINOP_LIST, BINOP_COMPARISON_LIST
@@ -128,6 +129,10 @@ class W_FloatObject(W_Object):
     def eval_static(self, space):
         return self
 
+    def ll_serialize(self, builder):
+        builder.append("d")
+        builder.append(struct.pack("d", self.floatval))
+
     def serialize(self, space, builder, memo):
         prec = memo.serialize_precision
         if prec == 0:
@@ -1,6 +1,7 @@
 import struct
 
 from hippy.objects.base import W_Object
+from hippy.objects.strobject import W_ConcatStringObject
 from rpython.rlib import jit
 
 
@@ -22,13 +23,21 @@ class W_StrInterpolation(W_Object):
 
     @jit.unroll_safe
     def interpolate(self, space, frame, bytecode, n):
+        w_first = None
         r = []
         c = 0
         for s in self.strings:
             if s is None:
-                s = space.str_w(space.as_string(
-                        frame.peek_nth(n - c - 1)))
+                w_s = space.as_string(frame.peek_nth(n - c - 1))
                 c += 1
+                if c == 1 and not r and isinstance(w_s,
+                                                   W_ConcatStringObject):
+                    # "$out..." appends to $out, like $out . "..." does
+                    w_first = w_s
+                    continue
+                s = space.str_w(w_s)
             r.append(s)
         frame.pop_n(c)
+        if w_first is not None:
+            return w_first.extend(r)
         return space.newstr(''.join(r))
@@ -7,6 +7,10 @@ from hippy.objects.reference import VirtualReference
 from hippy.objects.convert import convert_string_to_number, strtol
 from hippy.error import ConvertError, OffsetError
 
+# below this length, a string is copied into the result of a
+# concatenation instead of being referenced by it
+ROPE_MIN_LENGTH = 256
+
 
 class StringOffset(VirtualReference):
     """A very special kind of reference that points to a single character
@@ -30,6 +34,11 @@ class W_StringObject(W_Object):
 
     supports_arithmetics = True
 
+    # the result of convert_string_to_number() on this string, computed
+    # by convert_to_number() the first time it is needed
+    _w_number = None
+    _number_valid = False
+
     @staticmethod
     def newmutablestr(chars):
         return W_MutableStringObject(chars)
@@ -39,7 +48,9 @@ class W_StringObject(W_Object):
         return W_ConstStringObject(s)
 
     def hash(self, space):
-        # XXX improve
+        # the hash of an RPython string is computed only once and then
+        # stored in the string itself, so this is cheap for the strings
+        # that unwrap() to the same object every time
         return compute_hash(self.unwrap())
 
     def as_string(self, space, quiet=False):
@@ -55,7 +66,7 @@ class W_StringObject(W_Object):
                 return 0
             else:
                 return -1
-        w_number_ignored, valid = convert_string_to_number(s)
+        w_number_ignored, valid = self.convert_to_number()
         if not valid:
             if give_notice:
                 space.ec.notice("A non well formed numeric value encountered")
@@ -80,14 +91,28 @@ class W_StringObject(W_Object):
     def dump(self):
         return "'%s'" % self.unwrap()
 
+    def convert_to_number(self):
+        """Returns (wrapped number, flag: number-fully-processed).
+        Strings are often used as numbers many times, e.g. the ones
+        from a database or from $_GET, so the result is cached."""
+        w_number = self._w_number
+        if w_number is None:
+            w_number, valid = convert_string_to_number(self.unwrap())
+            self._w_number = w_number
+            self._number_valid = valid
+            return w_number, valid
+        return w_number, self._number_valid
+
+    def _forget_number(self):
+        # must be called when the content of the string changes
+        self._w_number = None
+
     def as_number(self, space=None):
-        s = self.unwrap()
-        w_number, valid = convert_string_to_number(s)
+        w_number, valid = self.convert_to_number()
         return w_number      # ignore 'valid'
 
     def is_really_valid_number(self, space=None):
-        s = self.unwrap()
-        w_number, valid = convert_string_to_number(s)
+        w_number, valid = self.convert_to_number()
         return valid
 
     def int_w(self, space):
@@ -158,7 +183,7 @@ class W_StringObject(W_Object):
         builder = StringBuilder()
         self.append_to_builder(builder)
         w_other.append_to_builder(builder)
-        return W_ConcatStringObject(builder)
+        return W_ConcatStringObject(None, builder)
 
     def _setitem_ref(self, space, w_arg, w_ref):
         raise OffsetError('cannot set item by reference on a string')
@@ -169,10 +194,6 @@ class W_StringObject(W_Object):
     def __repr__(self):
         return '%s(%r)' % (self.__class__.__name__, self.unwrap())
 
-##    def hash(self):
-##        self.force_concat()
-##        return self.strategy.hash(self.storage)
-
     def var_dump(self, space, indent, recursion):
         s = self.unwrap()
         return '%sstring(%d) "%s"\n' % (indent, len(s), s)
@@ -190,7 +211,7 @@ class W_StringObject(W_Object):
         return self.as_number(space).abs(space)
 
     def overflow_convert(self, space):
-        w_obj, fully_processed = convert_string_to_number(self.unwrap())
+        w_obj, fully_processed = self.convert_to_number()
         if not fully_processed:
             if self.float_w(space) != 0.0:
                 space.ec.notice("A non well formed numeric "
@@ -202,8 +223,7 @@ class W_StringObject(W_Object):
     def as_int_arg(self, space):
         if not self.is_numeric():
             raise ConvertError('not a numeric string')
-        s = self.unwrap()
-        w_obj, valid = convert_string_to_number(s)
+        w_obj, valid = self.convert_to_number()
         if not valid:
             space.ec.notice("A non well formed numeric value encountered")
         return w_obj.int_w(space)
@@ -304,7 +324,7 @@ class StringMixin(object):
 
 class W_ConstStringObject(StringMixin, W_StringObject):
 
-    _immutable_ = True
+    _immutable_fields_ = ['_strval']
 
     def __init__(self, strval):
         assert strval is not None
@@ -335,6 +355,14 @@ class W_ConstStringObject(StringMixin, W_StringObject):
         self._note_making_a_copy()
         return W_MutableStringObject(bytearray(self._strval))
 
+    def strconcat(self, space, w_other):
+        if len(self._strval) < ROPE_MIN_LENGTH:
+            return W_StringObject.strconcat(self, space, w_other)
+        # immutable, so it can be the prefix instead of being copied
+        builder = StringBuilder()
+        w_other.append_to_builder(builder)
+        return W_ConcatStringObject(self, builder)
+
     def eval_static(self, space):
         return self
 
@@ -346,8 +374,10 @@ class W_MutableStringObject(StringMixin, W_StringObject):
 
     def set_arrayval(self, val):
         self._arrayval = val
+        self._forget_number()
 
     def set_char_at(self, index, c):
+        self._forget_number()
         if index >= len(self._arrayval):
             self._arrayval += " " * (index + 1 - len(self._arrayval))
             # XXX better complexity needed?
@@ -375,39 +405,91 @@ class W_MutableStringObject(StringMixin, W_StringObject):
 
 
 class W_ConcatStringObject(StringMixin, W_StringObject):
-    _immutable_fields_ = ['_builder', '_length']
+    """The result of a concatenation: a rope made of an immutable prefix
+    string (or None) followed by the first '_length' characters of a
+    StringBuilder.
+
+    Concatenating to the most recent W_ConcatStringObject of a builder
+    just appends to the builder.  Concatenating to an older one, whose
+    builder was extended since, starts a new builder with the older
+    object as prefix, instead of copying it.  The rope is flattened into
+    a string only the first time it is really needed.
+    """
+    _immutable_fields_ = ['_prefix', '_builder', '_length', '_total']
     _cache = None
 
-    def __init__(self, builder):
+    def __init__(self, prefix, builder):
         # Grab the current length of the builder now.  Later, more data
         # may be appended to it, but it must not change the present
         # W_ConcatStringObject.
+        self._prefix = prefix
         self._builder = builder
         self._length = builder.getlength()
+        if prefix is None:
+            self._total = self._length
+        else:
+            self._total = prefix.strlen() + self._length
 
-    def strconcat(self, space, w_other):
+    def _extended_builder(self):
+        """Return the prefix and the builder to use for a string that
+        starts with this one"""
         builder = self._builder
         if self._length != builder.getlength():
-            return W_StringObject.strconcat(self, space, w_other)
+            return self, StringBuilder()
+        return self._prefix, builder
+
+    def strconcat(self, space, w_other):
+        prefix, builder = self._extended_builder()
         w_other.append_to_builder(builder)
-        return W_ConcatStringObject(builder)
+        return W_ConcatStringObject(prefix, builder)
+
+    def extend(self, strings):
+        """Return the concatenation of this string and the list 'strings'"""
+        prefix, builder = self._extended_builder()
+        for s in strings:
+            builder.append(s)
+        return W_ConcatStringObject(prefix, builder)
 
     def strlen(self):
-        return self._length
+        return self._total
 
     def character(self, index):
         return self.unwrap()[index]
 
     def unwrap(self):
         if self._cache is None:
-            s = self._builder.build()
-            if len(s) > self._length:
-                s = s[:self._length]
+            if self._prefix is None:
+                s = self._builder.build()
+                if len(s) > self._length:
+                    s = s[:self._length]
+            else:
+                builder = StringBuilder(self._total)
+                self.append_to_builder(builder)
+                s = builder.build()
             self._cache = s
         return self._cache
 
+    def _append_own_part(self, builder):
+        s = self._builder.build()
+        builder.append_slice(s, 0, self._length)
+
     def append_to_builder(self, builder):
-        builder.append(self.unwrap())
+        if self._cache is not None:
+            builder.append(self._cache)
+            return
+        # walk the chain of prefixes without recursion: it can be long
+        ropes = []
+        w_str = self
+        while isinstance(w_str, W_ConcatStringObject):
+            if w_str._cache is not None:
+                break
+            ropes.append(w_str)
+            w_str = w_str._prefix
+        if w_str is not None:
+            # a flat string, or a rope that is already flattened
+            w_str.append_to_builder(builder)
+        for i in range(len(ropes) - 1, -1, -1):
+            ropes[i]._append_own_part(builder)
 
     def copy(self):
         return self.as_mutable_string()
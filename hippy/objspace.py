@@ -23,7 +23,6 @@ from hippy.objects.instanceobject import W_InstanceObject
 from hippy.objects.resources.file_resource import W_FileResource
 from hippy.objects.resources.dir_resource import W_DirResource
 from hippy.objects.resources.stream_context import W_StreamContext
-from hippy.objects.convert import convert_string_to_number
 from hippy.module.regex.cache import RegexpCache
 from hippy.builtin_klass import k_stdClass
 from hippy.bytecode_cache import BytecodeCache
@@ -354,6 +353,11 @@ class ObjSpace(object):
     def new_array_from_list(self, lst_w):
         return W_ArrayObject.new_array_from_list(self, lst_w)
 
+    def new_array_from_split(self, source, bounds):
+        """The list array of the strings source[bounds[0]:bounds[1]],
+        source[bounds[2]:bounds[3]], etc."""
+        return W_ArrayObject.new_array_from_split(self, source, bounds)
+
     def new_array_from_rdict(self, rdict_w):
         return W_ArrayObject.new_array_from_rdict(self, rdict_w)
 
@@ -593,9 +597,11 @@ class ObjSpace(object):
                     jit.isconstant(right_length) and right_length == 1):
                     return my_cmp(ord(left[0]), ord(right[0]), ignore_order)
                 #
-                w_right_num, right_valid = convert_string_to_number(right)
+                assert isinstance(w_left, W_StringObject)
+                assert isinstance(w_right, W_StringObject)
+                w_right_num, right_valid = w_right.convert_to_number()
                 if right_valid:
-                    w_left_num, left_valid = convert_string_to_number(left)
+                    w_left_num, left_valid = w_left.convert_to_number()
                     if left_valid:
                         return self._compare(w_left_num, w_right_num,
                                              ignore_order=ignore_order)
@@ -864,8 +870,8 @@ class ObjSpace(object):
 
     def is_really_int(self, w_obj):
         if w_obj.tp == self.tp_str:
-            w_obj, fully_processed = convert_string_to_number(
-                self.str_w(w_obj))
+            assert isinstance(w_obj, W_StringObject)
+            w_obj, fully_processed = w_obj.convert_to_number()
             if not fully_processed:
                 return None
         if w_obj.tp == self.tp_int:
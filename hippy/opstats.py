@@ -0,0 +1,109 @@
+""" Execution counters for the bytecode dispatch loop (--opstats).
+
+For every opcode we count how many times it was executed and the time
+spent in it, in CPU timestamp ticks.  The time of an opcode excludes
+the opcodes it runs itself: a CALL only gets the time of setting up and
+leaving the called function, whose opcodes get the rest.  So the times
+add up to the total time, and the percentages make sense.  We also count
+the executions of each (bytecode, pc) position, to find the hot spots of
+the program.
+"""
+
+from rpython.rlib.listsort import make_timsort_class
+from rpython.rlib.rtimer import read_timestamp
+
+from hippy.consts import BYTECODE_NAMES
+
+NUM_HOT_SPOTS = 25
+
+# both sort in decreasing order of the first item
+OpSort = make_timsort_class(lt=lambda a, b: a[0] > b[0])
+SpotSort = make_timsort_class(lt=lambda a, b: a[0] > b[0])
+
+
+def _rjust(s, width):
+    if len(s) >= width:
+        return s
+    return ' ' * (width - len(s)) + s
+
+
+class CodeCounters(object):
+    def __init__(self, bytecode):
+        self.bytecode = bytecode
+        self.counts = [0] * len(bytecode.code)
+        self.ticks = [0] * len(bytecode.code)
+
+
+class OpStats(object):
+    def __init__(self):
+        self.counts = [0] * len(BYTECODE_NAMES)
+        self.ticks = [0] * len(BYTECODE_NAMES)
+        self.codes = {}     # bytecode -> CodeCounters
+        self.recorded = 0   # the sum of all the ticks recorded so far
+
+    def start(self):
+        # the ticks recorded from now on, by nested opcodes, are not part
+        # of the time of this one: subtract them from the time elapsed
+        return read_timestamp() - self.recorded
+
+    def record(self, bytecode, pc, opcode, start):
+        """Record one execution of 'opcode', found at 'pc' in 'bytecode',
+        that started at the time returned by start()."""
+        ticks = read_timestamp() - self.recorded - start
+        self.recorded += ticks
+        self.counts[opcode] += 1
+        self.ticks[opcode] += ticks
+        counters = self.codes.get(bytecode, None)
+        if counters is None:
+            counters = CodeCounters(bytecode)
+            self.codes[bytecode] = counters
+        counters.counts[pc] += 1
+        counters.ticks[pc] += ticks
+
+    def _percent(self, ticks, total):
+        if total <= 0:
+            return '0%'
+        return '%d%%' % (ticks * 100 // total)
+
+    def report(self):
+        total = 0
+        for ticks in self.ticks:
+            total += ticks
+        ops = []
+        for opcode in range(len(BYTECODE_NAMES)):
+            if self.counts[opcode]:
+                ops.append((self.ticks[opcode], self.counts[opcode],
+                            BYTECODE_NAMES[opcode]))
+        OpSort(ops).sort()
+        lines = ['%s %s %s %s\n' % (_rjust('opcode', 24),
+                                    _rjust('count', 14),
+                                    _rjust('ticks', 16), _rjust('time', 6))]
+        for ticks, count, name in ops:
+            lines.append('%s %s %s %s\n' % (
+                _rjust(name, 24), _rjust(str(count), 14),
+                _rjust(str(ticks), 16), _rjust(self._percent(ticks, total), 6)))
+        #
+        spots = []
+        for counters in self.codes.values():
+            bytecode = counters.bytecode
+            for pc in range(len(counters.counts)):
+                if counters.counts[pc]:
+                    spots.append((counters.counts[pc], counters.ticks[pc],
+                                  pc, bytecode))
+        SpotSort(spots).sort()
+        lines.append('\nhot spots:\n')
+        lines.append('%s %s %s  %s\n' % (_rjust('count', 14),
+                                         _rjust('ticks', 16),
+                                         _rjust('opcode', 24), 'position'))
+        for count, ticks, pc, bytecode in spots[:NUM_HOT_SPOTS]:
+            opname = BYTECODE_NAMES[ord(bytecode.code[pc])]
+            if pc < len(bytecode.bc_mapping):
+                line = bytecode.bc_mapping[pc]
+            else:
+                line = -1
+            lines.append('%s %s %s  %s in %s:%d, pc %d\n' % (
+                _rjust(str(count), 14), _rjust(str(ticks), 16),
+                _rjust(opname, 24), bytecode.name, bytecode.filename,
+                line, pc))
+        return ''.join(lines)
+
@@ -0,0 +1,187 @@
+""" A pre-forking process manager, used to run several FastCGI workers on
+a single listening socket.
+
+The master opens the socket, forks the workers (which inherit it, as well
+as everything the master already had in memory, like the bytecode cache)
+and then only supervises them: dead workers are replaced, workers that
+grow beyond a memory limit are recycled, and SIGHUP replaces every worker
+one at a time, so that there is always someone accepting connections.
+
+'hippy --server port --workers N' runs the FastCGI workers of
+hippy.fcgiserver under such a master.
+"""
+
+import os
+import signal
+import time
+
+from rpython.rlib import rsignal
+from rpython.rlib.rsocket import (
+    RSocket, INETAddress, AF_INET, SOCK_STREAM, SOL_SOCKET, SO_REUSEADDR)
+from rpython.rlib.rmmap import PAGESIZE
+
+LISTEN_BACKLOG = 128
+POLL_INTERVAL = 0.2
+
+
+def open_listening_socket(port, host='0.0.0.0'):
+    """Returns a bound and listening socket"""
+    sock = RSocket(AF_INET, SOCK_STREAM)
+    sock.setsockopt_int(SOL_SOCKET, SO_REUSEADDR, 1)
+    sock.bind(INETAddress(host, port))
+    sock.listen(LISTEN_BACKLOG)
+    return sock
+
+
+def get_rss_kb(pid):
+    """Resident set size of process 'pid' in kB, or -1 if unknown"""
+    try:
+        f = open('/proc/%d/statm' % pid)
+        try:
+            data = f.read(-1)
+        finally:
+            f.close()
+    except (OSError, IOError):
+        return -1
+    fields = data.split(' ')
+    if len(fields) < 2:
+        return -1
+    try:
+        pages = int(fields[1])
+    except ValueError:
+        return -1
+    return pages * (PAGESIZE // 1024)
+
+
+class Worker(object):
+    def __init__(self, pid):
+        self.pid = pid
+        self.stopping = False
+
+
+class PreforkMaster(object):
+    """Keeps 'num_workers' processes running 'run_worker()'.  Subclasses
+    override run_worker(); its result is the exit code of the worker.
+    A 'max_rss_kb' of 0 disables the memory limit.
+    """
+    def __init__(self, num_workers, max_rss_kb=0):
+        assert num_workers > 0
+        self.num_workers = num_workers
+        self.max_rss_kb = max_rss_kb
+        self.workers = {}
+        self.running = False
+        self.reloading = []     # pids still to be replaced after a SIGHUP
+        self.spawned = 0
+
+    def run_worker(self):
+        raise NotImplementedError("abstract base class")
+
+    def spawn_worker(self):
+        pid = os.fork()
+        if pid == 0:
+            # in the worker: forget about the master's signal handling
+            for signum in [signal.SIGHUP, signal.SIGTERM, signal.SIGINT]:
+                rsignal.pypysig_default(signum)
+            exitcode = 1
+            try:
+                exitcode = self.run_worker()
+            finally:
+                os._exit(exitcode)
+        self.workers[pid] = Worker(pid)
+        self.spawned += 1
+        return pid
+
+    def stop_worker(self, pid):
+        worker = self.workers.get(pid, None)
+        if worker is None or worker.stopping:
+            return
+        worker.stopping = True
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except OSError:
+            pass
+
+    def active_workers(self):
+        count = 0
+        for worker in self.workers.itervalues():
+            if not worker.stopping:
+                count += 1
+        return count
+
+    def reap_workers(self):
+        while self.workers:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except OSError:
+                break
+            if pid == 0:
+                break
+            if pid in self.workers:
+                del self.workers[pid]
+
+    def check_memory(self):
+        if self.max_rss_kb <= 0:
+            return
+        for pid in self.workers.keys():
+            if get_rss_kb(pid) > self.max_rss_kb:
+                self.stop_worker(pid)
+
+    def continue_reload(self):
+        # replace the old workers one by one: the next one is only stopped
+        # once the previous one is gone and its replacement is running
+        while self.reloading:
+            pid = self.reloading[-1]
+            worker = self.workers.get(pid, None)
+            if worker is None:
+                self.reloading.pop()
+                continue
+            if not worker.stopping:
+                self.stop_worker(pid)
+            break
+
+    def start_reload(self):
+        self.reloading = self.workers.keys()
+
+    def handle_signals(self):
+        while True:
+            signum = rsignal.pypysig_poll()
+            if signum < 0:
+                break
+            if signum == signal.SIGHUP:
+                self.start_reload()
+            elif signum == signal.SIGTERM or signum == signal.SIGINT:
+                self.running = False
+
+    def step(self):
+        """One round of supervision"""
+        self.handle_signals()
+        self.reap_workers()
+        self.check_memory()
+        self.continue_reload()
+        while self.running and self.active_workers() < self.num_workers:
+            self.spawn_worker()
+
+    def shutdown(self):
+        for pid in self.workers.keys():
+            self.stop_worker(pid)
+        while self.workers:
+            try:
+                pid, status = os.waitpid(-1, 0)
+            except OSError:
+                break
+            if pid in self.workers:
+                del self.workers[pid]
+
+    def run(self):
+        for signum in [signal.SIGHUP, signal.SIGTERM, signal.SIGINT]:
+            rsignal.pypysig_setflag(signum)
+        self.running = True
+        try:
+            while self.running:
+                self.step()
+                time.sleep(POLL_INTERVAL)
+        finally:
+            self.shutdown()
+            for signum in [signal.SIGHUP, signal.SIGTERM, signal.SIGINT]:
+                rsignal.pypysig_default(signum)
+        return 0
@@ -0,0 +1,194 @@
+""" A sampling profiler for PHP code.
+
+A SIGPROF timer interrupts the process every 'interval' microseconds of
+CPU time.  The signal handler only sets a flag; the interpreter notices it
+at the next loop back-edge or function call, and the profiler then records
+the PHP stack found by following the frames' f_backref chain.
+
+The handler is installed with siginterrupt(SIGPROF, 0), so that most
+system calls interrupted by a sample are restarted by the kernel instead
+of failing with EINTR; hippy's I/O paths do not retry them.  Waits with
+a timeout, like select() behind sleep(), usleep() and stream_select(),
+still return early when a sample interrupts them, but the timer only
+runs while the process uses CPU time, so this is rare.
+
+The result is written in the "collapsed stacks" format understood by
+flamegraph.pl and similar tools (one line per distinct stack, outermost
+frame first, followed by the number of samples), and as a report of the
+inclusive and exclusive time spent in each function.
+"""
+
+import os
+import signal
+
+from rpython.rlib import rsignal
+from rpython.rlib.listsort import make_timsort_class
+from rpython.rtyper.lltypesystem import lltype, rffi
+from rpython.rtyper.tool import rffi_platform as platform
+from rpython.translator.tool.cbuild import ExternalCompilationInfo
+
+DEFAULT_INTERVAL = 10000     # in microseconds
+
+# sorts (inclusive, exclusive, name) entries, the most expensive first
+EntrySort = make_timsort_class(
+    lt=lambda a, b: a[0] > b[0] or (a[0] == b[0] and a[1] > b[1]))
+
+eci = ExternalCompilationInfo(includes=['sys/time.h'])
+
+class CConfig(object):
+    _compilation_info_ = eci
+
+    timeval = platform.Struct('struct timeval',
+                              [('tv_sec', rffi.LONG),
+                               ('tv_usec', rffi.LONG)])
+    ITIMER_PROF = platform.ConstantInteger('ITIMER_PROF')
+
+_config = platform.configure(CConfig)
+TIMEVAL = _config['timeval']
+ITIMER_PROF = _config['ITIMER_PROF']
+
+class CConfig2(object):
+    _compilation_info_ = eci
+
+    itimerval = platform.Struct('struct itimerval',
+                                [('it_value', TIMEVAL),
+                                 ('it_interval', TIMEVAL)])
+
+ITIMERVALP = rffi.CArrayPtr(platform.configure(CConfig2)['itimerval'])
+
+c_setitimer = rffi.llexternal('setitimer',
+                              [rffi.INT, ITIMERVALP, ITIMERVALP], rffi.INT,
+                              compilation_info=eci)
+
+
+def _set_timeval(timeval, usec):
+    rffi.setintfield(timeval, 'c_tv_sec', usec // 1000000)
+    rffi.setintfield(timeval, 'c_tv_usec', usec % 1000000)
+
+
+def set_prof_timer(interval):
+    """Arm (or with 0, disarm) the SIGPROF timer, in microseconds"""
+    with lltype.scoped_alloc(ITIMERVALP.TO, 1) as new:
+        _set_timeval(new[0].c_it_value, interval)
+        _set_timeval(new[0].c_it_interval, interval)
+        c_setitimer(ITIMER_PROF, new, lltype.nullptr(ITIMERVALP.TO))
+
+
+def _rjust(s, width):
+    if len(s) >= width:
+        return s
+    return ' ' * (width - len(s)) + s
+
+
+class FunctionStats(object):
+    def __init__(self):
+        self.inclusive = 0
+        self.exclusive = 0
+
+
+class Profiler(object):
+    def __init__(self, interval=DEFAULT_INTERVAL):
+        if interval <= 0:
+            interval = DEFAULT_INTERVAL
+        self.interval = interval
+        self.samples = 0
+        self.stacks = {}        # collapsed stack -> number of samples
+        self.functions = {}     # function name -> FunctionStats
+        self.running = False
+
+    def start(self):
+        rsignal.pypysig_setflag(signal.SIGPROF)
+        # restart the system calls that a sample interrupts
+        rsignal.c_siginterrupt(signal.SIGPROF, 0)
+        set_prof_timer(self.interval)
+        self.running = True
+
+    def stop(self):
+        if not self.running:
+            return
+        self.running = False
+        set_prof_timer(0)
+        # a last SIGPROF may still be on its way; it must not kill us
+        rsignal.pypysig_ignore(signal.SIGPROF)
+
+    def sample(self, interp):
+        """Record the current PHP stack of 'interp'"""
+        labels = []
+        names = []
+        frame = interp.topframeref()
+        while frame is not None:
+            filename, funcname, line = frame.get_position()
+            labels.append('%s (%s:%d)' % (funcname, filename, line))
+            names.append('%s (%s)' % (funcname, filename))
+            frame = frame.f_backref()
+        if not labels:
+            return
+        self.samples += 1
+        labels.reverse()
+        key = ';'.join(labels)
+        self.stacks[key] = self.stacks.get(key, 0) + 1
+        # 'names' is innermost first
+        seen = {}
+        for i in range(len(names)):
+            name = names[i]
+            stats = self.functions.get(name, None)
+            if stats is None:
+                stats = FunctionStats()
+                self.functions[name] = stats
+            if i == 0:
+                stats.exclusive += 1
+            if name not in seen:     # count recursive calls only once
+                seen[name] = None
+                stats.inclusive += 1
+
+    def collapsed_stacks(self):
+        keys = self.stacks.keys()
+        keys.sort()
+        lines = []
+        for key in keys:
+            lines.append('%s %d\n' % (key, self.stacks[key]))
+        return ''.join(lines)
+
+    def report(self):
+        names = self.functions.keys()
+        names.sort()
+        entries = []
+        for name in names:
+            stats = self.functions[name]
+            entries.append((stats.inclusive, stats.exclusive, name))
+        EntrySort(entries).sort()
+        lines = ['%d samples, one every %d us\n' % (self.samples,
+                                                    self.interval),
+                 '%s %s %s %s  function\n' % (
+                     _rjust('incl. ms', 12), _rjust('incl.', 6),
+                     _rjust('excl. ms', 12), _rjust('excl.', 6))]
+        for inclusive, exclusive, name in entries:
+            lines.append('%s %s %s %s  %s\n' % (
+                _rjust(str(self._to_ms(inclusive)), 12),
+                _rjust(self._percent(inclusive), 6),
+                _rjust(str(self._to_ms(exclusive)), 12),
+                _rjust(self._percent(exclusive), 6),
+                name))
+        return ''.join(lines)
+
+    def _to_ms(self, count):
+        return count * self.interval // 1000
+
+    def _percent(self, count):
+        if self.samples == 0:
+            return '0%'
+        return '%d%%' % (count * 100 // self.samples)
+
+    def write(self, fname):
+        """Write the collapsed stacks to 'fname' and the report to
+        'fname.report'"""
+        _write_file(fname, self.collapsed_stacks())
+        _write_file(fname + '.report', self.report())
+
+
+def _write_file(fname, data):
+    fd = os.open(fname, os.O_CREAT | os.O_WRONLY | os.O_TRUNC, 0644)
+    try:
+        os.write(fd, data)
+    finally:
+        os.close(fd)
@@ -0,0 +1,66 @@
+""" writev(): write a list of strings with as few system calls as possible,
+without concatenating them first.
+"""
+
+from rpython.rlib import rposix
+from rpython.rtyper.lltypesystem import lltype, rffi
+from rpython.rtyper.tool import rffi_platform as platform
+from rpython.translator.tool.cbuild import ExternalCompilationInfo
+
+eci = ExternalCompilationInfo(includes=['sys/uio.h', 'limits.h'])
+
+class CConfig(object):
+    _compilation_info_ = eci
+
+    iovec = platform.Struct('struct iovec',
+                            [('iov_base', rffi.CCHARP),
+                             ('iov_len', rffi.SIZE_T)])
+    IOV_MAX = platform.DefinedConstantInteger('IOV_MAX')
+
+_config = platform.configure(CConfig)
+IOVECP = rffi.CArrayPtr(_config['iovec'])
+# the minimum required by POSIX, if the system does not say
+IOV_MAX = _config['IOV_MAX'] or 16
+
+c_writev = rffi.llexternal('writev', [rffi.INT, IOVECP, rffi.INT],
+                           rffi.SSIZE_T, compilation_info=eci,
+                           save_err=rffi.RFFI_SAVE_ERRNO)
+
+
+def _writev_some(fd, strings, start, count, offset):
+    # write strings[start:start + count], except the first 'offset'
+    # characters of strings[start]; return the number of bytes written
+    bufs = []
+    flags = []
+    with lltype.scoped_alloc(IOVECP.TO, count) as iov:
+        for i in range(count):
+            s = strings[start + i]
+            buf, flag = rffi.get_nonmovingbuffer(s)
+            bufs.append(buf)
+            flags.append(flag)
+            skip = offset if i == 0 else 0
+            iov[i].c_iov_base = rffi.ptradd(buf, skip)
+            rffi.setintfield(iov[i], 'c_iov_len', len(s) - skip)
+        try:
+            res = rffi.cast(lltype.Signed, c_writev(fd, iov, count))
+        finally:
+            for i in range(count):
+                rffi.free_nonmovingbuffer(strings[start + i], bufs[i],
+                                          flags[i])
+    if res < 0:
+        raise OSError(rposix.get_saved_errno(), 'writev failed')
+    return res
+
+
+def writev(fd, strings):
+    """Write all the non-empty 'strings' to 'fd', in order"""
+    i = 0
+    offset = 0      # the part of strings[i] that is already written
+    while i < len(strings):
+        count = min(len(strings) - i, IOV_MAX)
+        written = _writev_some(fd, strings, i, count, offset)
+        while i < len(strings) and written >= len(strings[i]) - offset:
+            written -= len(strings[i]) - offset
+            offset = 0
+            i += 1
+        offset += written
@@ -1,8 +1,12 @@
 from rpython.rlib.listsort import make_timsort_class
 from rpython.rlib.objectmodel import specialize
+from rpython.rlib.rarithmetic import r_uint, intmask, LONG_BIT
 from rpython.rlib.unroll import unrolling_iterable
 from hippy.module.standard.strings.funcs import _strnatcmp
 from hippy.localemodule import strcoll_u
+from hippy.objects.intobject import W_IntObject
+from hippy.objects.floatobject import W_FloatObject
+from hippy.objects.strobject import W_StringObject
 
 NONE, KEY, VALUE = range(3)
 
@@ -54,6 +58,50 @@ cmp_funcs = {
 def _get_cmp_func(sort_type):
     return cmp_funcs[sort_type]
 
+# Unless there is a user comparison function, the sort types with a key
+# function other than identity() are sorted on keys computed once per
+# item, in a list parallel to the items, instead of twice per comparison.
+# The numeric keys are unboxed floats and the keys compared with
+# _strnatcmp() or strcoll_u() are plain strings.  The SORT_STRING keys
+# stay wrapped strings, as default_cmp() compares numeric strings as
+# numbers, and a wrapped string caches its numeric value.
+
+def float_key(space, w_obj):
+    return space.float_w(w_obj)
+
+def str_key(space, w_obj):
+    return space.str_w(space.as_string(w_obj))
+
+def str_lower_key(space, w_obj):
+    return space.str_w(space.as_string(w_obj)).lower()
+
+@specialize.argtype(1)
+def raw_cmp(space, a, b):
+    # like space._compare() on two ints, two floats or two non-numeric
+    # strings
+    if a == b:
+        return 0
+    if a < b:
+        return -1
+    return 1
+
+def str_natcmp(space, a, b):
+    return _strnatcmp(a, b)
+
+def str_locale_cmp(space, a, b):
+    return strcoll_u(a, b)
+
+keyed_funcs = {
+    SORT_NUMERIC: (float_key, raw_cmp),
+    SORT_NUMERIC | SORT_FLAG_CASE: (float_key, raw_cmp),
+    SORT_STRING: (to_string, default_cmp),
+    SORT_STRING | SORT_FLAG_CASE: (to_string_lower, default_cmp),
+    SORT_LOCALE_STRING: (str_key, str_locale_cmp),
+    SORT_LOCALE_STRING | SORT_FLAG_CASE: (str_key, str_locale_cmp),
+    SORT_NATURAL: (str_key, str_natcmp),
+    SORT_NATURAL | SORT_FLAG_CASE: (str_lower_key, str_natcmp),
+}
+
 class CustomSortMixin(object):
     _mixin_ = True
 
@@ -107,8 +155,155 @@ def new_sort_class(elem=NONE, sort_type=0, has_cmp_func=False, reverse=False):
     return Sort
 
 
+@specialize.argtype(0)
+def _reorder(values, order):
+    """Put values[order[0]] first, then values[order[1]], etc."""
+    old_values = values[:]
+    for i in range(len(order)):
+        values[i] = old_values[order[i]]
+
+
+@specialize.arg(1)
+def _get_item(value, elem):
+    if elem == KEY:
+        value, _ = value
+    elif elem == VALUE:
+        _, value = value
+    return value
+
+
+def new_key_sort_class(cmp_func, reverse):
+    TimSort = make_timsort_class()
+
+    class KeyedSort(TimSort):
+        """Sorts the indices of the items, comparing their keys"""
+
+        def __init__(self, space, keys):
+            TimSort.__init__(self, range(len(keys)))
+            self.space = space
+            self.keys = keys
+
+        def lt(self, i, j):
+            res = cmp_func(self.space, self.keys[i], self.keys[j])
+            if reverse:
+                return res > 0
+            return res < 0
+
+    return KeyedSort
+
+
+def new_keyed_sort(elem=NONE, sort_type=0, reverse=False):
+    key_func, cmp_func = keyed_funcs[sort_type]
+    KeyedSort = new_key_sort_class(cmp_func, reverse)
+
+    def keyed_sort(space, values):
+        keys = [key_func(space, _get_item(value, elem)) for value in values]
+        sorter = KeyedSort(space, keys)
+        sorter.sort()
+        _reorder(values, sorter.list)
+    return keyed_sort
+
+
+# With SORT_REGULAR, the items are most often all ints or all strings.
+# Such arrays are sorted on a list of the unwrapped items, compared
+# directly instead of with space._compare().  Large arrays of ints are
+# radix-sorted instead.  Two strings are compared as numbers if both are
+# numeric, so the strings are only compared as bytes if at most one of
+# them is numeric.  Other arrays take the generic path.
+
+RADIX_SORT_MIN_LENGTH = 1024
+SIGN_BIT = r_uint(1) << (LONG_BIT - 1)
+
+
+def radix_sort_order(keys, reverse):
+    """The indices of the ints 'keys' in the order of a stable sort"""
+    n = len(keys)
+    ukeys = [r_uint(0)] * n
+    for i in range(n):
+        # flipping the sign bit gives unsigned ints in the same order
+        ukey = r_uint(keys[i]) ^ SIGN_BIT
+        if reverse:
+            ukey = ~ukey
+        ukeys[i] = ukey
+    order = range(n)
+    other = [0] * n
+    shift = 0
+    while shift < LONG_BIT:
+        starts = [0] * 257
+        for ukey in ukeys:
+            starts[intmask((ukey >> shift) & 0xff) + 1] += 1
+        if starts[intmask((ukeys[0] >> shift) & 0xff) + 1] != n:
+            # this byte is not the same in all the keys
+            for digit in range(256):
+                starts[digit + 1] += starts[digit]
+            for i in order:
+                digit = intmask((ukeys[i] >> shift) & 0xff)
+                other[starts[digit]] = i
+                starts[digit] += 1
+            order, other = other, order
+        shift += 8
+    return order
+
+
+def new_homogeneous_sort(elem=NONE, reverse=False):
+    IntSort = new_key_sort_class(raw_cmp, reverse)
+    FloatSort = new_key_sort_class(raw_cmp, reverse)
+    StrSort = new_key_sort_class(raw_cmp, reverse)
+
+    def homogeneous_sort(space, values):
+        """Sort 'values' if the items are all ints, all floats or all
+        strings with at most one numeric one, and return True"""
+        if len(values) < 2:
+            return False
+        ints = floats = strs = 0
+        numeric_strs = 0
+        for value in values:
+            w_item = _get_item(value, elem)
+            if isinstance(w_item, W_IntObject):
+                ints += 1
+            elif isinstance(w_item, W_FloatObject):
+                floats += 1
+            elif isinstance(w_item, W_StringObject):
+                strs += 1
+                _, valid = w_item.convert_to_number()
+                if valid:
+                    numeric_strs += 1
+            else:
+                return False
+        if ints == len(values):
+            int_keys = [space.int_w(_get_item(value, elem))
+                        for value in values]
+            if len(values) >= RADIX_SORT_MIN_LENGTH:
+                order = radix_sort_order(int_keys, reverse)
+            else:
+                int_sorter = IntSort(space, int_keys)
+                int_sorter.sort()
+                order = int_sorter.list
+        elif floats == len(values):
+            float_keys = [space.float_w(_get_item(value, elem))
+                          for value in values]
+            float_sorter = FloatSort(space, float_keys)
+            float_sorter.sort()
+            order = float_sorter.list
+        elif strs == len(values) and numeric_strs < 2:
+            str_keys = [space.str_w(_get_item(value, elem))
+                        for value in values]
+            str_sorter = StrSort(space, str_keys)
+            str_sorter.sort()
+            order = str_sorter.list
+        else:
+            return False
+        _reorder(values, order)
+        return True
+    return homogeneous_sort
+
+
 SORT_CLASSES = {
 }
+KEYED_SORTS = {
+}
+HOMOGENEOUS_SORTS = {
+}
 
 for _elem in (NONE, KEY, VALUE):
     for _sort_type in SUPPORTED_SORT_TYPES:
@@ -118,6 +313,14 @@ for _elem in (NONE, KEY, VALUE):
                                       has_cmp_func=_has_cmp_func,
                                       reverse=rev)
                 SORT_CLASSES[(_elem, _sort_type, _has_cmp_func, rev)] = _cls
+        if _sort_type in keyed_funcs:
+            for rev in (True, False):
+                KEYED_SORTS[(_elem, _sort_type, rev)] = new_keyed_sort(
+                    elem=_elem, sort_type=_sort_type, reverse=rev)
+
+    for rev in (True, False):
+        HOMOGENEOUS_SORTS[(_elem, rev)] = new_homogeneous_sort(
+            elem=_elem, reverse=rev)
 
 all_sort_types = unrolling_iterable(SUPPORTED_SORT_TYPES)
 
@@ -127,6 +330,21 @@ def _get_sort_class(elem, type, has_cmp, reverse):
     return SORT_CLASSES[(elem, type, has_cmp, reverse)]
 
 
+@specialize.memo()
+def _has_keyed_sort(type):
+    return type in keyed_funcs
+
+
+@specialize.memo()
+def _get_keyed_sort(elem, type, reverse):
+    return KEYED_SORTS[(elem, type, reverse)]
+
+
+@specialize.memo()
+def _get_homogeneous_sort(elem, reverse):
+    return HOMOGENEOUS_SORTS[(elem, reverse)]
+
+
 @specialize.arg(4, 5)
 def _sort(space, values, cmp=None, sort_type=0, elem=NONE, reverse=False):
     if sort_type not in SUPPORTED_SORT_TYPES:
@@ -134,7 +352,13 @@ def _sort(space, values, cmp=None, sort_type=0, elem=NONE, reverse=False):
         sort_type = 0
     for type in all_sort_types:
         if sort_type == type:
-            if cmp is None:
+            if cmp is None and _has_keyed_sort(type):
+                _get_keyed_sort(elem, type, reverse)(space, values)
+                return
+            elif cmp is None:
+                # the key function of the sort types left is identity()
+                if _get_homogeneous_sort(elem, reverse)(space, values):
+                    return
                 Sort = _get_sort_class(elem, type, False, reverse)
                 Sort(values, space=space).sort()
                 return
@@ -147,14 +371,24 @@ def _sort(space, values, cmp=None, sort_type=0, elem=NONE, reverse=False):
 
 _TimSort = make_timsort_class()
 class MultiSort(_TimSort):
-    def __init__(self, space, list, key_funcs, cmp_funcs, signs):
+    """Sorts the lines of a table in place, comparing the keys of the
+    lines, which are computed once per line by get_cmp_elem()"""
+
+    def __init__(self, space, table, key_funcs, cmp_funcs, signs):
         self.space = space
-        _TimSort.__init__(self, list)
         self._n = len(key_funcs)
         assert len(signs) == self._n
         self.key_funcs = key_funcs
         self.cmp_funcs = cmp_funcs
         self.signs = signs
+        self.table = table
+        self.keys = [self.get_cmp_elem(line) for line in table]
+        _TimSort.__init__(self, range(len(table)))
+
+    def sort(self):
+        # sort the indices, then put the lines in their order
+        _TimSort.sort(self)
+        _reorder(self.table, self.list)
 
     def get_cmp_elem(self, line):
         return [self.key_funcs[i](self.space, line[i][1])
@@ -169,10 +403,8 @@ class MultiSort(_TimSort):
         else:
             return result
 
-    def lt(self, line1, line2):
-        key1 = self.get_cmp_elem(line1)
-        key2 = self.get_cmp_elem(line2)
-        res = self.cmp(key1, key2)
+    def lt(self, i, j):
+        res = self.cmp(self.keys[i], self.keys[j])
         return res < 0
 
 signs = {SORT_DESC: -1, SORT_ASC: 1}
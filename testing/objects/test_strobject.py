@@ -1,5 +1,7 @@
 import sys
-from hippy.objects.strobject import W_ConstStringObject
+from hippy.objects.strobject import (W_ConstStringObject,
+                                     W_ConcatStringObject,
+                                     W_MutableStringObject)
 
 from testing.test_interpreter import BaseTestInterpreter
 
@@ -8,6 +10,54 @@ def test_is_numeric():
     assert W_ConstStringObject(' +').is_numeric() is False
     assert W_ConstStringObject('abc').is_numeric() is False
 
+def test_number_cache():
+    w_s = W_ConstStringObject('12abc')
+    w_num, valid = w_s.convert_to_number()
+    assert w_num.intval == 12 and not valid
+    assert w_s.convert_to_number() == (w_num, False)
+    assert w_s.as_number() is w_num
+    assert not w_s.is_really_valid_number()
+    w_s = W_ConstStringObject(' 1.5')
+    assert w_s.as_number().floatval == 1.5
+    assert w_s.is_really_valid_number()
+    w_s = W_MutableStringObject(bytearray('15'))
+    assert w_s.as_number().intval == 15
+    w_s.set_char_at(2, 'x')
+    assert w_s.as_number().intval == 15
+    assert not w_s.is_really_valid_number()
+    w_s.set_char_at(0, '2')
+    assert w_s.as_number().intval == 25
+
+def test_concat_rope():
+    w_a = W_ConstStringObject('a').strconcat(None, W_ConstStringObject('b'))
+    w_ab1 = w_a.strconcat(None, W_ConstStringObject('1'))
+    # w_a's builder was extended: w_ab2 must not copy it, nor see the '1'
+    w_ab2 = w_a.strconcat(None, W_ConstStringObject('2'))
+    w_ab23 = w_ab2.strconcat(None, W_ConstStringObject('3'))
+    assert isinstance(w_ab23, W_ConcatStringObject)
+    assert w_ab23._prefix is w_a
+    assert w_ab1.unwrap() == 'ab1'
+    assert w_ab2.unwrap() == 'ab2'
+    assert w_ab23.strlen() == 4
+    assert w_ab23.character(3) == '3'
+    assert w_ab23.unwrap() == 'ab23'
+    assert w_a.unwrap() == 'ab'
+    w_long = W_ConstStringObject('x' * 1000).strconcat(None, w_ab23)
+    assert w_long.strlen() == 1004
+    assert w_long.extend(['!', '?']).unwrap() == 'x' * 1000 + 'ab23!?'
+
+def test_concat_rope_long_chain():
+    w_base = W_ConstStringObject('').strconcat(None, W_ConstStringObject(''))
+    w_str = w_base
+    expected = []
+    for i in range(5000):
+        # always concatenate to an old string, so that a new builder is used
+        w_str.strconcat(None, W_ConstStringObject('lost'))
+        w_str = w_str.strconcat(None, W_ConstStringObject(str(i)))
+        expected.append(str(i))
+    assert w_str._prefix._prefix is not None
+    assert w_str.unwrap() == ''.join(expected)
+
 class TestStrObject(BaseTestInterpreter):
 
     def test_uplusplus(self):
@@ -46,6 +46,9 @@ class MockInterpreter(Interpreter):
     def writestr(self, msg, buffer=True):
         self.output.append(msg)
 
+    def writechunks(self, chunks, buffer=True):
+        self.output.append(''.join(chunks))
+
     def _log_traceback(self, filename, funcname, line, source):
         self.tb.append((filename, funcname, line, source))
 
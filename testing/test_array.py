@@ -1,5 +1,6 @@
 # -*- coding: utf-8 -*-
 import py
+import sys
 from hippy.objects.arrayiter import RDictArrayIteratorRef
 from hippy.objects.intobject import W_IntObject as W_Int
 from hippy.objects.strobject import W_ConstStringObject as W_Str
@@ -25,6 +26,27 @@ def test_iter_ref():
     assert (w_k, w_v.deref()) == (W_Int(2), W_Str('2'))
     assert it.finished
 
+def test_iter_ref_unset():
+    space = ObjSpace()
+    w_arr = space.new_array_from_pairs([(W_Str("k%d" % i), W_Int(i))
+                                        for i in range(40)])
+    r_arr = W_Reference(w_arr)
+    it = w_arr.create_iter_ref(space, r_arr)
+    seen = []
+    while not it.finished:
+        w_k, w_v = it.next_item(space)
+        if w_v is None:
+            break
+        i = w_v.deref().intval
+        seen.append(i)
+        # unset the next item, and the previous ones when past the middle
+        r_arr.deref()._unsetitem_str("k%d" % (i + 1))
+        if i > 20:
+            for j in range(i):
+                r_arr.deref()._unsetitem_str("k%d" % j)
+    assert r_arr.deref()._compactions > 0
+    assert seen == range(0, 40, 2)
+
 class TestArrayDirect(object):
     def create_array_strats(self, space):
         # int, float, mix, empty, hash, copy
@@ -121,6 +143,126 @@ class TestArrayDirect(object):
         assert cp_arr.isset_index(space, space.wrap(0))
         assert not cp_arr.isset_index(space, space.wrap(13))
 
+    def test_list_storage(self):
+        space = ObjSpace()
+        int_arr, float_arr, mix_arr, empty, hash, cp_arr = \
+            self.create_array_strats(space)
+        assert int_arr.storage_kind() == 'int'
+        assert float_arr.storage_kind() == 'float'
+        assert mix_arr.storage_kind() == 'object'
+        assert empty.storage_kind() == 'object'
+        w_copy = int_arr.copy()
+        assert w_copy.int_items == [1, 2]
+        w_copy.appenditem_inplace(space, space.wrap(3))
+        assert w_copy.int_items == [1, 2, 3]
+        w_copy.appenditem_inplace(space, space.newstr("x"))
+        assert w_copy.storage_kind() == 'object'
+        assert space.int_w(space.getitem(w_copy, space.wrap(2))) == 3
+        assert space.str_w(space.getitem(w_copy, space.wrap(3))) == "x"
+        assert int_arr.int_items == [1, 2]
+        #
+        empty.appenditem_inplace(space, space.wrap(1.5))
+        assert empty.float_items == [1.5]
+        w_arr = space.setitem(float_arr, space.wrap(1), space.wrap(4))
+        assert w_arr.storage_kind() == 'object'
+        assert float_arr.storage_kind() == 'float'
+        assert space.float_w(space.getitem(w_arr, space.wrap(0))) == 1.2
+        assert space.int_w(space.getitem(w_arr, space.wrap(1))) == 4
+        #
+        w_arr = space.new_array_from_list([space.wrap(1), space.wrap(2)])
+        w_arr._unsetitem(space, space.wrap(1))
+        assert w_arr.int_items == [1]
+        w_arr = w_arr._unsetitem(space, space.wrap(0))
+        assert w_arr.arraylen() == 0
+
+    def test_copy_on_write(self):
+        from hippy.objects.arrayobject import copy_stats
+        space = ObjSpace()
+        w_arr = space.new_array_from_list([space.wrap(1), space.wrap(2)])
+        forced_copies = copy_stats.forced_copies
+        w_copy = w_arr.copy()
+        assert w_copy.int_items is w_arr.int_items
+        w_copy.appenditem_inplace(space, space.wrap(3))
+        assert w_copy.int_items == [1, 2, 3]
+        assert w_arr.int_items == [1, 2]
+        assert copy_stats.forced_copies == forced_copies + 1
+        # the original is the last user of its storage: no more copies
+        w_arr.appenditem_inplace(space, space.wrap(4))
+        assert w_arr.int_items == [1, 2, 4]
+        assert copy_stats.forced_copies == forced_copies + 1
+        #
+        w_hash = space.new_map_from_pairs([(space.newstr("a"), w_arr)])
+        w_copy = w_hash.copy()
+        assert w_copy.dct_w is w_hash.dct_w
+        w_copy = w_copy._unsetitem(space, space.newstr("b"))
+        assert w_copy.dct_w is w_hash.dct_w
+        w_copy = space.setitem(w_hash, space.newstr("b"), space.wrap(5))
+        assert w_copy.dct_w is not w_hash.dct_w
+        assert w_copy.dct_w["a"] is not w_arr
+        assert w_copy.dct_w["a"].int_items is w_arr.int_items
+        assert w_hash.arraylen() == 1
+        assert w_copy.arraylen() == 2
+
+    def test_split_storage(self):
+        space = ObjSpace()
+        w_arr = space.new_array_from_split("ab,c,,def", [0, 2, 3, 4, 5, 5,
+                                                         6, 9])
+        assert w_arr.storage_kind() == 'split'
+        assert w_arr.arraylen() == 4
+        assert space.str_w(space.getitem(w_arr, space.wrap(3))) == "def"
+        assert [space.str_w(w_item) for w_item in w_arr.as_list_w()] == [
+            "ab", "c", "", "def"]
+        w_copy = w_arr.copy()
+        assert space.str_w(w_copy._inplace_pop(space)) == "def"
+        assert w_copy.storage_kind() == 'split'
+        assert w_copy.arraylen() == 3
+        assert w_arr.arraylen() == 4
+        w_copy.appenditem_inplace(space, space.wrap(5))
+        assert w_copy.storage_kind() == 'object'
+        assert [space.str_w(w_item) for w_item in w_copy.lst_w] == [
+            "ab", "c", "", "5"]
+        w_copy = space.setitem(w_arr, space.wrap(0), space.newstr("x"))
+        assert w_copy.storage_kind() == 'object'
+        assert w_arr.storage_kind() == 'split'
+        assert space.str_w(space.getitem(w_arr, space.wrap(0))) == "ab"
+        assert space.new_array_from_split("", []).storage_kind() == 'object'
+
+    def test_value_index(self):
+        from hippy.objects.arrayobject import VALUE_INDEX_SEARCHES
+        space = ObjSpace()
+        source = "".join(["k%d," % (i % 20) for i in range(40)])
+        bounds = []
+        start = 0
+        for i in range(40):
+            stop = source.index(",", start)
+            bounds += [start, stop]
+            start = stop + 1
+        w_arr = space.new_array_from_split(source, bounds)
+        for i in range(VALUE_INDEX_SEARCHES - 1):
+            assert w_arr.get_value_index(space) is None
+        index = w_arr.get_value_index(space)
+        assert index.can_find(space.newstr("x"))
+        assert not index.can_find(space.wrap(0))
+        assert space.int_w(index.find(space, space.newstr("k3"))) == 3
+        assert index.find(space, space.newstr("k20")) is None
+        assert w_arr.get_value_index(space) is index
+        w_copy = w_arr.copy()
+        w_copy.appenditem_inplace(space, space.newstr("k20"))
+        assert w_arr.get_value_index(space) is index
+        w_arr.appenditem_inplace(space, space.newstr("k21"))
+        assert w_arr._value_index is None
+        assert w_arr.get_value_index(space) is None
+        # only for arrays of ints or of non-numeric strings
+        for items_w in [[space.newstr("12")] * 20,
+                        [space.wrap(1), space.newstr("a")] * 10,
+                        [space.wrap(1.5)] * 20]:
+            w_arr = space.new_array_from_list(items_w)
+            for i in range(VALUE_INDEX_SEARCHES - 1):
+                w_arr.get_value_index(space)
+            assert not w_arr.get_value_index(space).can_find(space.wrap(1))
+            assert not w_arr.get_value_index(space).can_find(
+                space.newstr("12"))
+
     def test_hashes(self):
         space = ObjSpace()
         assert space.wrap(1).hash(space) == space.newstr("1").hash(space)
@@ -164,6 +306,61 @@ class TestArrayDirect(object):
         assert unpack(space, w_iter.next_item(space)) == ["b", 12]
         assert w_iter.done()
 
+    def test_map_pointer(self):
+        from hippy.objects.arrayobject import COMPACT_MIN_DELETED
+        space = ObjSpace()
+        n = 4 * COMPACT_MIN_DELETED
+        w_arr = space.new_map_from_pairs([(space.newstr("k%d" % i),
+                                           space.wrap(i)) for i in range(n)])
+        w_arr._pointer_forward()
+        w_arr._pointer_forward()
+        assert space.int_w(w_arr._current()) == 2
+        # unsetting the current item moves to the next one
+        w_arr._unsetitem_str("k2")
+        assert space.int_w(w_arr._current()) == 3
+        w_arr._unsetitem_str("k0")
+        w_arr._unsetitem_str("k5")
+        assert space.int_w(w_arr._current()) == 3
+        assert w_arr._pointer_backward()
+        assert space.int_w(w_arr._current()) == 1
+        assert not w_arr._pointer_backward()
+        # an unset key set again goes to the end
+        w_arr._setitem_str("k0", space.wrap(-1), False)
+        w_arr._pointer_end()
+        assert space.int_w(w_arr._current()) == -1
+        assert space.str_w(w_arr._key(space)) == "k0"
+        assert space.is_w(w_arr.next(space), space.w_False)
+        w_arr._pointer_reset()
+        assert space.int_w(w_arr._current()) == 1
+        # compacting the keys keeps the current item
+        w_arr._pointer_forward()
+        w_arr._pointer_forward()
+        assert space.int_w(w_arr._current()) == 4
+        for i in range(6, n):
+            if i != 40:
+                w_arr._unsetitem_str("k%d" % i)
+        assert w_arr._compactions > 0
+        assert w_arr._live_keys() == ["k1", "k3", "k4", "k40", "k0"]
+        assert space.int_w(w_arr._current()) == 4
+        assert space.int_w(w_arr.next(space)) == 40
+
+    def test_map_pointer_copy(self):
+        space = ObjSpace()
+        w_arr = space.new_map_from_pairs([(space.newstr(c), space.newstr(c))
+                                          for c in "abcd"])
+        w_arr._pointer_forward()
+        w_arr._unsetitem_str("a")
+        w_copy = w_arr.copy()
+        w_copy._unsetitem_str("b")
+        w_copy._setitem_str("a", space.newstr("A"), False)
+        assert w_arr._live_keys() == ["b", "c", "d"]
+        assert space.str_w(w_arr._current()) == "b"
+        assert w_copy._live_keys() == ["c", "d", "a"]
+        assert space.str_w(w_copy._current()) == "c"
+        assert space.str_w(w_copy._inplace_pop(space)) == "A"
+        assert w_copy._live_keys() == ["c", "d"]
+        assert space.str_w(w_copy._current()) == "c"
+
     def unpack(self, space, (w_key, w_obj)):
         if w_key.tp == space.tp_int:
             key = space.int_w(w_key)
@@ -345,7 +542,6 @@ class TestArray(BaseTestInterpreter):
         assert self.space.int_w(output[0]) == 2
 
     def test_float_strategy(self):
-        py.test.skip("no special float strategy for now")
         output = self.run('''
         $a = array();
         $a[] = 3.0;
@@ -355,14 +551,66 @@ class TestArray(BaseTestInterpreter):
         $b[0] = 1;
         echo $a, $b;
         ''')
-        [i.force_write() for i in output]
-        assert [i.strategy.name for i in output] == [
-            'lfloat', 'lfloat', 'lfloat', 'lobject']
-        assert output[0].strategy.unerase(output[0].storage) == [3.0]
-        assert output[1].strategy.unerase(output[1].storage) == [1.2, 3.2]
-        assert output[2].strategy.unerase(output[2].storage) == [3.0, 1.2]
-        assert self.space.int_w(
-            output[3].strategy.unerase(output[3].storage)[0]) == 1
+        assert [w_arr.storage_kind() for w_arr in output] == [
+            'float', 'float', 'float', 'object']
+        assert output[0].float_items == [3.0]
+        assert output[1].float_items == [1.2, 3.2]
+        assert output[2].float_items == [3.0, 1.2]
+        assert self.space.int_w(output[3].lst_w[0]) == 1
+
+    def test_float_strategy_to_object(self):
+        output = self.run('''
+        $b = array(1.2, 3.2);
+        $b[0] = 1;
+        echo $b, $b[1];
+        ''')
+        assert output[0].storage_kind() == 'object'
+        assert self.space.int_w(output[0].lst_w[0]) == 1
+        assert self.space.float_w(output[0].lst_w[1]) == 3.2
+        assert self.space.float_w(output[1]) == 3.2
+
+    def test_int_strategy(self):
+        output = self.run('''
+        $a = array();
+        for ($i = 0; $i < 5; $i++) {
+            $a[] = $i * $i;
+        }
+        $b = $a;
+        $b[2] = "x";
+        $c = $a;
+        $c[] = 1.5;
+        $d = array(1, 2, 3);
+        $e = &$d[1];
+        echo $a, $b, $c, $d;
+        echo $a[4], $b[2], $c[5], $d[1];
+        ''')
+        assert [w_arr.storage_kind() for w_arr in output[:4]] == [
+            'int', 'object', 'object', 'object']
+        assert output[0].int_items == [0, 1, 4, 9, 16]
+        assert self.space.int_w(output[4]) == 16
+        assert self.space.str_w(output[5]) == "x"
+        assert self.space.float_w(output[6]) == 1.5
+        assert self.space.int_w(output[7]) == 2
+
+    def test_split_strategy(self):
+        output = self.run('''
+        $a = explode(",", "a,bc,d");
+        list($x, $y) = $a;
+        $b = $a;
+        $b[] = "e";
+        $c = str_split("abcde", 2);
+        foreach ($c as $k => $v) {
+            echo $k, $v;
+        }
+        echo $a, $b, $c, $x, $y;
+        ''')
+        assert [self.space.str_w(w) for w in output[:6]] == [
+            "0", "ab", "1", "cd", "2", "e"]
+        assert [w_arr.storage_kind() for w_arr in output[6:9]] == [
+            'split', 'object', 'split']
+        assert output[6].split_bounds == [0, 1, 2, 4, 5, 6]
+        assert self.space.str_w(output[9]) == "a"
+        assert self.space.str_w(output[10]) == "bc"
 
     def test_append_empty(self):
         output = self.run('''
@@ -557,6 +805,27 @@ class TestArray(BaseTestInterpreter):
         assert self.space.int_w(output[5]) == 1
         assert self.space.int_w(output[6]) == 1
 
+    def test_in_array_repeated(self):
+        output = self.run('''
+        $a = array();
+        for ($i = 0; $i < 50; $i++) {
+            $a["k$i"] = "v" . ($i % 25);
+        }
+        $found = 0;
+        for ($i = 0; $i < 40; $i++) {
+            $found += in_array("v$i", $a);
+        }
+        echo $found;
+        echo array_search("v3", $a), array_search("v3", $a, true);
+        echo array_search(0, $a), in_array("v40", $a);
+        $a["k3"] = "v40";
+        echo in_array("v40", $a), array_search("v3", $a);
+        unset($a["k28"]);
+        echo array_search("v3", $a);
+        ''')
+        assert [self.space.str_w(s) for s in output] == [
+            '25', 'k3', 'k3', 'k0', '', '1', 'k28', '']
+
     def test_array_search(self):
         output = self.run('''
         $a = array(0, 1, 2, "C", "c", "5");
@@ -663,6 +932,16 @@ class TestArray(BaseTestInterpreter):
         assert [self.space.int_w(s) for s in output] == [3, 1, 2, 2,
                                                          2, 1, 2, 0]
 
+    def test_array_intersect_several(self):
+        output = self.run('''
+        $a = array(1, 2, 3, "4");
+        $result = array_intersect($a, array(2, 2, 4), array(3, 4.0));
+        foreach($result as $k => $v) {
+            echo $k, $v;
+        }
+        ''')
+        assert [self.space.str_w(s) for s in output] == ["3", "4"]
+
     def test_array_intersect_error(self):
         self.run('''
         echo array_intersect();
@@ -707,6 +986,40 @@ class TestArray(BaseTestInterpreter):
         assert self.space.str_w(output[1]) == "0"
         assert self.space.str_w(output[2]) == "b"
 
+    def test_array_pointer_unset(self):
+        output = self.run('''
+        $a = array();
+        for ($i = 0; $i < 50; $i++) {
+            $a['k' . $i] = $i;
+        }
+        next($a);
+        unset($a['k1']);
+        echo current($a);
+        unset($a['k0']);
+        echo prev($a) === false;
+        for ($i = 3; $i < 49; $i++) {
+            unset($a['k' . $i]);
+        }
+        echo current($a);
+        echo key($a);
+        echo next($a);
+        echo next($a) === false;
+        $a['k0'] = 0;
+        echo end($a);
+        echo prev($a);
+        echo reset($a);
+        list($k, $v) = each($a);
+        echo $v;
+        echo current($a);
+        $s = 0;
+        foreach ($a as $k => $v) {
+            $s += $v;
+        }
+        echo $s;
+        ''')
+        assert [self.space.str_w(s) for s in output] == [
+            '2', '1', '2', 'k2', '49', '1', '0', '49', '2', '2', '49', '51']
+
     def test_array_pop_resets_internal_pointer(self):
         output = self.run('''
         $array = array(1, 2, 3, 4, 5, 6, 7, 8);
@@ -1024,6 +1337,16 @@ class TestArray(BaseTestInterpreter):
         assert self.space.str_w(output[0]) == "blue"
         assert self.space.int_w(output[1]) == 1
 
+    def test_array_diff_several(self):
+        output = self.run('''
+        $a = array(1, "2", 3.0, "x", 5, 1);
+        $result = array_diff($a, array("1", 7), array(2, 2), array("3"));
+        foreach($result as $k => $v) {
+            echo $k, $v;
+        }
+        ''')
+        assert [self.space.str_w(s) for s in output] == ["3", "x", "4", "5"]
+
     def test_array_diff_ukey(self):
         output = self.run('''
         function key_compare_func($key1, $key2)
@@ -1997,13 +2320,13 @@ class TestArray(BaseTestInterpreter):
         w_b = space.newstr("b")
         w_arr = space.new_map_from_pairs([(w_a, space.wrap(0)),
                                           (w_b, space.wrap(12))])
-        assert w_arr._getkeylist() == ['a', 'b']
+        assert w_arr._live_keys() == ['a', 'b']
         assert w_arr.arraylen() == 2
         assert len(w_arr.dct_w) == 2
         assert space.int_w(space.getitem(w_arr, w_a)) == 0
         w_arr2 = space.setitem(w_arr, space.wrap(0), space.wrap(15))
-        assert w_arr._getkeylist() == ['a', 'b']
-        assert w_arr2._getkeylist() == ['a', 'b', '0']
+        assert w_arr._live_keys() == ['a', 'b']
+        assert w_arr2._live_keys() == ['a', 'b', '0']
 
     def test_setitem_keylist_hash(self):
         space = ObjSpace()
@@ -2011,12 +2334,12 @@ class TestArray(BaseTestInterpreter):
         w_b = space.newstr("b")
         w_arr = space.new_map_from_pairs([(w_a, space.wrap(0)),
                                           (w_b, space.wrap(12))])
-        assert w_arr._getkeylist() == ['a', 'b']
+        assert w_arr._live_keys() == ['a', 'b']
         assert w_arr.arraylen() == 2
         assert len(w_arr.dct_w) == 2
         assert space.int_w(space.getitem(w_arr, w_a)) == 0
         w_arr = space.setitem(w_arr, w_b, space.wrap(3))
-        assert w_arr._getkeylist() == ['a', 'b']
+        assert w_arr._live_keys() == ['a', 'b']
         assert space.int_w(space.getitem(w_arr, w_b)) == 3
         assert w_arr.isset_index(space, w_b)
 
@@ -2024,10 +2347,10 @@ class TestArray(BaseTestInterpreter):
         assert not w_arr.isset_index(space, space.newstr("c"))
         w_arr2 = space.setitem(w_arr, space.wrap(0), space.wrap(15))
 
-        assert w_arr._getkeylist() == ['a', 'b']
+        assert w_arr._live_keys() == ['a', 'b']
         assert w_arr.arraylen() == len(w_arr.dct_w)
 
-        assert w_arr2._getkeylist() == ['a', 'b', '0']
+        assert w_arr2._live_keys() == ['a', 'b', '0']
         assert w_arr2.arraylen() == len(w_arr2.dct_w)
 
         assert w_arr2.strategy_name == 'hash'
@@ -2036,32 +2359,32 @@ class TestArray(BaseTestInterpreter):
         assert space.int_w(space.getitem(w_arr2, space.wrap(0))) == 15
 
         w_arr3 = space.setitem(w_arr2, space.newstr("c"), space.wrap(38))
-        assert w_arr3._getkeylist() == ['a', 'b', '0', 'c']
+        assert w_arr3._live_keys() == ['a', 'b', '0', 'c']
         assert w_arr3.arraylen() == len(w_arr3.dct_w)
 
         w_arr4 = w_arr3._unsetitem(space, space.newstr("c"))
-        assert w_arr4._getkeylist() == ['a', 'b', '0']
+        assert w_arr4._live_keys() == ['a', 'b', '0']
         assert w_arr4.arraylen() == len(w_arr4.dct_w)
 
         w_arr5 = w_arr4._unsetitem(space, space.newstr("0"))
-        assert w_arr5._getkeylist() == ['a', 'b']
+        assert w_arr5._live_keys() == ['a', 'b']
         assert w_arr5.arraylen() == len(w_arr5.dct_w)
 
         w_arr6 = w_arr5._unsetitem(space, space.newstr("a"))
-        assert w_arr6._getkeylist() == ['b']
+        assert w_arr6._live_keys() == ['b']
         assert w_arr6.arraylen() == len(w_arr6.dct_w)
 
         w_arr7 = space.setitem(w_arr6, space.newstr("b"), space.wrap(38))
-        assert w_arr7._getkeylist() == ['b']
+        assert w_arr7._live_keys() == ['b']
         assert w_arr7.arraylen() == 1
         assert len(w_arr7.dct_w) == 1
 
         w_arr8 = w_arr7._unsetitem(space, space.newstr("b"))
-        assert w_arr8._getkeylist() == []
+        assert w_arr8._live_keys() == []
         assert w_arr8.arraylen() == len(w_arr8.dct_w)
 
         w_arr9 = space.setitem(w_arr8, space.newstr("php"), space.wrap(38))
-        assert w_arr9._getkeylist() == ['php']
+        assert w_arr9._live_keys() == ['php']
         assert w_arr9.arraylen() == 1
         assert len(w_arr9.dct_w) == 1
 
@@ -2079,27 +2402,27 @@ class TestArray(BaseTestInterpreter):
 
         w_arr2 = space.setitem(w_arr, space.wrap(11), space.wrap(15))
         assert w_arr2.strategy_name == 'hash'
-        assert w_arr2._getkeylist() == ['0', '1', '2', '3', '4', '5', '11']
+        assert w_arr2._live_keys() == ['0', '1', '2', '3', '4', '5', '11']
         assert w_arr2.arraylen() == len(w_arr2.dct_w)
 
         w_arr3 = space.setitem(w_arr2, space.wrap(11), space.wrap(15))
-        assert w_arr3._getkeylist() == ['0', '1', '2', '3', '4', '5', '11']
+        assert w_arr3._live_keys() == ['0', '1', '2', '3', '4', '5', '11']
         assert w_arr3.arraylen() == len(w_arr3.dct_w)
 
         w_arr4 = w_arr3._unsetitem(space, space.wrap(0))
-        assert w_arr4._getkeylist() == ['1', '2', '3', '4', '5', '11']
+        assert w_arr4._live_keys() == ['1', '2', '3', '4', '5', '11']
         assert w_arr4.arraylen() == len(w_arr4.dct_w)
 
         w_arr5 = space.setitem(w_arr4, space.wrap(0), space.wrap(15))
-        assert w_arr5._getkeylist() == ['1', '2', '3', '4', '5', '11', '0']
+        assert w_arr5._live_keys() == ['1', '2', '3', '4', '5', '11', '0']
         assert w_arr5.arraylen() == len(w_arr5.dct_w)
 
         w_arr6 = space.setitem(w_arr5, space.wrap(11), space.wrap(15))
-        assert w_arr6._getkeylist() == ['1', '2', '3', '4', '5', '11', '0']
+        assert w_arr6._live_keys() == ['1', '2', '3', '4', '5', '11', '0']
         assert w_arr6.arraylen() == len(w_arr2.dct_w)
 
         w_arr7 = space.setitem(w_arr6, space.newstr('11'), space.wrap(15))
-        assert w_arr7._getkeylist() == ['1', '2', '3', '4', '5', '11', '0']
+        assert w_arr7._live_keys() == ['1', '2', '3', '4', '5', '11', '0']
         assert w_arr7.arraylen() == len(w_arr2.dct_w)
 
     def test_array_intersect_key(self):
@@ -2149,6 +2472,16 @@ class TestArray(BaseTestInterpreter):
         assert [self.space.int_w(i) for i in output] == [
             4, 0, 66, 1, 22, 3, 44]
 
+    def test_array_unique_first_wins(self):
+        output = self.run('''
+        $a = array("b" => "1", "a" => 1, 2, 1.0, "2", "x" => "1.0");
+        foreach(array_unique($a) as $k=>$v) {
+            echo $k, $v;
+        }
+        ''')
+        assert [self.space.str_w(i) for i in output] == [
+            "b", "1", "0", "2", "x", "1.0"]
+
     def test_array_splice_1(self):
         output = self.run('''
         function test($a, $offset) {
@@ -2456,6 +2789,72 @@ class TestArray(BaseTestInterpreter):
         assert [self.space.str_w(s) for s in output] == [
             'A01', 'a01', 'a1', 'b01', 'b10']
 
+    def test_sort_flags(self):
+        output = self.run('''
+        $a = array("10", 9, "1e1", 2.5);
+        sort($a, SORT_NUMERIC);
+        echo implode(",", $a);
+        rsort($a, SORT_NUMERIC);
+        echo implode(",", $a);
+        $a = array('img12', 'IMG10', 'img2', 'Img1');
+        sort($a, SORT_NATURAL | SORT_FLAG_CASE);
+        echo implode(",", $a);
+        $a = array("x" => "b", "y" => array(1), "z" => "Array2");
+        asort($a, SORT_STRING);
+        foreach($a as $k => $v) {
+            echo $k;
+        }
+        ''', ["Notice: Array to string conversion"])
+        assert [self.space.str_w(s) for s in output] == [
+            '2.5,9,10,1e1', '10,1e1,9,2.5', 'Img1,img2,IMG10,img12',
+            'y', 'z', 'x']
+
+    def test_sort_homogeneous(self):
+        output = self.run('''
+        $a = array();
+        for ($i = 0; $i < 3000; $i++) {
+            $a[] = ($i * 7919) % 2000 - 1000;
+        }
+        $a[] = PHP_INT_MAX;
+        $a[] = -PHP_INT_MAX;
+        $b = $a;
+        sort($a);
+        rsort($b);
+        $ok = true;
+        for ($i = 1; $i < count($a); $i++) {
+            $ok = $ok && $a[$i - 1] <= $a[$i] && $b[$i - 1] >= $b[$i];
+        }
+        echo $ok, $a[0], $a[3001], $b[0];
+        $c = array("x" => 3, "y" => 1, "z" => 3, "w" => 2);
+        asort($c);
+        echo implode(",", array_keys($c));
+        arsort($c);
+        echo implode(",", array_keys($c));
+        $d = array("b", "B", "10", "a");
+        sort($d);
+        echo implode(",", $d);
+        $d = array("b", "10", "9");
+        sort($d);
+        echo implode(",", $d);
+        $e = array("p" => 1.5, "q" => 0.5, "r" => 1.5, "s" => 2.5);
+        arsort($e);
+        echo implode(",", array_keys($e));
+        $e = array("p" => "b", "q" => "a", "r" => "b", "s" => "c");
+        arsort($e);
+        echo implode(",", array_keys($e));
+        $f = array();
+        for ($i = 0; $i < 1200; $i++) {
+            $f["k$i"] = $i % 3;
+        }
+        arsort($f);
+        $keys = array_keys($f);
+        echo implode(",", array_slice($keys, 0, 3)), $keys[400], $keys[1199];
+        ''')
+        assert [self.space.str_w(s) for s in output] == [
+            '1', str(-sys.maxint), str(sys.maxint), str(sys.maxint),
+            'y,w,x,z', 'x,z,w,y', '10,B,a,b', '9,10,b',
+            's,p,r,q', 's,p,r,q', 'k2,k5,k8', 'k1', 'k1197']
+
     def test_array_plus(self):
         output = self.run('''
         echo array(1, 2) + array(3, 4);
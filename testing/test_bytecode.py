@@ -2,8 +2,11 @@
 import py, tempfile
 from hippy.objspace import getspace
 from hippy.phpcompiler import compile_php
-from hippy.bytecode import unserialize
-from hippy.bytecode_cache import BytecodeCache
+from hippy.bytecode import unserialize, Serializer
+from hippy.error import NotSerializable
+from hippy.objects.base import W_Root
+from hippy.bytecode_cache import (BytecodeCache, build_precompiled_code,
+                                  load_precompiled_code)
 from hippy.interpreter import get_printable_location
 from testing.test_interpreter import MockInterpreter, BaseTestInterpreter
 
@@ -76,6 +79,11 @@ class TestBytecode(object):
         assert space.str_w(interp.output[0]) == "b"
         assert space.str_w(interp.output[1]) == "b"
 
+    def test_not_serializable(self):
+        space = getspace()
+        s = Serializer(space)
+        py.test.raises(NotSerializable, s.write_wrapped_item, W_Root())
+
 class TestBytecodeCache(BaseTestInterpreter):
     def test_caching_works(self):
         tmpdir = py.path.local(tempfile.mkdtemp())
@@ -121,3 +129,175 @@ class TestBytecodeCache(BaseTestInterpreter):
         assert get_printable_location(0, bc) == "<main> 1 VAR_PTR"
         # it may be called with pc = len(bc.code) during jitting
         assert get_printable_location(len(bc.code), bc) == "<main> END ?"
+
+    def test_serialize_defaults_and_typehints(self):
+        source = """<?
+        function f(array $a=NULL, $b=1.5, &$c=true, $d=FOO) {
+            return $b;
+        }
+        echo f();
+        ?>"""
+        space = getspace()
+        bc = compile_php('<input>', source, space)
+        dump = bc.serialize(space)
+        bc2 = unserialize(dump, space)
+        func = bc2.functions[0]
+        assert func.names == ['a', 'b', 'c', 'd']
+        assert func.typehints == [(0, 'array', True)]
+        assert func.needs_ref(2)
+        assert func.get_signature().str() == bc.functions[0].get_signature().str()
+        interp = MockInterpreter(space)
+        interp.run_main(space, bc2)
+        assert space.float_w(interp.output[0]) == 1.5
+
+    def test_serialize_closures_and_statics(self):
+        source = """<?
+        function counter() {
+            static $n = 10;
+            $n++;
+            return $n;
+        }
+        $x = 5;
+        $f = function($y) use ($x) { return $x + $y; };
+        echo $f(counter());
+        echo counter();
+        ?>"""
+        space = getspace()
+        bc = compile_php('<input>', source, space)
+        dump = bc.serialize(space)
+        bc2 = unserialize(dump, space)
+        interp = MockInterpreter(space)
+        interp.run_main(space, bc2)
+        assert space.int_w(interp.output[0]) == 16
+        assert space.int_w(interp.output[1]) == 12
+
+    def test_serialize_full_classes(self):
+        source = """<?
+        interface I { const C = 'c'; }
+        class A implements I {
+            const D = 4.5;
+            const E = self::F;
+            const F = 7;
+            public $p = array(1, 'x' => null);
+            protected static $s = self::D;
+            function get() { return self::$s; }
+            function __construct($z=false) {
+                $f = function() { return $this->p; };
+                $this->q = $f();
+            }
+        }
+        class B extends A {}
+        $b = new B();
+        echo $b->get();
+        echo B::C;
+        echo $b->q['x'] === null;
+        echo B::E;
+        ?>"""
+        space = getspace()
+        bc = compile_php('<input>', source, space)
+        dump = bc.serialize(space)
+        bc2 = unserialize(dump, space)
+        assert bc2.serialize(space) == dump
+        interp = MockInterpreter(space)
+        interp.run_main(space, bc2)
+        assert space.float_w(interp.output[0]) == 4.5
+        assert space.str_w(interp.output[1]) == 'c'
+        assert space.is_true(interp.output[2])
+        assert space.int_w(interp.output[3]) == 7
+
+class TestPersistentBytecodeCache(BaseTestInterpreter):
+    def test_cache_dir(self, monkeypatch):
+        import hippy.bytecode_cache
+        tmpdir = py.path.local(tempfile.mkdtemp())
+        f = tmpdir.join('x.php')
+        f.write("""<? function g($a=2) { return $a * 3; } ?>""")
+        cachedir = tmpdir.mkdir('cache')
+        cache = BytecodeCache(cache_dir=str(cachedir))
+        bc1 = cache.compile_file(str(f), self.space)
+        assert len(cachedir.listdir()) == 1
+        # a fresh cache (i.e. a fresh process) must not recompile
+        monkeypatch.setattr(hippy.bytecode_cache, 'compile_php', None)
+        self.space.bytecode_cache = BytecodeCache(cache_dir=str(cachedir))
+        output = self.run("""
+        include "%s";
+        echo g();
+        """ % f)
+        assert self.space.int_w(output[0]) == 6
+        bc2 = self.interp.cached_files[str(f)]
+        assert bc2 is not bc1
+        assert bc2.dump() == bc1.dump()
+
+    def test_cache_dir_invalidation(self):
+        tmpdir = py.path.local(tempfile.mkdtemp())
+        f = tmpdir.join('x.php')
+        f.write("""<? $a = 3; ?>""")
+        cachedir = tmpdir.mkdir('cache')
+        BytecodeCache(cache_dir=str(cachedir)).compile_file(str(f),
+                                                            self.space)
+        f.write("""<? $a = 42; ?>""")
+        self.space.bytecode_cache = BytecodeCache(cache_dir=str(cachedir))
+        output = self.run("""
+        include "%s";
+        echo $a;
+        """ % f)
+        assert self.space.int_w(output[0]) == 42
+
+
+class TestPrecompiledCode(BaseTestInterpreter):
+    def make_tree(self):
+        tmpdir = py.path.local(tempfile.mkdtemp())
+        tmpdir.join('x.php').write("""<?
+        include __DIR__ . "/lib/y.php";
+        echo g();
+        ?>""")
+        tmpdir.mkdir('lib').join('y.php').write(
+            """<? function g($a=2) { return $a * 3; } ?>""")
+        tmpdir.join('lib', 'broken.php').write("""<? function ( ?>""")
+        return tmpdir
+
+    def test_build_and_use(self, monkeypatch):
+        import hippy.bytecode_cache
+        tmpdir = self.make_tree()
+        store_fname = str(tmpdir.join('store'))
+        count = build_precompiled_code(self.space, str(tmpdir), store_fname)
+        assert count == 2     # 'broken.php' is left out
+        store = load_precompiled_code(self.space, store_fname)
+        y_fname = str(tmpdir.join('lib', 'y.php'))
+        assert sorted(store.entries.keys()) == [
+            y_fname, str(tmpdir.join('x.php'))]
+        # everything was unserialized when the code was loaded
+        monkeypatch.setattr(hippy.bytecode_cache, 'compile_php', None)
+        monkeypatch.setattr(hippy.bytecode_cache, 'Unserializer', None)
+        entry = store.entries[y_fname]
+        bc = store.lookup(y_fname, entry.mtime, entry.size)
+        assert bc is entry.bytecode
+        assert store.lookup(y_fname, entry.mtime + 1, entry.size) is None
+        self.space.bytecode_cache = BytecodeCache()
+        self.space.bytecode_cache.set_precompiled(store)
+        output = self.run("""
+        include "%s";
+        """ % tmpdir.join('x.php'))
+        assert self.space.int_w(output[0]) == 6
+        assert self.interp.cached_files[y_fname] is bc
+
+    def test_changed_file(self):
+        tmpdir = self.make_tree()
+        store_fname = str(tmpdir.join('store'))
+        build_precompiled_code(self.space, str(tmpdir), store_fname)
+        tmpdir.join('lib', 'y.php').write(
+            """<? function g($a=2) { return $a * 50; } ?>""")
+        store = load_precompiled_code(self.space, store_fname)
+        self.space.bytecode_cache = BytecodeCache()
+        self.space.bytecode_cache.set_precompiled(store)
+        output = self.run("""
+        include "%s";
+        """ % tmpdir.join('x.php'))
+        assert self.space.int_w(output[0]) == 100
+
+    def test_bad_store(self):
+        tmpdir = py.path.local(tempfile.mkdtemp())
+        tmpdir.join('store').write("garbage")
+        assert load_precompiled_code(self.space,
+                                     str(tmpdir.join('store'))) is None
+        assert load_precompiled_code(self.space,
+                                     str(tmpdir.join('missing'))) is None
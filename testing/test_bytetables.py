@@ -0,0 +1,46 @@
+import base64
+import random
+import urllib
+import zlib
+
+from hippy.module.base64 import b64_decode, b64_encode
+from hippy.module.url import (_rawurlencode, _urlencode, _rawurldecode,
+                              _urldecode)
+from hippy.module.standard.strings.funcs import _crc32
+
+
+def random_strings(seed, count=500):
+    rnd = random.Random(seed)
+    for _ in range(count):
+        yield ''.join([chr(rnd.randrange(256))
+                       for _ in range(rnd.randint(0, 40))])
+
+
+def test_base64():
+    for s in random_strings(1):
+        encoded = b64_encode(s)
+        assert encoded == base64.b64encode(s) + '\n'
+        assert b64_decode(encoded[:-1]) == s
+        assert b64_decode(encoded[:-1], strict=True) == s
+
+
+def test_base64_decode_lenient():
+    assert b64_decode('YW Jj\nZA==') == 'abcd'
+    assert b64_decode('YW*JjZA') == 'abcd'
+    assert b64_decode('YW*JjZA', strict=True) is None
+    assert b64_decode('YQ==YQ==', strict=True) is None
+
+
+def test_url():
+    for s in random_strings(2):
+        assert _rawurlencode(s) == urllib.quote(s, safe='~')
+        assert _urlencode(s) == urllib.quote_plus(s).replace('~', '%7E')
+        assert _rawurldecode(_rawurlencode(s)) == s
+        assert _urldecode(_urlencode(s)) == s
+    assert _urldecode('a+b%2Bc%zz%4') == 'a b+c%zz%4'
+    assert _rawurldecode('a+b%2bc%') == 'a+b+c%'
+
+
+def test_crc32():
+    for s in random_strings(3):
+        assert _crc32(s) == zlib.crc32(s) & 0xffffffff
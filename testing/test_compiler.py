@@ -124,9 +124,8 @@ class TestCompiler(object):
     def test_mul(self):
         self.check_compile("3 - $x * 3;", """
         LOAD_CONST 0
-        LOAD_CONST 0
-        LOAD_VAR_SWAP 0
-        BINARY_MUL
+        LOAD_VAR 0
+        BINARY_MUL_CONST 0
         BINARY_SUB
         DISCARD_TOP
         """)
@@ -181,8 +180,7 @@ class TestCompiler(object):
     def test_float_const_cache(self):
         bc = self.check_compile("echo 3.5 + 3.5;", """
         LOAD_CONST 0
-        LOAD_CONST 0
-        BINARY_ADD
+        BINARY_ADD_CONST 0
         ECHO
         """)
         assert bc.consts[0].floatval == 3.5
@@ -220,17 +218,16 @@ class TestCompiler(object):
         LOAD_CONST 0
         STORE
         DISCARD_TOP
-        JUMP_FORWARD 25
+        JUMP_FORWARD 24
      16 VAR_PTR 0
         LOAD_CONST 0
-        LOAD_CONST 1
-        BINARY_ADD
+        BINARY_ADD_CONST 1
         STORE
         DISCARD_TOP
-     25 LOAD_VAR 0
+     24 LOAD_VAR 0
         ECHO
         """)
-        assert bc.stackdepth == 2
+        assert bc.stackdepth == 1
 
     def test_ifelseif(self):
         self.check_compile("""
@@ -304,13 +301,12 @@ class TestCompiler(object):
       6 _CHECKSTACK 0
         LOAD_CONST 1
         LOAD_VAR_SWAP 0
-        BINARY_LT
-        JUMP_IF_FALSE 23
+        JUMP_IF_NOT_LT 22
         VAR_PTR 0
         SUFFIX_PLUSPLUS
         DISCARD_TOP
         JUMP_BACKWARD 6
-     23 _CHECKSTACK 0
+     22 _CHECKSTACK 0
         """)
 
     def test_function_call(self):
@@ -336,9 +332,8 @@ class TestCompiler(object):
         """, """
         LOAD_NAME 0
         GETFUNC
-        LOAD_CONST 0
-        LOAD_VAR_SWAP 0
-        BINARY_ADD
+        LOAD_VAR 0
+        BINARY_ADD_CONST 0
         ARG_BY_VALUE 0
         VAR_PTR 1
         ARG_BY_PTR 1
@@ -371,8 +366,7 @@ class TestCompiler(object):
         DISCARD_TOP
       6 LOAD_CONST 1
         LOAD_VAR_SWAP 0
-        BINARY_LT
-        JUMP_IF_FALSE 27
+        JUMP_IF_NOT_LT 26
         VAR_PTR 1
         SUFFIX_PLUSPLUS
         DISCARD_TOP
@@ -381,7 +375,7 @@ class TestCompiler(object):
         SUFFIX_PLUSPLUS
         DISCARD_TOP
         JUMP_BACKWARD 6
-     27 _CHECKSTACK 0
+     26 _CHECKSTACK 0
         """)
 
     def test_long_for(self):
@@ -437,13 +431,11 @@ class TestCompiler(object):
 
     def test_getitem_2(self):
         self.check_compile("$x[$y-1][$z+5];", """
-        LOAD_CONST 0
-        LOAD_VAR_SWAP 0
-        BINARY_SUB     # $y-1
+        LOAD_VAR 0
+        BINARY_SUB_CONST 0     # $y-1
         GETITEM_VAR 1
-        LOAD_CONST 1
-        LOAD_VAR_SWAP 2
-        BINARY_ADD     # $z+5
+        LOAD_VAR 2
+        BINARY_ADD_CONST 1     # $z+5
         GETITEM
         DISCARD_TOP
         """)
@@ -451,13 +443,11 @@ class TestCompiler(object):
     def test_setitem_2(self):
         self.check_compile("$x[$y-1][$z+5] = 1;", """
         VAR_PTR 0
-        LOAD_CONST 0
-        LOAD_VAR_SWAP 1
-        BINARY_SUB     # $y-1
+        LOAD_VAR 1
+        BINARY_SUB_CONST 0     # $y-1
         ITEM_PTR
-        LOAD_CONST 1
-        LOAD_VAR_SWAP 2
-        BINARY_ADD     # $z+5
+        LOAD_VAR 2
+        BINARY_ADD_CONST 1     # $z+5
         ITEM_PTR
         LOAD_CONST 0
         STORE
@@ -466,13 +456,68 @@ class TestCompiler(object):
 
     def test_setitem_3(self):
         self.check_compile("$x[$i] = 1;", """
+        LOAD_CONST 0
+        VAR_PTR 0
+        STORE_VAR_ITEM 1
+        DISCARD_TOP
+        """)
+
+    def test_setitem_3_unique(self):
+        self.check_compile("$x[$i] = array(1, $y);", """
         VAR_PTR 0
         LOAD_VAR_ITEM_PTR 1
         LOAD_CONST 0
-        STORE
+        DEREF
+        LOAD_VAR 2
+        DEREF
+        MAKE_ARRAY 2
+        STORE_UNIQUE
         DISCARD_TOP
         """)
 
+    def test_compare_and_jump(self):
+        self.check_compile("""
+        if ($x == 1) { echo 2; } elseif ($x !== 3) { echo 4; }
+        """, """
+        LOAD_CONST 0
+        LOAD_VAR_SWAP 0
+        JUMP_IF_NOT_EQ 15
+        LOAD_CONST 1
+        ECHO
+        JUMP_FORWARD 27
+     15 LOAD_CONST 2
+        LOAD_VAR_SWAP 0
+        BINARY_ISNOT       # not fused
+        JUMP_IF_FALSE 27
+        LOAD_CONST 3
+        ECHO
+        """)
+
+    def test_no_superinstructions(self):
+        from hippy.astcompiler import compiler_options
+        compiler_options.superinstructions = False
+        try:
+            self.check_compile("""
+            while ($i <= $n) $x[$i] = $i * 2;
+            """, """
+          0 _CHECKSTACK 0
+            LOAD_VAR 0
+            LOAD_VAR_SWAP 1
+            BINARY_LE
+            JUMP_IF_FALSE 24
+            VAR_PTR 2
+            LOAD_VAR_ITEM_PTR 1
+            LOAD_CONST 0
+            LOAD_VAR_SWAP 1
+            BINARY_MUL
+            STORE
+            DISCARD_TOP
+            JUMP_BACKWARD 0
+         24 _CHECKSTACK 0
+            """)
+        finally:
+            compiler_options.superinstructions = True
+
     def test_array_constructor(self):
         self.check_compile("$x = array(1, 2, $y);", """
         VAR_PTR 0
@@ -740,9 +785,8 @@ class TestCompiler(object):
         self.check_compile("""
         $b+0; $a[0] =& $b[1];
         """, """
-        LOAD_CONST 0
-        LOAD_VAR_SWAP 0
-        BINARY_ADD
+        LOAD_VAR 0
+        BINARY_ADD_CONST 0
         DISCARD_TOP
         VAR_PTR 0
         LOAD_CONST 1
@@ -805,15 +849,14 @@ class TestCompiler(object):
         DISCARD_TOP
       6 LOAD_CONST 1
         LOAD_VAR_SWAP 0
-        BINARY_LT
-        JUMP_IF_FALSE 27
-        JUMP_FORWARD 19
-     19 _CHECKSTACK 0
+        JUMP_IF_NOT_LT 26
+        JUMP_FORWARD 18
+     18 _CHECKSTACK 0
         VAR_PTR 0
         SUFFIX_PLUSPLUS
         DISCARD_TOP
         JUMP_BACKWARD 6
-     27 _CHECKSTACK 0
+     26 _CHECKSTACK 0
         """)
 
     def test_break_for(self):
@@ -882,19 +925,18 @@ class TestCompiler(object):
         LOAD_VAR 0
         CREATE_ITER
       3 _CHECKSTACK 1
-        NEXT_VALUE_ITER 21
+        NEXT_VALUE_ITER 20
         VAR_PTR 1
         STORE
         DISCARD_TOP
-        LOAD_CONST 0       # start of the code within the { }
-        LOAD_VAR_SWAP 1
-        BINARY_ADD
+        LOAD_VAR 1         # start of the code within the { }
+        BINARY_ADD_CONST 0
         DISCARD_TOP
         JUMP_BACKWARD 3
-     21 _CHECKSTACK 1
+     20 _CHECKSTACK 1
         DISCARD_TOP
         """)
-        assert bc.stackdepth == 3
+        assert bc.stackdepth == 2
 
     def test_iterator_2(self):
         bc = self.check_compile("""
@@ -925,7 +967,7 @@ class TestCompiler(object):
         LOAD_VAR 0
         CREATE_ITER
       3 _CHECKSTACK 1
-        NEXT_VALUE_ITER 27
+        NEXT_VALUE_ITER 26
         VAR_PTR 1
         LOAD_CONST 0
         ITEM_PTR
@@ -933,12 +975,11 @@ class TestCompiler(object):
         ITEM_PTR
         STORE
         DISCARD_TOP
-        LOAD_CONST 1       # start of the code within the { }
-        LOAD_VAR_SWAP 1
-        BINARY_ADD
+        LOAD_VAR 1         # start of the code within the { }
+        BINARY_ADD_CONST 1
         DISCARD_TOP
         JUMP_BACKWARD 3
-     27 _CHECKSTACK 1
+     26 _CHECKSTACK 1
         DISCARD_TOP
         """)
         assert bc.stackdepth == 3
@@ -1633,8 +1674,7 @@ class TestCompiler(object):
         SILENCE
         LOAD_VAR 0
         UNSILENCE
-        LOAD_CONST 0
-        BINARY_ADD
+        BINARY_ADD_CONST 0
         ARG_BY_VALUE 0
         CALL 1
         DISCARD_TOP
@@ -1798,19 +1838,18 @@ class TestCompiler(object):
         LOAD_VAR 1
         CASE_IF_EQ 13
         DISCARD_TOP
-        JUMP_FORWARD 27
+        JUMP_FORWARD 26
      13 LOAD_CONST 0
         LOAD_CONST 1
-        LOAD_CONST 2
         LOAD_CONST 3
-        BINARY_SUB
+        BINARY_SUB_CONST 2
         BINARY_MUL
         BINARY_ADD
         ECHO
         _CHECKSTACK 0
-     27 _CHECKSTACK 0
+     26 _CHECKSTACK 0
         """)
-        assert bc.stackdepth == 4
+        assert bc.stackdepth == 3
 
     def test_break_continue_pop(self):
         bc = self.check_compile("""
@@ -0,0 +1,143 @@
+from hippy.fastcgi import (
+    Connection, ProtocolError, encode_params, decode_params, encode_record,
+    FCGI_BEGIN_REQUEST, FCGI_END_REQUEST, FCGI_PARAMS, FCGI_STDIN,
+    FCGI_STDOUT, FCGI_GET_VALUES, FCGI_GET_VALUES_RESULT,
+    FCGI_UNKNOWN_TYPE, FCGI_MAX_CONTENT_LEN, FCGI_RESPONDER,
+    FCGI_KEEP_CONN, FCGI_CANT_MPX_CONN, FCGI_UNKNOWN_ROLE)
+
+
+class FakeSocket(object):
+    """Returns 'data' a few bytes at a time and records what is sent"""
+    def __init__(self, data, step=5):
+        self.data = data
+        self.step = step
+        self.sent = []
+
+    def recv(self, size):
+        size = min(size, self.step)
+        result = self.data[:size]
+        self.data = self.data[size:]
+        return result
+
+    def sendall(self, data):
+        self.sent.append(data)
+
+
+class FakeServer(object):
+    def stop_waiting(self):
+        return False
+
+
+def begin_request(request_id, role=FCGI_RESPONDER, flags=0):
+    body = chr(role >> 8) + chr(role & 0xff) + chr(flags) + '\x00' * 5
+    return encode_record(FCGI_BEGIN_REQUEST, request_id, body)
+
+
+def request_records(request_id, params, stdin='', flags=0):
+    records = [begin_request(request_id, flags=flags),
+               encode_record(FCGI_PARAMS, request_id, encode_params(params)),
+               encode_record(FCGI_PARAMS, request_id, '')]
+    if stdin:
+        records.append(encode_record(FCGI_STDIN, request_id, stdin))
+    records.append(encode_record(FCGI_STDIN, request_id, ''))
+    return ''.join(records)
+
+
+def sent_records(sock):
+    conn = Connection(FakeSocket(''.join(sock.sent)), FakeServer())
+    records = []
+    while True:
+        record = conn.read_record()
+        if record is None:
+            return records
+        conn.idle = True
+        records.append((record.type, record.request_id, record.content))
+
+
+def test_params():
+    params = {'SCRIPT_FILENAME': '/var/www/index.php',
+              'X' * 200: 'y' * 300, 'EMPTY': ''}
+    data = encode_params(params)
+    decoded = {}
+    decode_params(data, decoded)
+    assert decoded == params
+    try:
+        decode_params(data[:-1], {})
+    except ProtocolError:
+        pass
+    else:
+        assert False, "no ProtocolError"
+
+
+def test_read_request():
+    data = request_records(1, {'QUERY_STRING': 'a=1'}, 'x=2',
+                           flags=FCGI_KEEP_CONN)
+    data += request_records(2, {'QUERY_STRING': 'b=3'})
+    conn = Connection(FakeSocket(data), FakeServer())
+    request = conn.read_request()
+    assert request.request_id == 1
+    assert request.keep_conn
+    assert request.params == {'QUERY_STRING': 'a=1'}
+    assert request.stdin == ['x=2']
+    request = conn.read_request()
+    assert request.request_id == 2
+    assert not request.keep_conn
+    assert request.stdin == []
+    assert conn.read_request() is None
+
+
+def test_closed_inside_a_request():
+    data = request_records(1, {'A': 'b'})
+    conn = Connection(FakeSocket(data[:20]), FakeServer())
+    try:
+        conn.read_request()
+    except ProtocolError:
+        pass
+    else:
+        assert False, "no ProtocolError"
+
+
+def test_management_records():
+    data = encode_record(FCGI_GET_VALUES, 0,
+                         encode_params({'FCGI_MPXS_CONNS': '',
+                                        'UNKNOWN': ''}))
+    data += encode_record(42, 0, '')
+    data += request_records(1, {})
+    sock = FakeSocket(data)
+    conn = Connection(sock, FakeServer())
+    assert conn.read_request().request_id == 1
+    records = sent_records(sock)
+    assert records[0][:2] == (FCGI_GET_VALUES_RESULT, 0)
+    values = {}
+    decode_params(records[0][2], values)
+    assert values == {'FCGI_MPXS_CONNS': '0'}
+    assert records[1] == (FCGI_UNKNOWN_TYPE, 0, chr(42) + '\x00' * 7)
+
+
+def test_refused_requests():
+    data = begin_request(1, role=2)         # the authorizer role
+    data += begin_request(2)
+    data += begin_request(3)                # while 2 is not over
+    data += request_records(2, {})[len(begin_request(2)):]
+    sock = FakeSocket(data)
+    conn = Connection(sock, FakeServer())
+    assert conn.read_request().request_id == 2
+    records = sent_records(sock)
+    assert [(type, request_id, ord(content[4]))
+            for type, request_id, content in records] == [
+        (FCGI_END_REQUEST, 1, FCGI_UNKNOWN_ROLE),
+        (FCGI_END_REQUEST, 3, FCGI_CANT_MPX_CONN)]
+
+
+def test_write_stream():
+    sock = FakeSocket('')
+    conn = Connection(sock, FakeServer())
+    chunks = ['Content-Type: text/plain\r\n\r\n', 'x' * FCGI_MAX_CONTENT_LEN]
+    conn.write_stream(FCGI_STDOUT, 7, chunks)
+    conn.end_request(7, 3, 0)
+    records = sent_records(sock)
+    assert [len(content) for _, _, content in records] == [
+        FCGI_MAX_CONTENT_LEN, len(chunks[0]), 0, 8]
+    assert ''.join([content for _, _, content in records[:3]]) == \
+        ''.join(chunks)
+    assert records[3] == (FCGI_END_REQUEST, 7, '\x00\x00\x00\x03' + '\x00' * 4)
@@ -0,0 +1,67 @@
+import py
+
+from hippy.objspace import getspace
+from hippy.fcgiserver import FastCGIInterpreter, FastCGIWorker
+from hippy.fastcgi import FCGI_STDOUT, FCGI_END_REQUEST, FCGI_KEEP_CONN
+from testing.test_fastcgi import FakeSocket, request_records, sent_records
+
+
+class TestFastCGIWorker(object):
+    def setup_method(self, meth):
+        self.tmpdir = py.path.local.make_numbered_dir('hippy')
+        self.interp = FastCGIInterpreter(getspace())
+        self.interp.take_startup_snapshot()
+
+    def serve(self, data, max_requests=0):
+        worker = FastCGIWorker(self.interp, None, max_requests)
+        sock = FakeSocket(data)
+        worker.serve_connection(sock)
+        return worker, sent_records(sock)
+
+    def test_requests(self):
+        script = self.tmpdir.join('index.php')
+        script.write('''<?php
+        define('X', $_GET['x']);
+        echo X + $_POST['y'];
+        ?>''')
+        params = {'SCRIPT_FILENAME': str(script),
+                  'CONTENT_TYPE': 'application/x-www-form-urlencoded',
+                  'CONTENT_LENGTH': '3'}
+        data = ''
+        for i in range(3):
+            params['QUERY_STRING'] = 'x=%d' % i
+            data += request_records(i + 1, params, 'y=5',
+                                    flags=FCGI_KEEP_CONN)
+        worker, records = self.serve(data)
+        assert worker.served == 3
+        for i in range(3):
+            stdout = [content for type, request_id, content in records
+                      if type == FCGI_STDOUT and request_id == i + 1]
+            assert ''.join(stdout) == ('Content-Type: text/html\r\n\r\n%d'
+                                       % (i + 5))
+            assert stdout[-1] == ''
+        assert [request_id for type, request_id, _ in records
+                if type == FCGI_END_REQUEST] == [1, 2, 3]
+
+    def test_max_requests(self):
+        script = self.tmpdir.join('exit.php')
+        script.write('<?php echo "a"; exit(3); ?>')
+        data = ''
+        for i in range(3):
+            data += request_records(i + 1, {'SCRIPT_FILENAME': str(script)},
+                                    flags=FCGI_KEEP_CONN)
+        worker, records = self.serve(data, max_requests=2)
+        assert worker.served == 2
+        assert worker.done()
+        end_requests = [content for type, _, content in records
+                        if type == FCGI_END_REQUEST]
+        assert len(end_requests) == 2
+        assert end_requests[0][:4] == '\x00\x00\x00\x03'
+
+    def test_not_found(self):
+        missing = str(self.tmpdir.join('missing.php'))
+        worker, records = self.serve(
+            request_records(1, {'SCRIPT_FILENAME': missing}))
+        stdout = ''.join([content for type, _, content in records
+                          if type == FCGI_STDOUT])
+        assert stdout.startswith('Status: 404 Not Found\r\n')
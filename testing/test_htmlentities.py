@@ -0,0 +1,28 @@
+from hippy.module.standard.strings.htmlentities import (
+    specialchars_table, utf8_entities)
+
+
+def test_specialchars():
+    table = specialchars_table(2, True)
+    assert table.escape('<a href="x">&</a>') == (
+        '&lt;a href=&quot;x&quot;&gt;&amp;&lt;/a&gt;')
+    assert table.escape("it's") == "it's"
+    assert specialchars_table(3, True).escape("it's") == "it&#039;s"
+    assert specialchars_table(0, True).escape('"') == '"'
+    assert specialchars_table(2, False).escape('3&<') == '3&&lt;'
+
+
+def test_specialchars_unchanged():
+    s = 'nothing to escape here' * 10
+    assert specialchars_table(2, True).escape(s) is s
+    assert specialchars_table(2, True).escape('') == ''
+
+
+def test_entities():
+    assert utf8_entities('<caf\xc3\xa9 & "bar">') == (
+        '&lt;caf&eacute; &amp; &quot;bar&quot;&gt;')
+    s = 'plain ascii'
+    assert utf8_entities(s) is s
+    # no entity: the character is kept, invalid bytes are dropped
+    assert utf8_entities('\xe4\xb8\xad<\xff!') == '\xe4\xb8\xad&lt;!'
+    assert utf8_entities('\xc2\xa0x\xc2\xa9') == '&nbsp;x&copy;'
@@ -0,0 +1,24 @@
+from hippy.interning import InternTable, MAX_KEY_LENGTH
+
+
+class TestInternTable(object):
+    def test_intern(self):
+        table = InternTable()
+        s = table.intern(''.join(['i', 'd']))
+        assert s == 'id'
+        assert table.intern(''.join(['i', 'd'])) is s
+        assert table.is_interned(s)
+        assert not table.is_interned(''.join(['i', 'd']))
+
+    def test_intern_key(self):
+        table = InternTable(max_input_strings=2)
+        name = table.intern('name')
+        assert table.intern_key(''.join(['na', 'me'])) is name
+        s = table.intern_key(''.join(['a', 'b']))
+        assert table.intern_key(''.join(['a', 'b'])) is s
+        long_key = 'x' * (MAX_KEY_LENGTH + 1)
+        assert not table.is_interned(table.intern_key(long_key))
+        assert table.is_interned(table.intern_key('c'))
+        # the table is full for the strings of the input
+        assert not table.is_interned(table.intern_key('d'))
+        assert table.is_interned(table.intern('d'))
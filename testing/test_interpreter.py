@@ -14,6 +14,9 @@ from hippy.objects.floatobject import W_FloatObject
 from hippy.objects.arrayobject import W_ListArrayObject, W_RDictArrayObject
 from hippy.objects.reference import W_Reference
 from hippy.objects.boolobject import W_BoolObject
+from hippy.phpcompiler import compile_php
+from hippy.config import load_ini
+from hippy.interpreter import Interpreter
 from testing.runner import MockEngine, MockInterpreter, preparse
 from testing.directrunner import DirectRunner
 from testing.conftest import option
@@ -71,7 +74,7 @@ class BaseTestInterpreter(object):
         elif isinstance(w_item, W_FloatObject):
             return space.float_w(w_item)
         elif isinstance(w_item, W_ListArrayObject):
-            return [self.unwrap(w_x) for w_x in w_item.lst_w]
+            return [self.unwrap(w_x) for w_x in w_item.as_list_w()]
         elif isinstance(w_item, W_RDictArrayObject):
             o = OrderedDict()
             for key, w_value in w_item.dct_w.iteritems():
@@ -342,6 +345,31 @@ class _TestInterpreter(BaseTestInterpreter):
         """)
         assert self.space.int_w(output[0]) == 10
 
+    def test_superinstructions(self):
+        output = self.run("""
+        $a = array();
+        $b = $a;
+        for ($i = 0; $i < 5; $i++) {
+            $k = "k" . $i;
+            $a[$k] = $i * 2 - 1;
+        }
+        echo $a["k4"], count($b);
+        $r = array();
+        foreach (array(1, 2, 3) as $x) {
+            if ($x <= 1) $r[] = 'le';
+            if ($x >= 3) $r[] = 'ge';
+            if ($x > 2) $r[] = 'gt';
+            if ($x == 2) $r[] = 'eq';
+            if ($x != 2) $r[] = 'ne';
+            $r[] = $x + 0.5;
+        }
+        echo implode(',', $r);
+        """)
+        assert self.space.int_w(output[0]) == 7
+        assert self.space.int_w(output[1]) == 0
+        assert self.space.str_w(output[2]) == (
+            'le,ne,1.5,eq,2.5,ge,gt,ne,3.5')
+
     def test_aliasing(self):
         output = self.run("""
         $x = 3;
@@ -1696,6 +1724,24 @@ class _TestInterpreter(BaseTestInterpreter):
         """)
         assert map(self.space.str_w, output) == ['abc1', 'b', '${xbabc}']
 
+    def test_string_concat_several_buffers(self):
+        output = self.run('''
+        $base = "<ul>";
+        $base .= "\\n";
+        $a = $base;
+        $b = $base;
+        for ($i = 0; $i < 3; $i++) {
+            $a .= "<li>$i</li>";
+            $b = "$b<li>" . ($i * 2) . "</li>";
+        }
+        $a .= "</ul>";
+        echo $a, $b, $base, implode(",", array($a, $b, $base));
+        ''')
+        a = "<ul>\n<li>0</li><li>1</li><li>2</li></ul>"
+        b = "<ul>\n<li>0</li><li>2</li><li>4</li>"
+        assert map(self.space.str_w, output) == [
+            a, b, "<ul>\n", ",".join([a, b, "<ul>\n"])]
+
     @py.test.mark.skipif("config.option.runappdirect")
     def test_string_interpolation_newline_var(self):
         output = self.run('''
@@ -4149,3 +4195,47 @@ class TestLocalInterpreter(LocalRunTestInterpreter, _TestInterpreter):
 
 class TestMultipleInterpreters(TestInterpreter):
     Engine = MockServerEngine
+
+
+class TestRequestReset(object):
+    def test_reset_for_next_request(self):
+        space = getspace()
+        interp = MockInterpreter(space)
+        load_ini(interp, "precision=5\n")
+        interp.take_startup_snapshot()
+        bc = compile_php('<input>', """<?
+        ini_set('precision', 3);
+        define('RESET_X', 1);
+        function reset_f() { return 42; }
+        $a = 1;
+        echo reset_f();
+        ?>""", space)
+        interp.run_main(space, bc)
+        assert space.int_w(interp.output[-1]) == 42
+        assert interp.config.get_precision() == 3
+        cell = space.global_function_cache.get_cell(
+            'reset_f', space.global_function_cache.version)
+        #
+        interp.reset_for_next_request()
+        assert interp.config.get_precision() == 5
+        assert interp.lookup_constant('RESET_X') is None
+        assert interp.lookup_function('reset_f') is None
+        assert not interp.globals.has_var('a')
+        #
+        interp.run_main(space, bc)
+        assert space.int_w(interp.output[-1]) == 42
+        assert cell.constant_value_is_currently_declared
+
+
+class WriteCollectingInterpreter(Interpreter):
+    def _writestr(self, string):
+        self.written.append(string)
+
+
+class TestWriteChunks(object):
+    def test_writechunks_uses_writestr(self):
+        interp = WriteCollectingInterpreter(getspace())
+        interp.written = []
+        chunks = ['a' * 1000, 'b', 'c' * 1000]
+        interp.writechunks(chunks, buffer=False)
+        assert interp.written == chunks
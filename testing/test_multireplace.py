@@ -0,0 +1,109 @@
+import random
+
+from hippy.module.standard.strings.multireplace import (
+    MultiReplacer, ReplacerCache)
+
+
+def strtr_reference(pairs, string):
+    # what strtr() does: the longest key at each position
+    maxlen = max([len(key) for key in pairs])
+    result = []
+    i = 0
+    while i < len(string):
+        for j in range(min(maxlen, len(string) - i), 0, -1):
+            if string[i:i + j] in pairs:
+                result.append(pairs[string[i:i + j]])
+                i += j
+                break
+        else:
+            result.append(string[i])
+            i += 1
+    return ''.join(result)
+
+
+def str_replace_reference(patterns, replacements, string):
+    # what str_replace() does: one pattern after the other
+    count = 0
+    for i in range(len(patterns)):
+        count += string.count(patterns[i])
+        string = string.replace(patterns[i], replacements[i])
+    return string, count
+
+
+class TestMultiReplacer(object):
+    def test_strtr(self):
+        r = MultiReplacer(['a', 'ab', 'abc', 'bcd', 'x'],
+                          ['1', '2', '3', '4', ''])
+        assert r.replace('') == ('', 0)
+        assert r.replace('zzz') == ('zzz', 0)
+        assert r.replace('abcd') == ('3d', 1)
+        assert r.replace('abd') == ('2d', 1)
+        assert r.replace('bcdxa') == ('41', 3)
+        assert r.replace('abab') == ('22', 2)
+
+    def test_earlier_start_wins(self):
+        r = MultiReplacer(['b', 'abc'], ['B', 'X'])
+        assert r.replace('abc') == ('X', 1)
+        assert r.replace('abd') == ('aBd', 1)
+
+    def test_random_strtr(self):
+        rnd = random.Random(42)
+        for _ in range(300):
+            pairs = {}
+            for _ in range(rnd.randint(1, 6)):
+                key = ''.join([rnd.choice('abc')
+                               for _ in range(rnd.randint(1, 4))])
+                pairs[key] = rnd.choice(['', 'X', 'YY', 'abc'])
+            keys = pairs.keys()
+            r = MultiReplacer(keys, [pairs[key] for key in keys])
+            for _ in range(5):
+                string = ''.join([rnd.choice('abcd')
+                                  for _ in range(rnd.randint(0, 20))])
+                assert r.replace(string)[0] == strtr_reference(pairs, string)
+
+    def test_independent(self):
+        assert MultiReplacer(['{a}', '{b}'], ['1', '2']).is_independent()
+        assert MultiReplacer(['&', '<'], ['&amp;', '&lt;']).is_independent()
+        # a pattern inside another one
+        assert not MultiReplacer(['ab', 'b'], ['1', '2']).is_independent()
+        assert not MultiReplacer(['a', 'cac'], ['1', '2']).is_independent()
+        # overlapping patterns
+        assert not MultiReplacer(['ab', 'bc'], ['1', '2']).is_independent()
+        # a replacement creating a later pattern
+        assert not MultiReplacer(['a', 'b'], ['b', 'c']).is_independent()
+        assert not MultiReplacer(['x', 'ab'], ['a', 'y']).is_independent()
+        assert not MultiReplacer(['x', 'ab'], ['b', 'y']).is_independent()
+        assert not MultiReplacer(['b', 'ac'], ['', 'y']).is_independent()
+        # ...but not an earlier one
+        assert MultiReplacer(['b', 'a'], ['c', 'b']).is_independent()
+        assert not MultiReplacer(['a', 'a'], ['1', '2']).is_independent()
+
+    def test_random_str_replace(self):
+        rnd = random.Random(43)
+        checked = 0
+        for _ in range(2000):
+            patterns = []
+            for _ in range(rnd.randint(2, 4)):
+                patterns.append(''.join([rnd.choice('abcd')
+                                         for _ in range(rnd.randint(1, 3))]))
+            replacements = [rnd.choice(['', 'X', 'ab', 'dd', 'c'])
+                            for _ in patterns]
+            r = MultiReplacer(patterns, replacements)
+            if not r.is_independent():
+                continue
+            checked += 1
+            for _ in range(5):
+                string = ''.join([rnd.choice('abcd')
+                                  for _ in range(rnd.randint(0, 20))])
+                assert r.replace(string) == str_replace_reference(
+                    patterns, replacements, string)
+        assert checked > 50
+
+    def test_cache(self):
+        cache = ReplacerCache()
+        r = cache.get(['a', 'b'], ['1', '2'])
+        assert cache.get(['a', 'b'], ['1', '2']) is r
+        assert cache.get(['a', 'b'], ['1', '3']) is not r
+        assert cache.get(['a', 'b'], ['1', '2'], True) is not r
+        assert cache.get(['ab'], ['12']) is not cache.get(['a', 'b'],
+                                                          ['1', '2'])
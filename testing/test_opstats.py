@@ -0,0 +1,55 @@
+from hippy.consts import BYTECODE_NAMES
+from hippy.opstats import OpStats
+from testing.test_interpreter import BaseTestInterpreter
+
+
+class TestOpStats(BaseTestInterpreter):
+    def test_counts(self):
+        opstats = OpStats()
+
+        def set_opstats(interp):
+            interp.opstats = opstats
+        self.run("""
+        function f($x) { return $x; }
+        for ($i = 0; $i < 3; $i++) {
+            echo f($i);
+        }
+        """, extra_func=set_opstats)
+        assert opstats.counts[BYTECODE_NAMES.index('ECHO')] == 3
+        assert opstats.counts[BYTECODE_NAMES.index('CALL')] == 3
+        assert opstats.counts[BYTECODE_NAMES.index('RETURN')] >= 3
+        for opcode in range(len(BYTECODE_NAMES)):
+            assert opstats.ticks[opcode] >= 0
+        assert sorted([bc.name for bc in opstats.codes]) == ['<main>', 'f']
+        report = opstats.report()
+        lines = report.splitlines()
+        assert lines[0].split() == ['opcode', 'count', 'ticks', 'time']
+        echo_line = [line for line in lines
+                     if line.split() and line.split()[0] == 'ECHO'][0]
+        assert echo_line.split()[1] == '3'
+        assert 'hot spots:' in lines
+        assert ' f in <input>:' in report
+
+
+class FakeBytecode(object):
+    code = '\x00\x00'
+
+
+def test_nested_ticks(monkeypatch):
+    from hippy import opstats as opstats_mod
+    now = [0]
+    monkeypatch.setattr(opstats_mod, 'read_timestamp', lambda: now[0])
+    opstats = OpStats()
+    bytecode = FakeBytecode()
+    call = BYTECODE_NAMES.index('CALL')
+    echo = BYTECODE_NAMES.index('ECHO')
+    call_start = opstats.start()
+    now[0] = 10
+    echo_start = opstats.start()
+    now[0] = 40
+    opstats.record(bytecode, 0, echo, echo_start)
+    now[0] = 50
+    opstats.record(bytecode, 1, call, call_start)
+    assert opstats.ticks[echo] == 30
+    assert opstats.ticks[call] == 20
+    assert sum(opstats.ticks) == 50
@@ -0,0 +1,64 @@
+import os, time
+from hippy.prefork import PreforkMaster, get_rss_kb
+
+
+class ExitingMaster(PreforkMaster):
+    def run_worker(self):
+        return 0
+
+
+class SleepingMaster(PreforkMaster):
+    def run_worker(self):
+        time.sleep(30)
+        return 0
+
+
+def wait_for(master, condition, timeout=10.0):
+    end = time.time() + timeout
+    while time.time() < end:
+        master.step()
+        if condition():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+class TestPrefork(object):
+    def test_dead_workers_are_replaced(self):
+        master = ExitingMaster(2)
+        master.running = True
+        try:
+            assert wait_for(master, lambda: master.spawned >= 6)
+        finally:
+            master.running = False
+            master.shutdown()
+        assert not master.workers
+
+    def test_reload_replaces_every_worker(self):
+        master = SleepingMaster(3)
+        master.running = True
+        try:
+            master.step()
+            old_pids = master.workers.keys()
+            assert len(old_pids) == 3
+            master.start_reload()
+            def replaced():
+                pids = master.workers.keys()
+                return (len(pids) == 3 and master.active_workers() == 3 and
+                        not [pid for pid in old_pids if pid in pids])
+            assert wait_for(master, replaced)
+            assert master.spawned == 6
+        finally:
+            master.running = False
+            master.shutdown()
+        assert not master.workers
+
+    def test_memory_limit(self):
+        assert get_rss_kb(os.getpid()) > 0
+        master = SleepingMaster(1, max_rss_kb=1)
+        master.running = True
+        try:
+            assert wait_for(master, lambda: master.spawned >= 3)
+        finally:
+            master.running = False
+            master.shutdown()
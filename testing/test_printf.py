@@ -0,0 +1,52 @@
+from hippy.module.standard.strings.printf import (
+    compile_format, FormatCache, NO_ARGNUM)
+
+
+def test_compile_literals():
+    c = compile_format("abc")
+    assert c.pieces == ["abc"] and c.specs == []
+    c = compile_format("100%% sure%")
+    assert c.pieces == ["100% sure"] and c.specs == []
+
+
+def test_compile_directives():
+    c = compile_format("x=%-08.3f, %2$s!")
+    assert c.pieces == ["x=", ", ", "!"]
+    spec = c.specs[0]
+    assert spec.conversion == 'f'
+    assert spec.argnum == NO_ARGNUM
+    assert spec.to_left and spec.pad_char == '0'
+    assert spec.width == 8
+    assert spec.precision == 3 and spec.prec_adjust
+    spec = c.specs[1]
+    assert spec.conversion == 's'
+    assert spec.argnum == 1
+    assert not spec.prec_adjust
+
+
+def test_compile_odd_directives():
+    spec, = compile_format("%'*10s").specs
+    assert spec.pad_char == '*' and spec.width == 10
+    spec, = compile_format("%ld").specs
+    assert spec.conversion == 'd'
+    spec, = compile_format("%Lq").specs
+    assert spec.emit_char and spec.conversion == 'q'
+    spec, = compile_format("% %").specs
+    assert spec.percent and spec.conversion == '%'
+    spec, = compile_format("%.d").specs
+    assert not spec.prec_adjust
+
+
+def test_cache():
+    cache = FormatCache(capacity=2)
+    c1 = cache.get("%d")
+    assert cache.get("%d") is c1
+    cache.get("%s")
+    cache.get("%d")
+    cache.get("%x")      # evicts "%s", the least recently used
+    assert cache.size() == 2
+    assert cache.get("%d") is c1
+    version = cache.version
+    c2 = cache.get("%s")
+    assert cache.version is not version
+    assert c2.specs[0].conversion == 's'
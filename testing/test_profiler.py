@@ -0,0 +1,93 @@
+import py, tempfile
+
+from hippy.profiler import Profiler, FunctionStats
+from testing.runner import MockInterpreter
+from testing.test_interpreter import BaseTestInterpreter
+
+
+class SamplingInterpreter(MockInterpreter):
+    """Takes a sample at every echo instead of on SIGPROF"""
+    def echo(self, space, w):
+        self.profiler.sample(self)
+        MockInterpreter.echo(self, space, w)
+
+
+class TestProfiler(BaseTestInterpreter):
+    def test_sampling(self):
+        profiler = Profiler(interval=1000)
+
+        def set_profiler(interp):
+            interp.profiler = profiler
+        self.space.ec.init_signals()
+        profiler.start()
+        try:
+            self.run("""
+            function inner($n) {
+                $x = 0;
+                for ($i = 0; $i < $n; $i++) { $x += $i; }
+                return $x;
+            }
+            function outer() {
+                $t = 0;
+                for ($j = 0; $j < 20; $j++) { $t += inner(200); }
+                return $t;
+            }
+            outer();
+            """, extra_func=set_profiler)
+        finally:
+            profiler.stop()
+            self.space.ec.clear_signals()
+        assert profiler.samples > 0
+        for key in profiler.stacks:
+            assert key.startswith('<main> (<input>:')
+        assert [key for key in profiler.stacks if 'inner (<input>' in key]
+        stats = profiler.functions['<main> (<input>)']
+        assert stats.inclusive == profiler.samples
+
+    def test_output(self):
+        profiler = Profiler(interval=2000)
+        profiler.samples = 4
+        profiler.stacks = {'<main> (a.php:3);f (a.php:1)': 3,
+                           '<main> (a.php:4)': 1}
+        for name, inclusive, exclusive in [('<main> (a.php)', 4, 1),
+                                           ('f (a.php)', 3, 3)]:
+            stats = FunctionStats()
+            stats.inclusive = inclusive
+            stats.exclusive = exclusive
+            profiler.functions[name] = stats
+        tmpdir = py.path.local(tempfile.mkdtemp())
+        out = tmpdir.join('out.prof')
+        profiler.write(str(out))
+        assert out.read() == ('<main> (a.php:3);f (a.php:1) 3\n'
+                              '<main> (a.php:4) 1\n')
+        report = tmpdir.join('out.prof.report').read().splitlines()
+        assert report[0] == '4 samples, one every 2000 us'
+        assert report[2].split() == ['8', '100%', '2', '25%',
+                                     '<main>', '(a.php)']
+        assert report[3].split() == ['6', '75%', '6', '75%', 'f', '(a.php)']
+
+
+class TestSample(BaseTestInterpreter):
+    interpreter = SamplingInterpreter
+
+    def test_sample(self):
+        profiler = Profiler(interval=1000)
+
+        def set_profiler(interp):
+            interp.profiler = profiler
+        self.run("""
+        function inner() { echo 1; }
+        function outer() { inner(); inner(); }
+        outer();
+        inner();
+        """, extra_func=set_profiler)
+        assert profiler.samples == 3
+        assert profiler.collapsed_stacks() == (
+            '<main> (<input>:4);outer (<input>:3);inner (<input>:2) 2\n'
+            '<main> (<input>:5);inner (<input>:2) 1\n')
+        report = profiler.report().splitlines()
+        assert report[0] == '3 samples, one every 1000 us'
+        assert [line.split() for line in report[2:]] == [
+            ['3', '100%', '3', '100%', 'inner', '(<input>)'],
+            ['3', '100%', '0', '0%', '<main>', '(<input>)'],
+            ['2', '66%', '0', '0%', 'outer', '(<input>)']]
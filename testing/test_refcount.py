@@ -221,3 +221,29 @@ array(3) {
         count($a);
         ''')
         assert ''.join(output) == ""
+
+    def test_nested_arrays_are_copied_lazily(self):
+        output = self.run('''
+        $x = 7;
+        $a = array(array(5, $x), array(6, $x));
+        $b = $a;
+        $b[] = 8;     # copies the outer array only
+        ''')
+        assert ''.join(output) == """\
+array(2) {
+  [0]=>
+  array(2) {
+    [0]=>
+    int(5)
+    [1]=>
+    int(7)
+  }
+  [1]=>
+  array(2) {
+    [0]=>
+    int(6)
+    [1]=>
+    int(7)
+  }
+}
+"""
@@ -452,3 +452,68 @@ class TestRegex(BaseTestInterpreter):
         echo $m;
         ''')
         assert output[0].dump() == "array(array(array('', 0), array('', 2)))"
+
+    def test_cache_size(self):
+        output = self.run('''
+        ini_set('pcre.cache_size', 2);
+        preg_match('/cache_warmup/', 'x');
+        $before = hippy_pcre_cache_stats();
+        preg_match('/cache_a/', 'x');
+        preg_match('/cache_b/', 'x');
+        preg_match('/cache_a/', 'x');
+        preg_match('/cache_c/', 'x');
+        $after = hippy_pcre_cache_stats();
+        echo $after['size'], $after['capacity'];
+        echo $after['hits'] - $before['hits'];
+        echo $after['misses'] - $before['misses'];
+        echo $after['evictions'] - $before['evictions'];
+        ''')
+        assert [self.space.int_w(w_x) for w_x in output] == [2, 2, 1, 3, 3]
+        cache = self.space.regex_cache
+        assert cache.get('/cache_a/') is not None
+        assert cache.get('/cache_b/') is None
+
+
+class TestRegexpCache(object):
+    def test_lru(self):
+        from hippy.module.regex.cache import RegexpCache
+        cache = RegexpCache(None, capacity=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        assert cache.get('a') == 1
+        cache.set('c', 3)
+        assert cache.get('b') is None
+        assert cache.get('a') == 1
+        assert cache.get('c') == 3
+        assert (cache.hits, cache.misses, cache.evictions) == (3, 1, 1)
+        cache.set_capacity(1)
+        assert cache.size() == 1
+        assert cache.get('c') == 3
+        assert cache.evictions == 2
+
+    def test_version(self):
+        from hippy.module.regex.cache import RegexpCache
+        cache = RegexpCache(None, capacity=2)
+        version = cache.version
+        cache.set('a', 1)
+        cache.set('b', 2)
+        assert cache.version is version
+        cache.set('b', 3)
+        assert cache.version is not version
+        version = cache.version
+        cache.set('c', 4)
+        assert cache.version is not version
+
+    def test_constant_lookups_keep_lru_order(self, monkeypatch):
+        from hippy import lru_cache
+        from hippy.module.regex.cache import RegexpCache
+        cache = RegexpCache(None, capacity=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        monkeypatch.setattr(lru_cache.jit, 'isconstant', lambda x: True)
+        assert cache.get('a') == 1
+        monkeypatch.undo()
+        cache.set('c', 3)
+        assert cache.get('b') is None
+        assert cache.get('a') == 1
+        assert cache.get('c') == 3
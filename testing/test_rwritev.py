@@ -0,0 +1,46 @@
+import os
+
+from hippy import rwritev
+
+
+def read_all(fd):
+    data = []
+    while True:
+        s = os.read(fd, 4096)
+        if not s:
+            return ''.join(data)
+        data.append(s)
+
+
+def test_writev():
+    r, w = os.pipe()
+    strings = ['abc', '', 'de', 'f' * 10000, 'g']
+    rwritev.writev(w, strings)
+    os.close(w)
+    assert read_all(r) == ''.join(strings)
+    os.close(r)
+
+
+def test_writev_many(monkeypatch):
+    monkeypatch.setattr(rwritev, 'IOV_MAX', 3)
+    r, w = os.pipe()
+    strings = [str(i) for i in range(20)]
+    rwritev.writev(w, strings)
+    os.close(w)
+    assert read_all(r) == ''.join(strings)
+    os.close(r)
+
+
+def test_partial_writes(monkeypatch):
+    written = []
+
+    def writev_some(fd, strings, start, count, offset):
+        # write at most 3 bytes at a time
+        data = ''.join(strings[start:start + count])[offset:offset + 3]
+        written.append(data)
+        return len(data)
+
+    monkeypatch.setattr(rwritev, '_writev_some', writev_some)
+    strings = ['abcd', 'e', '', 'fghijklm']
+    rwritev.writev(1, strings)
+    assert ''.join(written) == ''.join(strings)
@@ -0,0 +1,49 @@
+import random
+
+from hippy.module.standard.strings.search import Searcher
+
+
+class TestSearcher(object):
+    def test_find(self):
+        for ci in [False, True]:
+            s = Searcher('abc', ci)
+            assert s.find('') == -1
+            assert s.find('abc') == 0
+            assert s.find('xxabcxabc') == 2
+            assert s.find('xxabcxabc', 3) == 6
+            assert s.find('xxabcxabc', 3, 8) == -1
+            assert s.find('ab') == -1
+
+    def test_find_case_insensitive(self):
+        s = Searcher('HeLLo', True)
+        assert s.find('say hello!') == 4
+        assert s.find('SAY HELLO!') == 4
+        assert s.find('say hell') == -1
+        assert Searcher('x', True).find('aaXa') == 2
+
+    def test_count(self):
+        assert Searcher('aa').count('aaaaa') == 2
+        assert Searcher('AA', True).count('aAaaa') == 2
+        assert Searcher('a', True).count('AbA', 1) == 1
+
+    def test_replace(self):
+        assert Searcher('ab').replace('xabyab', '-') == ('x-y-', 2)
+        assert Searcher('ab').replace('xyz', '-') == ('xyz', 0)
+        assert Searcher('AB', True).replace('xaByAB', '') == ('xy', 2)
+        assert Searcher('aa').replace('aaa', 'b') == ('ba', 1)
+
+    def test_random(self):
+        rnd = random.Random(12)
+        for _ in range(2000):
+            needle = ''.join([rnd.choice('abAB')
+                              for _ in range(rnd.randint(1, 4))])
+            haystack = ''.join([rnd.choice('abcAB')
+                                for _ in range(rnd.randint(0, 30))])
+            start = rnd.randint(0, len(haystack))
+            s = Searcher(needle, True)
+            expected = haystack.lower().find(needle.lower(), start)
+            assert s.find(haystack, start) == expected
+            assert s.count(haystack) == haystack.lower().count(needle.lower())
+            s = Searcher(needle)
+            assert s.replace(haystack, 'x') == (
+                haystack.replace(needle, 'x'), haystack.count(needle))
@@ -498,3 +498,15 @@ echo serialize($c);
         self.run("unserialize('a:121:{%si:199;d:1;}');" % array_content)
         assert len(ping) == 0
         serialize._succeeded_as_a_list = back
+
+    def test_unserialize_interns_keys(self):
+        from hippy.interning import intern_table
+        output = self.run("""
+        $a = unserialize('a:2:{s:2:"id";i:5;s:4:"name";s:3:"bob";}');
+        echo $a['id'], $a['name'];
+        echo $a;
+        """)
+        assert self.space.int_w(output[0]) == 5
+        assert self.space.str_w(output[1]) == "bob"
+        for key in output[2].as_rdict().keys():
+            assert intern_table.is_interned(key)
@@ -425,6 +425,19 @@ class TestBuiltin(BaseTestInterpreter):
         assert _as_list(self.space, output[0]) == ["Xab", "aXX"]
         assert self.space.int_w(output[1]) == 4
 
+    def test_str_replace_array_in_one_pass(self):
+        output = self.run('''
+        echo str_replace(array("{a}", "{b}"), array("1", "{a}"),
+                         "{b}{a}-{b}", $count);
+        echo $count;
+        echo str_replace(array("<", ">"), array("&lt;", "&gt;"), "<p>");
+        echo str_ireplace(array("AB", "c"), array("x", "y"), "abCaBc");
+        ''')
+        assert self.space.str_w(output[0]) == "{a}1-{a}"
+        assert self.space.int_w(output[1]) == 3
+        assert self.space.str_w(output[2]) == "&lt;p&gt;"
+        assert self.space.str_w(output[3]) == "xyxy"
+
     def test_str_rot13(self):
         output = self.run('''
         echo str_rot13("PHp 5");
@@ -734,6 +747,14 @@ class TestBuiltin(BaseTestInterpreter):
         ''')
         assert map(self.space.str_w, output) == ["y z"]
         output = self.run('''
+        $map = array();
+        for ($i = 0; $i < 300; $i++) {
+            $map["{" . $i . "}"] = "<" . $i . ">";
+        }
+        echo strtr("{1}{2}{299}{300}{12", $map);
+        ''')
+        assert self.space.str_w(output[0]) == "<1><2><299>{300}{12"
+        output = self.run('''
         echo strtr("hello hi", array("h" => "x", "hello" => "y", "" => "z"));
         ''')
         assert self.space.is_w(output[0], self.space.w_False)